@@ -0,0 +1,311 @@
+"""
+This module provides the Backtest class, which measures the accuracy of Prophet on
+every group with rolling-origin cross-validation over a grid of Prophet parameters,
+and persists the best parameters of each group for the Forecast class to use.
+
+Example:
+    python backtest.py --groups "Coal Consumption" --output backtest.csv
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import json
+import os
+import numpy as np
+import pandas as pd
+from storage import atomic_write
+
+
+DEFAULT_GRID = {'changepoint_prior_scale': [0.01, 0.05, 0.5],
+                'seasonality_mode': ['additive', 'multiplicative']}
+METRICS = ('mape', 'rmse')
+
+
+_WORKER_STATE = {}
+
+
+def _init_worker(series, folds, config):
+    """
+    Stores the read-only training series and fold positions of a pool worker, so that
+    they are passed to each worker once instead of with every task.
+
+    Parameters
+    ----------
+    series : Mapping
+        The training series by group name, with 'ds' and 'y' columns.
+    folds : dict
+        The (train_end, test_end) row positions of the folds by group name.
+    config : dict
+        The configuration dictionary.
+    """
+    _WORKER_STATE.update(series=series, folds=folds, config=config, fold_frames={})
+
+
+def _backtest_worker(name, params):
+    """
+    Cross-validates one parameter combination on one group inside a pool worker.
+    The fold frames of a group are built once per worker and reused for every
+    parameter combination.
+
+    Parameters
+    ----------
+    name : str
+        The name of the group.
+    params : dict
+        The Prophet parameters to evaluate, merged into 'prophet_params'.
+
+    Returns
+    -------
+    dict
+        The group, the parameters and their 'mape' and 'rmse' averaged over the folds,
+        or the 'error' that made the combination fail.
+    """
+    from prophet import Prophet  # pylint: disable=import-outside-toplevel
+
+    fold_frames = _WORKER_STATE['fold_frames']
+    if name not in fold_frames:
+        df = _WORKER_STATE['series'][name]
+        fold_frames[name] = [(df.iloc[:train_end], df.iloc[train_end:test_end])
+                             for train_end, test_end in _WORKER_STATE['folds'][name]]
+
+    # Intervals are not scored, so uncertainty sampling is skipped
+    prophet_params = {**_WORKER_STATE['config'].get('prophet_params', {}), **params,
+                      'uncertainty_samples': 0}
+    errors = []
+    actuals = []
+    try:
+        for train, test in fold_frames[name]:
+            prophet_model = Prophet(**prophet_params)
+            prophet_model.fit(train)
+            forecast = prophet_model.predict(test[['ds']])
+            errors.append(test['y'].to_numpy() - forecast['yhat'].to_numpy())
+            actuals.append(test['y'].to_numpy())
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        return {'group': name, 'params': params, 'error': f"{type(error).__name__}: {error}"}
+    errors = np.concatenate(errors)
+    actuals = np.concatenate(actuals)
+    nonzero = actuals != 0
+    return {'group': name,
+            'params': params,
+            'mape': float(np.mean(np.abs(errors[nonzero] / actuals[nonzero])) * 100)
+            if nonzero.any() else float('nan'),
+            'rmse': float(np.sqrt(np.mean(errors ** 2)))}
+
+
+class Backtest:
+    """
+        A class to cross-validate Prophet parameters on multiple groups.
+
+        Each group's history up to 'max_train_date' is split into rolling-origin folds:
+        the last 'backtest_folds' windows of 'backtest_horizon' periods, 'backtest_step'
+        periods apart, are each forecast from a model fitted on all earlier periods.
+        Every combination of the 'backtest_grid' parameters is evaluated on every group
+        in a process pool, and the combination with the lowest 'backtest_metric' is kept.
+
+        Attributes
+        ----------
+        data_dict : Mapping
+            The series by group name, with 'ds' and 'y' columns.
+        config : dict
+            A configuration dictionary.
+
+        Methods
+        -------
+        get_grid():
+            Returns every combination of the grid parameters.
+        get_folds(length):
+            Returns the row positions of the folds of a series of the given length.
+        run():
+            Cross-validates every parameter combination on every group.
+        get_best_params(results):
+            Selects the best parameters of each group.
+        save_best_params(best_params):
+            Writes the best parameters to 'best_params_file'.
+        """
+    def __init__(self, data_dict, config):
+        """
+        Initializes the Backtest class with data and configuration.
+
+        Parameters
+        ----------
+        data_dict : Mapping
+            The series by group name, with 'ds' and 'y' columns.
+        config : dict
+            A configuration dictionary containing the keys 'max_train_date' and
+            'date_format'. The optional keys 'backtest_grid', 'backtest_folds',
+            'backtest_horizon', 'backtest_step', 'backtest_initial',
+            'backtest_metric' and 'backtest_workers' control the cross-validation.
+        """
+        self.data_dict = data_dict
+        self.config = config
+        self.max_train_date = pd.to_datetime(config['max_train_date'],
+                                             format=config['date_format'])
+
+    def get_grid(self):
+        """
+        Returns every combination of the grid parameters.
+
+        Returns
+        -------
+        list
+            A dictionary of Prophet parameters per combination.
+        """
+        grid = self.config.get('backtest_grid') or DEFAULT_GRID
+        return [dict(zip(grid, values)) for values in product(*grid.values())]
+
+    def get_folds(self, length):
+        """
+        Returns the row positions of the folds of a series. Folds whose training data
+        would be shorter than 'backtest_initial' periods are skipped.
+
+        Parameters
+        ----------
+        length : int
+            The number of training rows of the series.
+
+        Returns
+        -------
+        list
+            (train_end, test_end) positions, oldest fold first.
+        """
+        horizon = self.config.get('backtest_horizon', 12)
+        step = self.config.get('backtest_step') or horizon
+        initial = self.config.get('backtest_initial', 24)
+        folds = []
+        for fold in range(self.config.get('backtest_folds', 3)):
+            test_end = length - fold * step
+            if test_end - horizon < initial:
+                break
+            folds.append((test_end - horizon, test_end))
+        return folds[::-1]
+
+    def run(self):
+        """
+        Cross-validates every parameter combination on every group. The training
+        series and folds are computed once and shared with the pool workers. A failed
+        combination is reported and left out of the results.
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per group and combination with the 'group', the 'params' and
+            their 'mape' and 'rmse'.
+        """
+        series = {}
+        folds = {}
+        for name in self.data_dict:
+            df = self.data_dict[name]
+            df = df[(df['ds'] <= self.max_train_date) & df['y'].notna()].reset_index(drop=True)
+            group_folds = self.get_folds(len(df))
+            if not group_folds:
+                print(f"Warning: {name} is too short to backtest")
+                continue
+            series[name] = df
+            folds[name] = group_folds
+
+        tasks = [(name, params) for name in series for params in self.get_grid()]
+        workers = self.config.get('backtest_workers', self.config.get('forecast_workers', 1)) \
+            or os.cpu_count()
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks)),
+                                     initializer=_init_worker,
+                                     initargs=(series, folds, self.config)) as executor:
+                results = list(executor.map(_backtest_worker, *zip(*tasks)))
+        else:
+            _init_worker(series, folds, self.config)
+            results = [_backtest_worker(name, params) for name, params in tasks]
+        for result in results:
+            if 'error' in result:
+                print(f"Warning: Backtest failed for {result['group']} with "
+                      f"{result['params']}: {result['error']}")
+        return pd.DataFrame([result for result in results if 'error' not in result],
+                            columns=['group', 'params', *METRICS])
+
+    def get_best_params(self, results):
+        """
+        Selects the parameters with the lowest 'backtest_metric' of each group.
+
+        Parameters
+        ----------
+        results : pd.DataFrame
+            The cross-validation results returned by run.
+
+        Returns
+        -------
+        dict
+            The 'params' and metrics of the best combination by group name.
+        """
+        metric = self.config.get('backtest_metric', 'mape')
+        if metric not in METRICS:
+            raise ValueError(f"Unknown backtest metric {metric}")
+        best = results.sort_values(metric, kind='stable').groupby('group', sort=False).head(1)
+        return {row.group: {'params': row.params, 'mape': row.mape, 'rmse': row.rmse}
+                for row in best.itertuples(index=False)}
+
+    def save_best_params(self, best_params):
+        """
+        Writes the best parameters of each group to 'best_params_file', keeping the
+        entries of groups that were not backtested. The file is replaced atomically.
+
+        Parameters
+        ----------
+        best_params : dict
+            The best parameters by group name, as returned by get_best_params.
+
+        Returns
+        -------
+        str
+            The path of the written file.
+        """
+        path = self.config.get('best_params_file') or 'best_params.json'
+        saved = {'groups': {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as file:
+                saved = json.load(file)
+        saved['metric'] = self.config.get('backtest_metric', 'mape')
+        saved['groups'].update(best_params)
+        # The pipeline may read the file while it is replaced
+        with atomic_write(path) as file:
+            json.dump(saved, file, indent=2)
+        return path
+
+
+def main(argv=None):
+    """
+    Backtests the groups of the configured data source from the command line, prints
+    the metrics of the best parameters of each group and saves them.
+
+    Parameters
+    ----------
+    argv : list, optional
+        The command line arguments, defaults to sys.argv.
+    """
+    from pipeline import Pipeline  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description='Cross-validate Prophet parameters per group.')
+    parser.add_argument('--config', help='configuration file, defaults to config.json')
+    parser.add_argument('--groups', nargs='+', metavar='GROUP',
+                        help='only backtest the given groups')
+    parser.add_argument('--output', help='CSV file to save the results of every combination to')
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.config)
+    if args.groups:
+        pipeline.config['groups'] = args.groups
+    # Every group is backtested, not only the groups changed since the last run
+    pipeline.config.update(incremental=False, streaming=False)
+    series = pipeline.run('transform')
+
+    backtest = Backtest(series, pipeline.config)
+    results = backtest.run()
+    if args.output:
+        results.assign(params=results['params'].map(json.dumps)).to_csv(args.output, index=False)
+    best_params = backtest.get_best_params(results)
+    for name, best in best_params.items():
+        print(f"{name}: MAPE {best['mape']:.2f}%, RMSE {best['rmse']:.4g}, {best['params']}")
+    print(f"Best parameters written to {backtest.save_best_params(best_params)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+This module provides a lightweight forecasting engine that can be used instead of
+Prophet for series where a simple model is good enough. All series are fitted in a
+single batched least squares solve over stacked 2-D arrays.
+"""
+
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+
+FREQUENCIES = {'M': ('M', 12), 'MS': ('M', 12), 'Q': ('Q', 4), 'QS': ('Q', 4),
+               'W': ('W', 52), 'D': ('D', 7), 'H': ('H', 24)}
+
+
+class BaselineEngine:
+    """
+        A forecasting engine that fits a linear trend plus seasonal dummies to the most
+        recent observations of every series with NumPy.
+
+        Like every forecasting engine, it is created with the configuration dictionary
+        and provides a forecast(train_sets, get_future_grid) method returning the same
+        'ds', 'yhat', 'yhat_lower' and 'yhat_upper' columns as the Prophet forecasts.
+
+        Attributes
+        ----------
+        config : dict
+            A configuration dictionary containing the key 'period_frequency'. The
+            optional keys 'baseline_window' (number of most recent periods fitted) and
+            'baseline_ridge' (regularization of the solve) tune the model, and the
+            'interval_width' in 'prophet_params' sets the width of the intervals.
+        period_frequency : str
+            The pandas period frequency the dates are converted to.
+        season_length : int
+            The number of periods in a seasonal cycle.
+
+        Methods
+        -------
+        fit(train_sets):
+            Fits all series and returns the fitted coefficients.
+        forecast(train_sets, get_future_grid):
+            Fits all series and forecasts the dates of their future grids.
+        """
+    def __init__(self, config):
+        """
+        Initializes the BaselineEngine class with the configuration.
+
+        Parameters
+        ----------
+        config : dict
+            A configuration dictionary.
+        """
+        self.config = config
+        self.period_frequency, self.season_length = FREQUENCIES.get(
+            config['period_frequency'], (config['period_frequency'], 1))
+
+    def to_ordinals(self, dates):
+        """
+        Converts dates to integer period numbers at the configured frequency.
+
+        Parameters
+        ----------
+        dates : array-like
+            The datetime64 dates.
+
+        Returns
+        -------
+        np.ndarray
+            The int64 period ordinals.
+        """
+        return pd.DatetimeIndex(dates).to_period(self.period_frequency).asi8
+
+    def design(self, ordinals, last_ordinals):
+        """
+        Builds the regression features for the given period ordinals: an intercept, the
+        trend in seasonal cycles since the last observation and one dummy per season
+        except the season of the last observation.
+
+        Parameters
+        ----------
+        ordinals : np.ndarray
+            A (series, periods) array of period ordinals.
+        last_ordinals : np.ndarray
+            The period ordinal of the last observation of every series.
+
+        Returns
+        -------
+        np.ndarray
+            A (series, periods, features) array.
+        """
+        offsets = ordinals - last_ordinals[:, None]
+        features = [np.ones(offsets.shape), offsets / self.season_length]
+        seasons = np.mod(offsets, self.season_length)
+        features += [(seasons == season).astype(float)
+                     for season in range(1, self.season_length)]
+        return np.stack(features, axis=-1)
+
+    def pad(self, frames):
+        """
+        Right-aligns series of different lengths into padded 2-D arrays.
+
+        Parameters
+        ----------
+        frames : list
+            Data frames with 'ds' and 'y' columns and no missing values.
+
+        Returns
+        -------
+        tuple
+            The (series, periods) arrays of date ordinals, of values and of the mask of
+            the observed periods.
+        """
+        lengths = np.array([len(df) for df in frames])
+        width = lengths.max()
+        rows = np.repeat(np.arange(len(frames)), lengths)
+        columns = np.concatenate([np.arange(width - length, width) for length in lengths])
+
+        ordinals = np.zeros((len(frames), width), dtype=np.int64)
+        values = np.zeros((len(frames), width))
+        mask = np.zeros((len(frames), width))
+        ordinals[rows, columns] = self.to_ordinals(np.concatenate([df['ds'] for df in frames]))
+        values[rows, columns] = np.concatenate([df['y'] for df in frames])
+        mask[rows, columns] = 1.0
+        return ordinals, values, mask
+
+    def fit(self, train_sets):
+        """
+        Fits all series in one batched solve. The last 'baseline_window' observations of
+        each series are right-aligned into padded 2-D arrays and masked, and the normal
+        equations of all series are solved at once.
+
+        Parameters
+        ----------
+        train_sets : dict
+            A dictionary of data frames with 'ds' and 'y' columns; every series must have
+            at least two non-missing values.
+
+        Returns
+        -------
+        dict
+            The 'last_dates', 'last_ordinals', 'coefficients' and residual 'sigma' of the
+            series, in the order of train_sets.
+        """
+        window = self.config.get('baseline_window', 120)
+        frames = [df.dropna(subset=['y']).iloc[-window:] for df in train_sets.values()]
+        ordinals, values, mask = self.pad(frames)
+        last_ordinals = ordinals[:, -1]
+
+        features = self.design(ordinals, last_ordinals) * mask[..., None]
+        gram = np.einsum('gtp,gtq->gpq', features, features)
+        gram += self.config.get('baseline_ridge', 1e-6) * np.eye(gram.shape[-1])
+        moments = np.einsum('gtp,gt->gp', features, values)
+        coefficients = np.linalg.solve(gram, moments[..., None])[..., 0]
+
+        residuals = (values - np.einsum('gtp,gp->gt', features, coefficients)) * mask
+        dof = np.maximum(mask.sum(axis=1) - gram.shape[-1], 1)
+        return {'last_dates': [df['ds'].iloc[-1] for df in frames],
+                'last_ordinals': last_ordinals,
+                'coefficients': coefficients,
+                'sigma': np.sqrt((residuals ** 2).sum(axis=1) / dof)}
+
+    def forecast(self, train_sets, get_future_grid):
+        """
+        Fits all series and forecasts the dates of their future grids. Series sharing the
+        same last date share their grid and are predicted together.
+
+        Parameters
+        ----------
+        train_sets : dict
+            A dictionary of data frames with 'ds' and 'y' columns.
+        get_future_grid : callable
+            Returns the data frame of dates to forecast after a given last training date.
+
+        Returns
+        -------
+        dict
+            (forecast, error) pairs by group name; error is None for successful series.
+        """
+        valid = {name: df for name, df in train_sets.items() if df['y'].notna().sum() >= 2}
+        results = {name: (None, "ValueError: Dataframe has less than 2 non-NaN rows.")
+                   for name in train_sets if name not in valid}
+        if not valid:
+            return results
+
+        fitted = self.fit(valid)
+        width = self.config.get('prophet_params', {}).get('interval_width', 0.8)
+        bounds = NormalDist().inv_cdf(0.5 + width / 2) * fitted['sigma']
+        names = list(valid.keys())
+        last_dates = pd.Series(fitted['last_dates'])
+        for last_date, members in last_dates.groupby(last_dates).groups.items():
+            members = np.asarray(members)
+            future = get_future_grid(last_date)
+            for member, yhat in zip(members, self.predict(fitted, members, future)):
+                results[names[member]] = (pd.DataFrame({
+                    'ds': future['ds'].to_numpy(),
+                    'yhat': yhat,
+                    'yhat_lower': yhat - bounds[member],
+                    'yhat_upper': yhat + bounds[member]}), None)
+        return results
+
+    def predict(self, fitted, members, future):
+        """
+        Predicts the dates of a future grid for series sharing their last date.
+
+        Parameters
+        ----------
+        fitted : dict
+            The fitted series, as returned by fit.
+        members : np.ndarray
+            The positions of the series in fitted.
+        future : pd.DataFrame
+            The dates to forecast, in a 'ds' column.
+
+        Returns
+        -------
+        np.ndarray
+            A (series, dates) array of forecasts.
+        """
+        ordinals = np.tile(self.to_ordinals(future['ds']), (len(members), 1))
+        features = self.design(ordinals, fitted['last_ordinals'][members])
+        return np.einsum('ghp,gp->gh', features, fitted['coefficients'][members])
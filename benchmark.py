@@ -0,0 +1,359 @@
+"""
+This module contains a benchmark harness for the forecasting pipeline. It generates
+a synthetic EIA-shaped data set, times each stage class and the end-to-end Pipeline
+on it, reports series per second and peak memory, and saves the results as JSON so
+that they can be compared against a stored baseline. It also measures the startup
+time of the pipeline command line, which can be held to a budget.
+
+Example:
+    python benchmark.py --groups 200 --history 240 --output baseline.json
+    python benchmark.py --groups 200 --history 240 --baseline baseline.json
+    python benchmark.py --groups 10 --startup-budget 0.5
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from extract import Extract
+from preprocess import Preprocess
+from transform import Transform
+from forecast import Forecast
+from report import Report
+from pipeline import Pipeline
+from instrument import track_peak_rss
+
+
+DATE_FORMATS = {'M': '%Y%m', 'W': '%Y%m%d', 'D': '%Y%m%d'}
+SEASON_LENGTHS = {'M': 12, 'W': 52, 'D': 7}
+
+
+def simulate_values(rng, groups, history, season):
+    """
+    Simulates series with a random level, a linear trend, a seasonal cycle and noise.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        groups (int): The number of series.
+        history (int): The number of periods per series.
+        season (int): The number of periods per seasonal cycle.
+
+    Returns:
+        np.ndarray: A (groups, history) array of values.
+    """
+
+    steps = np.arange(history)
+    levels = rng.uniform(1, 100, size=(groups, 1))
+    return (levels * (1 + rng.normal(0, 0.002, (groups, 1)) * steps)
+            + levels * 0.2 * np.sin(2 * np.pi * steps / season + rng.uniform(0, 6, (groups, 1)))
+            + rng.normal(0, 1, (groups, history)))
+
+
+# The keyword arguments mirror the data quality options of the command line
+def generate_source(path, groups, history, frequency='M', *,  # pylint: disable=too-many-arguments
+                    annual_fraction=0.08, non_numeric_fraction=0.02, seed=0):
+    """
+    Writes a synthetic source in the shape of the EIA tables: one row per group and
+    period with MSN, YYYYMM, Value, Column_Order, Description and Unit columns.
+
+    Args:
+        path (str): The path of the CSV file to write.
+        groups (int): The number of series.
+        history (int): The number of periods per series.
+        frequency (str): The period frequency, one of DATE_FORMATS.
+        annual_fraction (float): The number of 'YYYY13' annual total rows to add,
+            as a fraction of the periods.
+        non_numeric_fraction (float): The fraction of values replaced by 'Not Available'.
+        seed (int): The random seed.
+
+    Returns:
+        tuple: The last period and the first period after the history, as dates.
+    """
+
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end='2021-12-01', periods=history,
+                          freq='MS' if frequency == 'M' else frequency)
+    values = simulate_values(rng, groups, history, SEASON_LENGTHS[frequency])
+
+    date_strings = np.tile(dates.strftime(DATE_FORMATS[frequency]).to_numpy(), groups)
+    values = values.ravel().round(6).astype(str).astype(object)
+    values[rng.random(values.size) < non_numeric_fraction] = 'Not Available'
+    group_ids = np.repeat(np.arange(groups), history)
+
+    annual = int(round(annual_fraction * history))
+    if annual:
+        years = np.unique(dates.strftime('%Y'))[-annual:]
+        date_strings = np.concatenate([date_strings, np.tile([f'{year}13' for year in years],
+                                                             groups)])
+        values = np.concatenate([values, rng.uniform(1, 1000, groups * len(years)).round(6)
+                                 .astype(str)])
+        group_ids = np.concatenate([group_ids, np.repeat(np.arange(groups), len(years))])
+
+    pd.DataFrame({'MSN': [f'SYN{group:05d}' for group in group_ids],
+                  'YYYYMM': date_strings,
+                  'Value': values,
+                  'Column_Order': group_ids + 1,
+                  'Description': [f'Synthetic Series {group:05d}' for group in group_ids],
+                  'Unit': 'Quadrillion Btu'}) \
+        .sort_values(['Column_Order', 'YYYYMM'], kind='stable').to_csv(path, index=False)
+    return dates[-1], dates[-1] + pd.tseries.frequencies.to_offset(
+        'MS' if frequency == 'M' else frequency)
+
+
+def make_config(base_config, source_path, frequency, dates, engine):
+    """
+    Returns the pipeline configuration for a benchmark source. Caches that would
+    make repeated measurements incomparable are disabled.
+
+    Args:
+        base_config (dict): The configuration to start from.
+        source_path (str): The path of the synthetic source.
+        frequency (str): The period frequency of the source.
+        dates (tuple): The last period of the source and the first period after it.
+        engine (str): The forecasting engine to benchmark.
+
+    Returns:
+        dict: The benchmark configuration.
+    """
+
+    date_format = DATE_FORMATS[frequency]
+    last_date, next_date = dates
+    config = dict(base_config)
+    config.update({'data_source': source_path,
+                   'description_column': 'Description',
+                   'date_column': 'YYYYMM',
+                   'target_column': 'Value',
+                   'date_format': date_format,
+                   'period_frequency': frequency,
+                   'max_train_date': last_date.strftime(date_format),
+                   'prediction_start': next_date.strftime(date_format),
+                   'engine': engine,
+                   'engines': {},
+                   'model_cache': False,
+                   'warm_start': False,
+                   'source_cache': False,
+                   'run_record_dir': None,
+                   'profile': False})
+    return config
+
+
+def measure(function, *args, trace_memory=False):
+    """
+    Calls a function and measures its wall time and memory usage.
+
+    Args:
+        function (callable): The function to call.
+        *args: The arguments of the function.
+        trace_memory (bool): Whether to also measure the peak of Python allocations
+            with tracemalloc, which slows the call down.
+
+    Returns:
+        tuple: The result of the call and a dict with 'wall_s', the 'peak_rss_mb' of
+            the call and 'children_peak_rss_mb' of the processes it started, as
+            measured by track_peak_rss, and, if traced, 'peak_traced_mb'.
+    """
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with track_peak_rss() as memory:
+        result = function(*args)
+    measurement = {'wall_s': round(time.perf_counter() - start, 4), **memory}
+    if trace_memory:
+        measurement['peak_traced_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+    return result, measurement
+
+
+def measure_startup(config_file, repeats=5):
+    """
+    Measures the startup time of the pipeline command line as the fastest of several
+    dry runs, each in a fresh interpreter.
+
+    Args:
+        config_file (str): The path of the configuration file to validate.
+        repeats (int): The number of dry runs.
+
+    Returns:
+        dict: The measurement, with 'wall_s' in seconds.
+    """
+
+    pipeline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline.py')
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, pipeline_path, '--config', config_file, '--dry-run'],
+                       check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return {'wall_s': round(min(timings), 4)}
+
+
+def run_benchmark(config, config_file, groups, trace_memory=False):
+    """
+    Times each stage class on the benchmark source, feeding every stage the output
+    of the previous one, then the end-to-end Pipeline and its startup.
+
+    Args:
+        config (dict): The benchmark configuration.
+        config_file (str): The path the configuration is saved to for the Pipeline.
+        groups (int): The number of series, used to compute series per second.
+        trace_memory (bool): Whether to measure allocations with tracemalloc.
+
+    Returns:
+        dict: The measurements by stage name.
+    """
+
+    stages = {}
+
+    def timed(name, function, *args):
+        result, stages[name] = measure(function, *args, trace_memory=trace_memory)
+        stages[name]['series_per_s'] = round(groups / max(stages[name]['wall_s'], 1e-9), 2)
+        return result
+
+    extractor = Extract(config)
+    data = timed('Extract.run', extractor.run)
+    cleaned = timed('Preprocess.clean', Preprocess(config).clean, data)
+    transformed = timed('Transform.run', Transform(config).run, cleaned)
+    forecasts = timed('Forecast.run', Forecast(transformed, config).run)
+    timed('Report.create_plots', Report(transformed, forecasts, config).create_plots)
+
+    with open(config_file, 'w', encoding='utf-8') as file:
+        json.dump(config, file)
+    timed('Pipeline.run', Pipeline(config_file).run)
+    stages['Pipeline.startup'] = measure_startup(config_file)
+    return stages
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the stage timings next to a baseline and returns the regressed stages.
+
+    Args:
+        results (dict): The current benchmark results.
+        baseline (dict): The stored benchmark results.
+        tolerance (float): The allowed relative slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        list: The names of the stages slower than the baseline beyond the tolerance.
+    """
+
+    regressions = []
+    print(f"{'stage':<28}{'wall_s':>10}{'baseline':>10}{'ratio':>8}")
+    for name, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if previous is None:
+            print(f"{name:<28}{current['wall_s']:>10.3f}{'-':>10}{'-':>8}")
+            continue
+        ratio = current['wall_s'] / max(previous['wall_s'], 1e-9)
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = '  regression'
+        print(f"{name:<28}{current['wall_s']:>10.3f}{previous['wall_s']:>10.3f}"
+              f"{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def print_stages(stages):
+    """
+    Prints the wall time, throughput and peak memory of every measured stage.
+
+    Args:
+        stages (dict): The measurements by stage name, as returned by run_benchmark.
+    """
+
+    for name, stage in stages.items():
+        if 'series_per_s' not in stage:
+            print(f"{name:<28}{stage['wall_s']:>10.3f} s")
+            continue
+        children = stage.get('children_peak_rss_mb')
+        print(f"{name:<28}{stage['wall_s']:>10.3f} s{stage['series_per_s']:>12.1f} series/s"
+              f"{stage['peak_rss_mb'] or 0:>10.1f} MB"
+              + (f" (workers {children:.1f} MB)" if children else ''))
+
+
+def main():
+    """
+    Parses the command line, runs the benchmark in a temporary folder and writes
+    and compares the results.
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmark the forecasting pipeline '
+                                                 'on a synthetic multi-series source.')
+    parser.add_argument('--groups', type=int, default=50, help='number of series')
+    parser.add_argument('--history', type=int, default=240, help='periods per series')
+    parser.add_argument('--frequency', choices=sorted(DATE_FORMATS), default='M')
+    parser.add_argument('--annual-fraction', type=float, default=0.08,
+                        help="'YYYY13' annual rows as a fraction of the periods")
+    parser.add_argument('--non-numeric-fraction', type=float, default=0.02,
+                        help="fraction of 'Not Available' values")
+    parser.add_argument('--engine', default='prophet', help='forecasting engine')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='measure per-stage Python allocation peaks with tracemalloc')
+    parser.add_argument('--output', help='file to save the results to as JSON')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed relative slowdown before a stage is flagged')
+    parser.add_argument('--startup-budget', type=float,
+                        help='maximum startup time of the pipeline command line in seconds')
+    args = parser.parse_args()
+
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+    with open(config_path, encoding='utf-8') as file:
+        base_config = json.load(file)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        try:
+            source_path = os.path.join(workdir, 'benchmark_source.csv')
+            dates = generate_source(
+                source_path, args.groups, args.history, args.frequency,
+                annual_fraction=args.annual_fraction,
+                non_numeric_fraction=args.non_numeric_fraction, seed=args.seed)
+            config = make_config(base_config, source_path, args.frequency, dates, args.engine)
+            stages = run_benchmark(config, os.path.join(workdir, 'config.json'),
+                                   args.groups, args.trace_memory)
+        finally:
+            os.chdir(cwd)
+
+    results = {'params': {key: value for key, value in vars(args).items()
+                          if key not in ('output', 'baseline', 'tolerance',
+                                         'startup_budget')},
+               'environment': {'python': platform.python_version(),
+                               'platform': platform.platform(),
+                               'pandas': pd.__version__,
+                               'numpy': np.__version__,
+                               'cpus': os.cpu_count()},
+               'stages': stages}
+    print_stages(stages)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    failed = False
+    startup = stages['Pipeline.startup']['wall_s']
+    if args.startup_budget is not None and startup > args.startup_budget:
+        print(f"Startup time {startup:.3f} s exceeds the budget of {args.startup_budget:.3f} s")
+        failed = True
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('params') != results['params']:
+            print("Warning: Baseline was recorded with different parameters")
+        if compare(results, baseline, args.tolerance):
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
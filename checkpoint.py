@@ -0,0 +1,197 @@
+"""
+This module provides the Checkpoint class, which saves the forecast of every group
+to disk as soon as it completes, so that an interrupted run can be resumed without
+forecasting the completed groups again.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import pandas as pd
+from storage import atomic_write, name_key
+
+
+class Checkpoint:
+    """
+    A directory of per-group forecast pickles of one run, with a "done.jsonl" log
+    that records each completed group on its own line.
+
+    Attributes
+    ----------
+    config : dict
+        A configuration dictionary. The optional key 'checkpoint_dir' sets the
+        folder the checkpoints of all runs are kept in.
+    run_id : str
+        The identifier of the run.
+    directory : str
+        The folder of the checkpoints of this run.
+    log_checked : bool
+        Whether the log was checked for an incomplete last line before appending.
+
+    Methods
+    -------
+    data_key(train_data):
+        Computes the hash of a group's data recorded with its checkpoint.
+    exists():
+        Returns whether the run has checkpoints.
+    clear():
+        Removes the checkpoints of the run.
+    load_done():
+        Returns the log entries of the completed groups.
+    load(name, entry):
+        Loads the forecast and timings of a completed group.
+    repair_log(path):
+        Removes an incomplete last line from the log.
+    save(name, forecast, timings, train_data):
+        Saves the forecast of a completed group and logs it.
+    """
+
+    def __init__(self, config, run_id):
+        """
+        Initializes the Checkpoint of a run.
+
+        Parameters
+        ----------
+        config : dict
+            A configuration dictionary.
+        run_id : str
+            The identifier of the run.
+        """
+        self.config = config
+        self.run_id = run_id
+        self.directory = os.path.join(config.get('checkpoint_dir', 'Checkpoints'), run_id)
+        self.log_checked = False
+
+    @staticmethod
+    def data_key(train_data):
+        """
+        Computes the hash of a group's data, used on resume to detect groups whose
+        data changed since they were checkpointed.
+
+        Parameters
+        ----------
+        train_data : pd.DataFrame
+            The group's data frame with 'ds' and 'y' columns.
+
+        Returns
+        -------
+        str
+            A hex digest of the 'ds'/'y' values.
+        """
+        row_hashes = pd.util.hash_pandas_object(train_data[['ds', 'y']], index=False)
+        return hashlib.sha256(row_hashes.to_numpy().tobytes()).hexdigest()
+
+    def exists(self):
+        """
+        Returns whether the run has checkpoints.
+
+        Returns
+        -------
+        bool
+            True if the log of the run exists.
+        """
+        return os.path.exists(os.path.join(self.directory, 'done.jsonl'))
+
+    def clear(self):
+        """
+        Removes the checkpoints of the run.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def load_done(self):
+        """
+        Returns the log entries of the completed groups. A last line left incomplete
+        by an interruption is ignored.
+
+        Returns
+        -------
+        dict
+            The 'file', 'data_key' and timings of each completed group by name.
+        """
+        done = {}
+        path = os.path.join(self.directory, 'done.jsonl')
+        if not os.path.exists(path):
+            return done
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                done[entry['group']] = entry
+        return done
+
+    def load(self, name, entry):
+        """
+        Loads the forecast and timings of a completed group.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        entry : dict
+            The log entry of the group, as returned by load_done.
+
+        Returns
+        -------
+        tuple
+            The forecast data frame and the timings of the group.
+        """
+        with open(os.path.join(self.directory, entry['file']), 'rb') as file:
+            checkpoint = pickle.load(file)
+        if checkpoint['group'] != name:
+            raise ValueError(f"Checkpoint {entry['file']} does not belong to {name}")
+        return checkpoint['forecast'], checkpoint['timings']
+
+    @staticmethod
+    def repair_log(path):
+        """
+        Removes a last line left incomplete by an interruption from the log, so that
+        the next entry starts on a line of its own instead of being appended to it.
+
+        Parameters
+        ----------
+        path : str
+            The path of the log.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as file:
+            content = file.read()
+            if content and not content.endswith(b'\n'):
+                file.truncate(content.rfind(b'\n') + 1)
+
+    def save(self, name, forecast, timings, train_data):
+        """
+        Saves the forecast of a completed group and then logs it, so that only
+        fully written checkpoints are ever logged. An incomplete last line left in the
+        log by an interrupted run is removed before the first entry is appended.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        forecast : pd.DataFrame
+            The forecast of the group.
+        timings : dict
+            The engine, row count and timings of the group's fit.
+        train_data : pd.DataFrame
+            The group's data frame, hashed to validate the checkpoint on resume.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        filename = name_key(name) + '.pkl'
+        with atomic_write(os.path.join(self.directory, filename), 'wb') as file:
+            pickle.dump({'group': name, 'forecast': forecast, 'timings': timings}, file)
+
+        entry = {'group': name, 'file': filename, 'data_key': self.data_key(train_data),
+                 **(timings or {})}
+        path = os.path.join(self.directory, 'done.jsonl')
+        if not self.log_checked:
+            self.repair_log(path)
+            self.log_checked = True
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry, default=str) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
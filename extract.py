@@ -1,86 +1,356 @@
 """
 This module provides the Extract class, which is responsible for downloading and reading data
-from the given source (URL or local file). The class handles CSV and Excel file formats and
-creates training sets based on the specified description column in the configuration.
+from the given source (URL or local file). The class handles CSV, Excel and Parquet file
+formats. Downloads are streamed to disk and only the configured columns are parsed; CSV
+sources can optionally be read in chunks to bound peak memory. URL sources can be cached
+locally as Parquet and revalidated with conditional requests. Several sources can be fetched
+concurrently and merged into one data set tagged with the source of each row.
 """
 
-from io import StringIO, BytesIO
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import os
+import time
+from urllib.parse import urlparse
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import validators
+from source_cache import SourceCache
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Rows parsed at a time when a download is written to the source cache
+CACHE_CHUNKSIZE = 100_000
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
 
 
 class Extract:
     """
     Extract class is responsible for downloading and reading the data from the given source
     (URL or local file).
-    This class handles CSV and Excel file formats and creates training sets based on the specified
-    description column in the configuration.
+    This class handles CSV, Excel and Parquet file formats.
     """
 
     def __init__(self, config):
         """
         Initializes the Extract class with the given configuration.
 
-        :param config: dict, configuration settings for the ETL pipeline.
+        :param config: dict, configuration settings for the ETL pipeline. 'data_source' may be a
+                       single URL/filename or a list of them.
         """
         self.config = config
+        self.response_headers = {}
+        concurrency = config.get('download_concurrency', 4)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get_sources(self):
+        """
+        Returns the configured data sources.
+
+        :return: list, URLs and/or local filenames.
+        """
+        sources = self.config['data_source']
+        return [sources] if isinstance(sources, str) else list(sources)
 
     def run(self):
         """
         Runs the extraction process. Downloads the file if the data source is a URL, otherwise reads
-        the local file.
+        the local file. If several sources are configured, they are fetched concurrently by up to
+        'download_concurrency' threads sharing a pooled session, and merged with the source of
+        each row in the 'source_column' column; groups found in more than one source are named
+        after their source. If 'groups' is configured, only the rows of those groups are kept.
+
+        :return: DataFrame, extracted data in pandas DataFrame format, or an iterator of DataFrame
+                 chunks if 'read_chunksize' is configured.
+        """
+        sources = self.get_sources()
+        if len(sources) == 1:
+            return self.select_groups(self.read_source(sources[0]))
+
+        with ThreadPoolExecutor(max_workers=self.config.get('download_concurrency', 4)) as executor:
+            filepaths = list(executor.map(self.fetch_source, sources, range(len(sources))))
+            results = list(executor.map(self.read_file, filepaths))
+        return self.select_groups(self.merge_sources(sources, results, filepaths))
+
+    def select_groups(self, data):
+        """
+        Keeps the rows of the groups listed in 'groups', if configured.
+
+        :param data: DataFrame, or an iterator of DataFrame chunks.
+        :return: DataFrame, or a generator of DataFrame chunks, with the rows of the groups.
+        """
+        groups = self.config.get('groups')
+        if not groups:
+            return data
+        column = self.config['description_column']
+        if not isinstance(data, pd.DataFrame):
+            return (chunk[chunk[column].isin(groups)] for chunk in data)
+        for name in sorted(set(groups) - set(data[column].unique())):
+            print(f"Warning: Group {name} not found in the data source")
+        return data[data[column].isin(groups)]
+
+    def read_source(self, source, index=0):
+        """
+        Reads a single data source, downloading it first if it is a URL.
 
-        :return: DataFrame, extracted data in pandas DataFrame format.
+        :param source: str, URL or local filename.
+        :param index: int, position of the source, used to name its download.
+        :return: DataFrame, or an iterator of DataFrame chunks if 'read_chunksize' is configured.
         """
-        if validators.url(self.config['data_source']):
-            filepath = self.download_file()
-            data = self.read_file(filepath)
+        return self.read_file(self.fetch_source(source, index))
+
+    def fetch_source(self, source, index=0):
+        """
+        Returns the local file of a data source, downloading it first if it is a URL. URL
+        sources are fetched through the Parquet cache if 'source_cache' is enabled.
+
+        :param source: str, URL or local filename.
+        :param index: int, position of the source, used to name its download.
+        :return: str, path of the CSV, Excel or Parquet file to read.
+        """
+        if not validators.url(source):
+            return source
+        if self.config.get('source_cache'):
+            return self.fetch_cached_source(source)
+        filename = "datasetTest.csv" if index == 0 else f"datasetTest_{index}.csv"
+        return self.download_file(source, os.path.join(os.getcwd(), filename))
+
+    def merge_sources(self, sources, results, filepaths=None):
+        """
+        Merges the data of several sources, tagging each row with its source. A group name found
+        in more than one source would merge unrelated series, so the rows of such groups are
+        named "<name> (<label>)" instead, with the short label of their source.
+
+        :param sources: list, URLs and/or local filenames.
+        :param results: list, DataFrames or iterators of DataFrame chunks read from the sources.
+        :param filepaths: list, local files of the sources, scanned for their group names when
+                          the sources are read in chunks.
+        :return: DataFrame, or a generator of tagged DataFrame chunks.
+        """
+        source_column = self.config.get('source_column', 'Source')
+        description_column = self.config['description_column']
+        if all(isinstance(result, pd.DataFrame) for result in results):
+            names = [set(result[description_column].unique()) for result in results]
         else:
-            data = pd.read_csv(self.config['data_source'])
-        return data
+            names = [self.read_names(filepath) for filepath in filepaths]
+        counts = Counter(name for source_names in names for name in source_names)
+        shared = sorted(name for name, count in counts.items() if count > 1)
+        for name in shared:
+            print(f"Warning: {name} appears in more than one source, "
+                  f"its groups are named after their source")
+
+        labels = self.source_labels(sources)
+
+        def tag(chunk, source, label):
+            chunk = chunk.assign(**{source_column: source})
+            if shared:
+                collides = chunk[description_column].isin(shared)
+                chunk.loc[collides, description_column] = \
+                    chunk.loc[collides, description_column] + f" ({label})"
+            return chunk
+
+        if all(isinstance(result, pd.DataFrame) for result in results):
+            return pd.concat([tag(result, source, label)
+                              for source, label, result in zip(sources, labels, results)],
+                             ignore_index=True)
+        return (tag(chunk, source, label)
+                for source, label, result in zip(sources, labels, results)
+                for chunk in ([result] if isinstance(result, pd.DataFrame) else result))
+
+    def source_labels(self, sources):
+        """
+        Returns the short labels that name the groups of the sources. The labels are taken from
+        'source_names' if configured, otherwise from the file names of the sources, numbered
+        by position where two sources share a file name.
 
-    def download_file(self):
+        :param sources: list, URLs and/or local filenames.
+        :return: list, a label per source.
         """
-        Downloads the file from the specified URL.
+        labels = self.config.get('source_names')
+        if labels:
+            if len(labels) != len(sources):
+                raise ValueError("'source_names' must have one name per data source")
+            return list(labels)
+        labels = []
+        for index, source in enumerate(sources):
+            path = urlparse(source).path if validators.url(source) else source
+            labels.append(os.path.basename(path.rstrip('/')) or f"source {index + 1}")
+        counts = Counter(labels)
+        return [f"{label} {index + 1}" if counts[label] > 1 else label
+                for index, label in enumerate(labels)]
 
-        :return: str, filepath of the downloaded file.
+    def read_names(self, filepath):
+        """
+        Returns the group names of a file, parsing only the description column.
+
+        :param filepath: str, path of the file.
+        :return: set, group names found in the file.
+        """
+        data = self.read_file(filepath, [self.config['description_column']])
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        return {name for chunk in chunks
+                for name in chunk[self.config['description_column']].unique()}
+
+    def download_file(self, url=None, filepath=None, headers=None):
+        """
+        Downloads the file from the specified URL, streaming the response body to disk in chunks
+        instead of buffering it in memory. Connection errors, timeouts and 429/5xx responses are
+        retried up to 'download_retries' times with exponential backoff starting at
+        'download_backoff' seconds; each request times out after 'download_timeout' seconds.
+        The response headers are kept in response_headers by URL.
+
+        :param url: str, URL to download, defaults to the configured data source.
+        :param filepath: str, path to download to, defaults to datasetTest.csv in the working
+                         directory.
+        :param headers: dict, extra request headers, e.g. conditional request headers.
+        :return: str, filepath of the downloaded file, or None if the server answered
+                 304 Not Modified.
+        """
+        if url is None:
+            url = self.config['data_source']
+        if filepath is None:
+            filepath = os.path.join(os.getcwd(), "datasetTest.csv")
+        retries = self.config.get('download_retries', 3)
+        backoff = self.config.get('download_backoff', 1.0)
+        for attempt in range(retries + 1):
+            try:
+                return self.fetch(url, filepath, headers)
+            except requests.RequestException as error:
+                response = getattr(error, 'response', None)
+                retryable = response is None or response.status_code in RETRY_STATUS_CODES
+                if not retryable or attempt == retries:
+                    raise
+                delay = backoff * 2 ** attempt
+                print(f"Warning: Download of {url} failed ({error}), retrying in {delay:g}s")
+                time.sleep(delay)
+        return None
+
+    def fetch(self, url, filepath, headers=None):
+        """
+        Performs a single streaming download attempt.
+
+        :param url: str, URL to download.
+        :param filepath: str, path to download to.
+        :param headers: dict, extra request headers.
+        :return: str, filepath of the downloaded file, or None on 304 Not Modified.
         """
-        url = self.config['data_source']
-        filename = "datasetTest.csv"
-        filepath = os.path.join(os.getcwd(), filename)
         print(f"Downloading {url}")
-        response = requests.get(url, timeout=30)
-        with open(filepath, "wb") as file:
-            file.write(response.content)
+        with self.session.get(url, headers=headers, stream=True,
+                              timeout=self.config.get('download_timeout', 30)) as response:
+            self.response_headers[url] = response.headers
+            if response.status_code == 304:
+                return None
+            response.raise_for_status()
+            with open(filepath, "wb") as file:
+                for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                    file.write(chunk)
         return filepath
 
-    def read_file(self, filepath):
+    def fetch_cached_source(self, url=None):
+        """
+        Fetches a URL data source through the local Parquet cache. The cached copy is
+        revalidated with a conditional request and kept if the source is unchanged;
+        otherwise the source is downloaded, then parsed and cached again in chunks of
+        'read_chunksize' (or CACHE_CHUNKSIZE) rows.
+
+        :param url: str, URL of the source, defaults to the configured data source.
+        :return: str, path of the cached Parquet copy.
+        """
+        if url is None:
+            url = self.config['data_source']
+        cache = SourceCache(self.config)
+        columns, dtypes = self.get_columns()
+        data_path, _, download_path = cache.get_paths(url)
+        filepath = self.download_file(url, download_path,
+                                      cache.get_conditional_headers(url, columns))
+        if filepath is None:
+            print(f"Using cached copy of {url}")
+            return data_path
+
+        chunks = pd.read_csv(filepath, usecols=columns, dtype=dtypes,
+                             chunksize=self.config.get('read_chunksize') or CACHE_CHUNKSIZE)
+        with chunks:
+            cache.store(url, chunks, columns, self.response_headers[url])
+        os.remove(filepath)
+        return data_path
+
+    def get_columns(self):
         """
-        Reads the file and returns the data as a pandas DataFrame.
+        Returns the columns to parse and their dtypes. Only the configured description, date and
+        target columns are read; descriptions and dates are parsed as strings, while the target
+        dtype is left to pandas since it may contain non-numeric values.
+
+        :return: tuple, list of column names and dict of column dtypes.
+        """
+        columns = [self.config['description_column'], self.config['date_column'],
+                   self.config['target_column']]
+        dtypes = {self.config['description_column']: str, self.config['date_column']: str}
+        return columns, dtypes
+
+    def read_file(self, filepath, columns=None):
+        """
+        Reads the file directly from disk and returns the data as a pandas DataFrame.
 
         :param filepath: str, path of the file to be read.
-        :return: DataFrame, data in pandas DataFrame format.
+        :param columns: list, columns to read, defaults to the configured columns.
+        :return: DataFrame, data in pandas DataFrame format, or an iterator of DataFrame chunks
+                 for CSV and Parquet files if 'read_chunksize' is configured. Files that are
+                 neither Parquet nor Excel, e.g. a .txt export, are read as CSV.
+        """
+        all_columns, dtypes = self.get_columns()
+        columns = columns or all_columns
+        dtypes = {column: dtype for column, dtype in dtypes.items() if column in columns}
+        if filepath.lower().endswith('.parquet'):
+            return self.read_parquet(filepath, columns)
+        if filepath.lower().endswith('.xlsx'):
+            return pd.read_excel(filepath, usecols=columns, dtype=dtypes)
+        return pd.read_csv(filepath, usecols=columns, dtype=dtypes,
+                           chunksize=self.config.get('read_chunksize'))
+
+    def read_parquet(self, filepath, columns):
+        """
+        Reads a Parquet file, in batches of 'read_chunksize' rows if configured. A text target
+        column is parsed as numbers when all of its values are numeric, as read_csv does.
+
+        :param filepath: str, path of the Parquet file.
+        :param columns: list, columns to read.
+        :return: DataFrame, or a generator of DataFrame chunks if 'read_chunksize' is configured.
+        """
+        chunksize = self.config.get('read_chunksize')
+        if not chunksize:
+            return self.parse_target(pd.read_parquet(filepath, columns=columns, memory_map=True))
+        return self.iter_parquet(filepath, columns, chunksize)
+
+    def iter_parquet(self, filepath, columns, chunksize):
         """
-        if filepath.endswith('.csv'):
-            with open(filepath, 'r', encoding='utf-8') as file:
-                content = file.read()
-            return pd.read_csv(StringIO(content))
-        if filepath.endswith('.xlsx'):
-            with open(filepath, 'rb') as file:
-                content = file.read()
-            return pd.read_excel(BytesIO(content))
-        raise ValueError(f"Unknown file type for {filepath}")
+        Reads a Parquet file in batches.
 
-    def create_train_sets(self, data):
+        :param filepath: str, path of the Parquet file.
+        :param columns: list, columns to read.
+        :param chunksize: int, number of rows per batch.
+        :return: generator, DataFrame chunks of the file.
         """
-        Creates training sets by grouping the data based on the specified description column.
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        with pq.ParquetFile(filepath, memory_map=True) as parquet_file:
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                yield self.parse_target(batch.to_pandas())
+
+    def parse_target(self, data):
+        """
+        Parses a text target column as numbers if all of its values are numeric.
 
         :param data: DataFrame, data in pandas DataFrame format.
-        :return: dict, training sets with group names as keys and corresponding data as values.
+        :return: DataFrame, the data with a numeric target column where possible.
         """
-        train_sets = {}
-        for group_name, group_data in data.groupby(self.config['description_column']):
-            train_sets[group_name] = group_data.copy()
-        return train_sets
+        target_column = self.config['target_column']
+        if target_column not in data or pd.api.types.is_numeric_dtype(data[target_column]):
+            return data
+        target = pd.to_numeric(data[target_column], errors='coerce')
+        if target.notna().sum() == data[target_column].notna().sum():
+            data[target_column] = target
+        return data
@@ -3,11 +3,62 @@ This module provides a wrapper around the Prophet forecasting library
 to generate forecasts for multiple datasets using a consistent configuration.
 """
 
-from prophet import Prophet
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import copy
+import json
+import os
+import time
+import numpy as np
 import pandas as pd
+from baseline import BaselineEngine
+from hierarchy import Hierarchy
+from model_store import ModelStore
+from worker_pool import WorkerPool
 
 
-class Forecast:
+ENGINES = {'baseline': BaselineEngine}
+
+
+_WORKER_FORECAST = None
+
+
+def _init_worker(config):
+    """
+    Creates the Forecast instance used by a pool worker process, so that its caches
+    are shared by all the groups the process forecasts.
+
+    Parameters
+    ----------
+    config : dict
+        The configuration dictionary used by the parent Forecast instance.
+    """
+    global _WORKER_FORECAST  # pylint: disable=global-statement
+    _WORKER_FORECAST = Forecast({}, config)
+
+
+def _forecast_worker(name, df):
+    """
+    Forecasts a single group inside a pool worker process.
+
+    Parameters
+    ----------
+    name : str
+        The name of the group.
+    df : pd.DataFrame
+        The group's data frame with 'ds' and 'y' columns.
+
+    Returns
+    -------
+    tuple
+        The (forecast, error, timings) triple returned by Forecast.safe_forecast_group.
+    """
+    return _WORKER_FORECAST.safe_forecast_group(name, df)
+
+
+# Forecast is the single entry point of the batch, streaming, serving and hierarchy
+# paths, which share its state and helpers
+class Forecast:  # pylint: disable=too-many-instance-attributes,too-many-public-methods
     """
         A class to generate forecasts using the Prophet algorithm for multiple datasets
         based on a consistent configuration.
@@ -23,21 +74,67 @@ class Forecast:
             The maximum date to be considered for training the model.
         prediction_start : pd.Timestamp
             The date from which the forecasts will be generated.
+        failures : dict
+            Error messages of the groups that could not be forecast in the last run.
+        timings : dict
+            The engine, training row count and fit/predict durations of each group.
+        model_store : ModelStore or None
+            The store of fitted models and parameters, if 'model_cache' or
+            'warm_start' is enabled.
+        model_keys : dict
+            The model store keys of the groups fitted with 'model_cache' enabled.
 
         Methods
         -------
+        get_hierarchy(names):
+            Returns the hierarchy of groups to reconcile, if configured.
+        load_checkpoint(name):
+            Loads the result of a group completed by a resumed run.
+        save_checkpoint(name, result):
+            Checkpoints the result of a completed group.
+        get_model_keys():
+            Returns the model store keys of the forecast groups.
+        get_interval_width(name):
+            Returns the width of the forecast intervals of a group.
         filter_train_data(df):
             Filters the input data frame based on the max_train_date.
-        create_prophet_model(train_data):
+        create_prophet_model(train_data, name):
             Creates and fits a Prophet model on the given train_data.
+        parameter_dims(train_data):
+            Computes the sizes of the seasonality and changepoint parameters of a fit.
+        warm_start_init(name, train_data):
+            Returns the previous parameters of a group as initial values for a fit.
         make_future_dataframe(m):
             Creates a future data frame for the given Prophet model.
+        get_future_grid(last_date):
+            Returns the shared horizon dates following the given last training date.
         get_forecast(m, future):
             Generates the forecast for the given Prophet model and future data frame.
+        forecast_group(name, df):
+            Runs the train/fit/predict steps for a single group.
+        safe_forecast_group(name, df):
+            Runs forecast_group, capturing any error instead of raising it.
+        get_engine(name):
+            Returns the forecasting engine configured for a group.
+        run_prophet(names):
+            Forecasts the given groups with Prophet.
+        create_executor(workers):
+            Creates the pool used to fit Prophet groups concurrently.
+        map_bounded(pool, names, workers):
+            Submits the groups to a pool with a bounded number in flight.
+        run_engine(engine, names):
+            Forecasts the given groups in one batch with a non-Prophet engine.
+        iter_forecasts(names):
+            Forecasts the groups in bounded windows and yields each result.
+        record_result(name, result):
+            Records the timings and the error of a group's result.
+        reconcile(hierarchy, forecasts):
+            Reconciles the forecasts of the groups of a hierarchy.
         run():
-            Generates forecasts for the data frames in data_dict using the Prophet model.
+            Generates forecasts for the data frames in data_dict using the Prophet model
+            or the configured engines.
         """
-    def __init__(self, data_dict, config):
+    def __init__(self, data_dict, config, checkpoint=None):
         """
         Initializes the Forecast class with data and configuration.
 
@@ -48,7 +145,19 @@ class Forecast:
         config : dict
             A configuration dictionary containing the keys 'max_train_date',
             'date_format', 'prediction_start',
-            'predict_periods', and 'period_frequency'.
+            'predict_periods', and 'period_frequency'. The optional keys
+            'forecast_workers' and 'forecast_executor' control parallel fitting,
+            'prophet_params' holds keyword arguments for Prophet, 'model_cache'
+            enables reuse of fitted models and 'warm_start' initializes fits from
+            the previous parameters of each group. 'predict_horizon_only' and
+            'uncertainty_samples' control the cost of predictions. The parameters
+            found by backtest.py in 'best_params_file' override 'prophet_params'
+            per group.
+            If 'hierarchy' is set, related groups are reconciled with the
+            'reconciliation' method and only the groups it needs are fitted.
+        checkpoint : Checkpoint, optional
+            Saves each completed group, and provides the groups completed by an
+            interrupted run that is resumed.
         """
         self.data_dict = data_dict
         self.config = config
@@ -56,6 +165,153 @@ class Forecast:
                                              format=config['date_format'])
         self.prediction_start = pd.to_datetime(config['prediction_start'],
                                                format=config['date_format'])
+        self.failures = {}
+        self.timings = {}
+        self.model_keys = {}
+        self.future_grids = {}
+        self.model_store = ModelStore(config) \
+            if config.get('model_cache') or config.get('warm_start') else None
+        self.best_params = self.load_best_params()
+        self.checkpoint = checkpoint
+        self.checkpointed = checkpoint.load_done() if checkpoint is not None else {}
+
+    def get_hierarchy(self, names):
+        """
+        Returns the hierarchy of groups to reconcile, if 'hierarchy' is configured and
+        all of its groups are being forecast. A hierarchy none of whose groups are
+        forecast, e.g. in an incremental run where they did not change, is skipped
+        without a warning.
+
+        Parameters
+        ----------
+        names : list
+            The names of the groups being forecast.
+
+        Returns
+        -------
+        Hierarchy or None
+            The hierarchy, or None if the groups are forecast independently.
+        """
+        if not self.config.get('hierarchy'):
+            return None
+        hierarchy = Hierarchy(self.config)
+        missing = [node for node in hierarchy.nodes if node not in set(names)]
+        if len(missing) == len(hierarchy.nodes):
+            return None
+        if missing:
+            print(f"Warning: Hierarchy not reconciled, missing groups {', '.join(missing)}")
+            return None
+        return hierarchy
+
+    def load_checkpoint(self, name):
+        """
+        Loads the result of a group completed by the resumed run, if its data is
+        unchanged since it was checkpointed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        tuple or None
+            The (forecast, error, timings) triple of the group, or None if the group
+            has to be forecast.
+        """
+        entry = self.checkpointed.get(name)
+        if entry is None or entry['data_key'] != self.checkpoint.data_key(self.data_dict[name]):
+            return None
+        forecast, timings = self.checkpoint.load(name, entry)
+        return forecast, None, {**(timings or {}), 'resumed': True}
+
+    def save_checkpoint(self, name, result):
+        """
+        Checkpoints the result of a successfully forecast group as it is collected, if
+        checkpointing is enabled. Results loaded from the checkpoint are not saved again.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        result : tuple
+            The (forecast, error, timings) triple of the group.
+
+        Returns
+        -------
+        tuple
+            The result.
+        """
+        forecast, error, timings = result
+        if self.checkpoint is not None and error is None \
+                and not (timings or {}).get('resumed'):
+            self.checkpoint.save(name, forecast, timings, self.data_dict[name])
+        return result
+
+    def get_model_keys(self):
+        """
+        Returns the model store keys of the forecast groups, which are recorded in
+        their timings so that they survive worker processes and checkpoints.
+
+        Returns
+        -------
+        dict
+            The key of the cached model of each group fitted with 'model_cache'.
+        """
+        return {name: timings['model'] for name, timings in self.timings.items()
+                if timings and 'model' in timings}
+
+    def load_best_params(self):
+        """
+        Loads the best Prophet parameters of each group saved by backtest.py.
+
+        Returns
+        -------
+        dict
+            The Prophet parameters by group name; empty if 'best_params_file' is not
+            set or does not exist.
+        """
+        path = self.config.get('best_params_file')
+        if not path or not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as file:
+            return {name: best['params'] for name, best in json.load(file)['groups'].items()}
+
+    def get_prophet_params(self, name=None):
+        """
+        Returns the Prophet parameters of a group: 'prophet_params' updated with the
+        group's backtested parameters, if any.
+
+        Parameters
+        ----------
+        name : str, optional
+            The name of the group.
+
+        Returns
+        -------
+        dict
+            The keyword arguments for Prophet.
+        """
+        return {**self.config.get('prophet_params', {}), **self.best_params.get(name, {})}
+
+    def get_interval_width(self, name):
+        """
+        Returns the width of the forecast intervals of a group. Prophet groups use their
+        backtested parameters, the other engines the global 'prophet_params'.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        float
+            The interval width, 0.8 unless 'interval_width' is configured.
+        """
+        params = self.get_prophet_params(name) if self.get_engine(name) == 'prophet' \
+            else self.config.get('prophet_params', {})
+        return params.get('interval_width', 0.8)
 
     def filter_train_data(self, df):
         """
@@ -73,28 +329,119 @@ class Forecast:
         """
         return df[df['ds'] <= self.max_train_date]
 
-    def create_prophet_model(self, train_data):
+    def create_prophet_model(self, train_data, name=None):
         """
-        Creates and fits a Prophet model on the given train_data.
+        Creates and fits a Prophet model on the given train_data. If the model cache
+        is enabled, a model previously fitted on identical data is reused instead.
+        If warm starting is enabled, the fit is initialized from the parameters of
+        the group's previous fit.
 
         Parameters
         ----------
         train_data : pd.DataFrame
             The input data frame containing the training data.
+        name : str, optional
+            The name of the group, used to look up and store its parameters.
 
         Returns
         -------
         Prophet
             The fitted Prophet model.
         """
-        prophet_model = Prophet()
-        prophet_model.fit(train_data)
+        prophet_params = self.get_prophet_params(name)
+        if self.config.get('model_cache'):
+            key = self.model_store.key(train_data, prophet_params)
+            if name is not None:
+                self.model_keys[name] = key
+            prophet_model = self.model_store.load(key)
+            if prophet_model is not None:
+                return prophet_model
+
+        warm_start = self.config.get('warm_start') and name is not None
+        init = self.warm_start_init(name, train_data, prophet_params) if warm_start else None
+        # Prophet is slow to import, so it is only imported when a model is fitted
+        from prophet import Prophet  # pylint: disable=import-outside-toplevel
+        prophet_model = Prophet(**prophet_params)
+        if init is None:
+            prophet_model.fit(train_data)
+        else:
+            prophet_model.fit(train_data, init=init)
+
+        if self.config.get('model_cache'):
+            self.model_store.save(key, prophet_model)
+        if warm_start:
+            self.model_store.save_params(name, prophet_model, train_data)
         return prophet_model
 
+    def parameter_dims(self, train_data, prophet_params):
+        """
+        Computes the number of seasonality features and changepoints a Prophet fit
+        on the given train_data will have, without fitting it.
+
+        Parameters
+        ----------
+        train_data : pd.DataFrame
+            The input data frame containing the training data.
+        prophet_params : dict
+            The keyword arguments for Prophet.
+
+        Returns
+        -------
+        tuple
+            The lengths of the 'beta' and 'delta' parameters.
+        """
+        from prophet import Prophet  # pylint: disable=import-outside-toplevel
+        probe = Prophet(**prophet_params)
+        history = probe.setup_dataframe(train_data[train_data['y'].notnull()].copy(),
+                                        initialize_scales=True)
+        probe.history = history
+        probe.set_auto_seasonalities()
+        seasonal_features, _, _, _ = probe.make_all_seasonality_features(history)
+        probe.set_changepoints()
+        return seasonal_features.shape[1], len(probe.changepoints_t)
+
+    def warm_start_init(self, name, train_data, prophet_params):
+        """
+        Returns the parameters of the group's previous fit as initial values for
+        the optimizer. A cold fit is used instead when there is no previous fit,
+        when the series no longer starts at the same date or got shorter, or when
+        the parameter shapes changed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        train_data : pd.DataFrame
+            The input data frame containing the training data.
+        prophet_params : dict
+            The keyword arguments for Prophet.
+
+        Returns
+        -------
+        dict or None
+            The initial values for Prophet's fit, or None for a cold fit.
+        """
+        previous = self.model_store.load_params(name)
+        if previous is None:
+            return None
+        if previous['ds_start'] != str(train_data['ds'].min()) \
+                or previous['rows'] > len(train_data):
+            return None
+        init = {param: np.asarray(values) for param, values in previous['params'].items()}
+        dims = self.parameter_dims(train_data, prophet_params)
+        if (len(init['beta']), len(init['delta'])) != dims:
+            return None
+        return init
+
     def make_future_dataframe(self, prophet_model):
         """
         Creates a future data frame for the given Prophet model.
 
+        If 'predict_horizon_only' is enabled, the frame holds only the dates that are
+        kept in the forecast (those on or after prediction_start) instead of the whole
+        history plus horizon, and the horizon dates are shared between groups that end
+        on the same date.
+
         Parameters
         ----------
         prophet_model : Prophet
@@ -105,13 +452,49 @@ class Forecast:
         pd.DataFrame
             The future data frame with dates for which predictions will be made.
         """
-        return prophet_model.make_future_dataframe(periods=self.config['predict_periods'],
-                                                   freq=self.config['period_frequency'])
+        if not self.config.get('predict_horizon_only'):
+            return prophet_model.make_future_dataframe(periods=self.config['predict_periods'],
+                                                       freq=self.config['period_frequency'])
+        history_dates = prophet_model.history_dates
+        future = self.get_future_grid(history_dates.max())
+        history_dates = history_dates[history_dates >= self.prediction_start]
+        if history_dates.empty:
+            return future
+        return pd.concat([history_dates.to_frame(name='ds'), future], ignore_index=True)
+
+    def get_future_grid(self, last_date):
+        """
+        Returns the horizon dates following the given last training date, as generated by
+        Prophet's make_future_dataframe, that are on or after prediction_start. Grids are
+        built once per last date and shared.
+
+        Parameters
+        ----------
+        last_date : pd.Timestamp
+            The last date of the training data.
+
+        Returns
+        -------
+        pd.DataFrame
+            The data frame of horizon dates in a 'ds' column.
+        """
+        if last_date not in self.future_grids:
+            periods = self.config['predict_periods']
+            dates = pd.date_range(start=last_date, periods=periods + 1,
+                                  freq=self.config['period_frequency'])
+            dates = dates[dates > last_date][:periods]
+            self.future_grids[last_date] = pd.DataFrame(
+                {'ds': dates[dates >= self.prediction_start]})
+        return self.future_grids[last_date]
 
     def get_forecast(self, prophet_model, future):
         """
         Generates the forecast for the given Prophet model and future data frame.
 
+        If 'uncertainty_samples' is configured it overrides the model's number of samples
+        used for the intervals; with 0, sampling is skipped and the bounds equal 'yhat'.
+        The override is applied to a copy, since the model may be shared by threads.
+
         Parameters
         ----------
         prophet_model : Prophet
@@ -124,24 +507,378 @@ class Forecast:
         pd.DataFrame
             The forecast data frame containing 'ds', 'yhat', 'yhat_lower', and 'yhat_upper' columns.
         """
+        samples = self.config.get('uncertainty_samples')
+        if samples is not None and samples != prophet_model.uncertainty_samples:
+            prophet_model = copy.copy(prophet_model)
+            prophet_model.uncertainty_samples = samples
         forecast = prophet_model.predict(future)
+        if not prophet_model.uncertainty_samples:
+            forecast['yhat_lower'] = forecast['yhat']
+            forecast['yhat_upper'] = forecast['yhat']
         return forecast[forecast['ds'] >= self.prediction_start]
 
+    def forecast_group(self, name, df):
+        """
+        Runs the train/fit/predict steps for a single group and records their
+        timings in timings.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        df : pd.DataFrame
+            The group's data frame with 'ds' and 'y' columns.
+
+        Returns
+        -------
+        pd.DataFrame
+            The forecast data frame containing 'ds', 'yhat', 'yhat_lower', and 'yhat_upper' columns.
+        """
+        fit_start = time.perf_counter()
+        train_data = self.filter_train_data(df)
+        prophet_model = self.create_prophet_model(train_data, name)
+        predict_start = time.perf_counter()
+        future = self.make_future_dataframe(prophet_model)
+        forecast = self.get_forecast(prophet_model, future)
+        self.timings[name] = {'engine': 'prophet',
+                              'rows': len(train_data),
+                              'fit_s': predict_start - fit_start,
+                              'predict_s': time.perf_counter() - predict_start}
+        if name in self.model_keys:
+            self.timings[name]['model'] = self.model_keys[name]
+        return forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+
+    def safe_forecast_group(self, name, df):
+        """
+        Runs forecast_group, capturing any error so that a single bad group
+        does not abort the whole batch.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        df : pd.DataFrame
+            The group's data frame with 'ds' and 'y' columns.
+
+        Returns
+        -------
+        tuple
+            (forecast, None, timings) on success, or (None, error message, timings)
+            on failure; timings is None if the group failed before predicting.
+        """
+        try:
+            return self.forecast_group(name, df), None, self.timings.get(name)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            return None, f"{type(error).__name__}: {error}", self.timings.get(name)
+
+    def get_workers(self):
+        """
+        Returns the number of workers to fit models with.
+
+        Returns
+        -------
+        int
+            The configured 'forecast_workers', or the CPU count when it is 0 or null.
+        """
+        workers = self.config.get('forecast_workers', 1)
+        return workers if workers else os.cpu_count()
+
+    def get_engine(self, name):
+        """
+        Returns the forecasting engine configured for a group.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        str
+            The group's entry in 'engines', or the global 'engine' ('prophet' by default).
+        """
+        engine = self.config.get('engines', {}).get(name, self.config.get('engine', 'prophet'))
+        if engine != 'prophet' and engine not in ENGINES:
+            raise ValueError(f"Unknown forecast engine {engine} for {name}")
+        return engine
+
+    def run_prophet(self, names):
+        """
+        Forecasts the given groups with Prophet, concurrently if more than one worker
+        is configured.
+
+        Parameters
+        ----------
+        names : list
+            The names of the groups to forecast.
+
+        Returns
+        -------
+        dict
+            (forecast, error, timings) triples by group name.
+        """
+        workers = self.get_workers()
+        if workers > 1 and len(names) > 1:
+            workers = min(workers, len(names))
+            pool = WorkerPool(lambda: self.create_executor(workers))
+            try:
+                results = self.map_bounded(pool, names, workers)
+                results = dict(zip(names, map(self.save_checkpoint, names, results)))
+            finally:
+                pool.shutdown()
+        else:
+            results = {name: self.save_checkpoint(
+                name, self.safe_forecast_group(name, self.data_dict[name])) for name in names}
+        return results
+
+    def create_executor(self, workers):
+        """
+        Creates the pool used to fit Prophet groups concurrently.
+
+        Parameters
+        ----------
+        workers : int
+            The number of workers.
+
+        Returns
+        -------
+        tuple
+            The executor, a process pool or a thread pool if 'forecast_executor' is
+            'thread', and the function to submit for each group.
+        """
+        if self.config.get('forecast_executor', 'process') == 'thread':
+            return ThreadPoolExecutor(max_workers=workers), self.safe_forecast_group
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(self.config,)), _forecast_worker
+
+    def map_bounded(self, pool, names, workers):
+        """
+        Submits the groups to the pool, reading each group's data only when it is
+        submitted. With 'max_in_flight' set (twice the workers by default in
+        'out_of_core' mode), at most that many groups are submitted and not yet
+        collected, which bounds the number of groups held in memory. If a worker
+        process dies, the groups not completed by then are retried once in a new pool.
+
+        Parameters
+        ----------
+        pool : WorkerPool
+            The pool to submit to.
+        names : list
+            The names of the groups.
+        workers : int
+            The number of workers of the pool.
+
+        Yields
+        ------
+        tuple
+            The result of each group, in the order of names.
+        """
+        max_in_flight = self.config.get('max_in_flight') or \
+            (2 * workers if self.config.get('out_of_core') else len(names))
+        pending = deque()
+        for name in names:
+            pool.submit(pending, name, self.data_dict)
+            if len(pending) >= max_in_flight:
+                yield pool.collect(pending, self.data_dict)[1]
+        while pending:
+            yield pool.collect(pending, self.data_dict)[1]
+
+    def run_engine(self, engine, names):
+        """
+        Forecasts the given groups in one batch with a non-Prophet engine.
+
+        Parameters
+        ----------
+        engine : str
+            The name of the engine in ENGINES.
+        names : list
+            The names of the groups to forecast.
+
+        Returns
+        -------
+        dict
+            (forecast, error, timings) triples by group name. The timings hold the
+            duration and size of the whole batch.
+        """
+        train_sets = {name: self.filter_train_data(self.data_dict[name]) for name in names}
+        start = time.perf_counter()
+        try:
+            results = ENGINES[engine](self.config).forecast(train_sets, self.get_future_grid)
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            results = {name: (None, f"{type(error).__name__}: {error}") for name in names}
+        batch_s = time.perf_counter() - start
+        return {name: (forecast, error, {'engine': engine,
+                                         'rows': len(train_sets[name]),
+                                         'batch_s': batch_s,
+                                         'batch_size': len(names)})
+                for name, (forecast, error) in results.items()}
+
+    def iter_forecasts(self, names=None):
+        """
+        Forecasts the groups one window at a time and yields each result as soon as it
+        is collected, so that callers can report and store a group and release it before
+        the next ones are read. At most 'max_in_flight' groups (twice the workers by
+        default) are read and not yet yielded. Prophet groups are fitted by one pool that
+        is reused for all windows, and groups of other engines are forecast in batches
+        of the window size. Results are recorded in timings and failures and
+        checkpointed as in run.
+
+        Parameters
+        ----------
+        names : list, optional
+            The names of the groups to forecast, defaults to all groups in data_dict.
+
+        Yields
+        ------
+        tuple
+            The name, forecast and error of each group; the forecast is None and the
+            error a message if the group failed.
+        """
+        names = list(self.data_dict.keys()) if names is None else names
+        workers = self.get_workers()
+        window = self.config.get('max_in_flight') or 2 * workers
+        pool = WorkerPool(lambda: self.create_executor(workers)) if workers > 1 else None
+        pending = deque()
+        batches = {}
+
+        def collect(results):
+            for name, result in results:
+                yield name, *self.record_result(name, self.save_checkpoint(name, result))
+
+        try:
+            for name in names:
+                result = self.load_checkpoint(name) if self.checkpointed else None
+                engine = self.get_engine(name)
+                if result is not None:
+                    yield from collect([(name, result)])
+                elif engine != 'prophet':
+                    batch = batches.setdefault(engine, [])
+                    batch.append(name)
+                    if len(batch) >= window:
+                        yield from collect(self.run_engine(engine, batches.pop(engine)).items())
+                elif pool is None:
+                    yield from collect([(name, self.safe_forecast_group(name,
+                                                                        self.data_dict[name]))])
+                else:
+                    pool.submit(pending, name, self.data_dict)
+                    while len(pending) >= window or pool.first_done(pending):
+                        yield from collect([pool.collect(pending, self.data_dict)])
+            for engine, batch in batches.items():
+                yield from collect(self.run_engine(engine, batch).items())
+            while pending:
+                yield from collect([pool.collect(pending, self.data_dict)])
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        if self.model_store is not None:
+            self.model_store.prune()
+
     def run(self):
         """
-        Generates forecasts for the data frames in data_dict using the Prophet model.
+        Generates forecasts for the data frames in data_dict using the Prophet model,
+        or the engine configured for each group in 'engine'/'engines'.
+
+        With more than one worker configured, Prophet groups are fitted concurrently in a
+        process pool (or a thread pool if 'forecast_executor' is 'thread'), while groups of
+        other engines are fitted together in one batch. Groups that fail are reported,
+        recorded in failures and left out of the result. Groups of a configured hierarchy
+        are reconciled after fitting the groups its method needs. With a checkpoint, each group is
+        saved as soon as it completes, and the groups completed by a resumed run are
+        loaded instead of forecast again.
 
         Returns
         -------
         dict
             A dictionary containing the forecasts with 'ds', 'yhat',
-            'yhat_lower', and 'yhat_upper' columns.
+            'yhat_lower', and 'yhat_upper' columns, in the order of data_dict.
         """
+        names = list(self.data_dict.keys())
+        hierarchy = self.get_hierarchy(names)
+        derived = set(hierarchy.nodes) - set(hierarchy.get_fit_names()) if hierarchy else set()
+        names_by_engine = {}
+        results = {}
+        for name in names:
+            if name in derived:
+                continue
+            result = self.load_checkpoint(name) if self.checkpointed else None
+            if result is not None:
+                results[name] = result
+                continue
+            names_by_engine.setdefault(self.get_engine(name), []).append(name)
+
+        for engine, engine_names in names_by_engine.items():
+            if engine == 'prophet':
+                results.update(self.run_prophet(engine_names))
+            else:
+                engine_results = self.run_engine(engine, engine_names)
+                results.update({name: self.save_checkpoint(name, result)
+                                for name, result in engine_results.items()})
+
         forecasts = {}
-        for name, df in self.data_dict.items():
-            train_data = self.filter_train_data(df)
-            prophet_model = self.create_prophet_model(train_data)
-            future = self.make_future_dataframe(prophet_model)
-            forecast = self.get_forecast(prophet_model, future)
-            forecasts[name] = forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+        self.failures = {}
+        for name in names:
+            if name in derived:
+                continue
+            forecast, error = self.record_result(name, results[name])
+            if error is None:
+                forecasts[name] = forecast
+
+        if hierarchy is not None:
+            forecasts.update(self.reconcile(hierarchy, forecasts))
+            forecasts = {name: forecasts[name] for name in names if name in forecasts}
+        if self.model_store is not None:
+            self.model_store.prune()
         return forecasts
+
+    def record_result(self, name, result):
+        """
+        Records the timings of a group's result, and its error if the group failed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        result : tuple
+            The (forecast, error, timings) triple of the group.
+
+        Returns
+        -------
+        tuple
+            The forecast and the error of the group.
+        """
+        forecast, error, timings = result
+        if timings is not None:
+            self.timings[name] = timings
+        if error is not None:
+            print(f"Warning: Forecast failed for {name}: {error}")
+            self.failures[name] = error
+        return forecast, error
+
+    def reconcile(self, hierarchy, forecasts):
+        """
+        Reconciles the forecasts of the groups of a hierarchy.
+
+        Parameters
+        ----------
+        hierarchy : Hierarchy
+            The hierarchy of groups.
+        forecasts : dict
+            The forecasts of the fitted groups.
+
+        Returns
+        -------
+        dict
+            The reconciled forecasts of all groups of the hierarchy.
+        """
+        train_sets = {name: self.filter_train_data(self.data_dict[name])
+                      for name in hierarchy.leaves} if hierarchy.method == 'top_down' else {}
+        widths = {name: self.get_interval_width(name) for name in hierarchy.nodes}
+        reconciled = hierarchy.reconcile(forecasts, train_sets, widths)
+        fit_names = set(hierarchy.get_fit_names())
+        for name in reconciled:
+            if name not in fit_names:
+                self.timings[name] = {'engine': f'reconciled ({hierarchy.method})'}
+            elif name in self.timings:
+                # The reconciled forecast no longer matches the group's model
+                self.timings[name].pop('model', None)
+        return reconciled
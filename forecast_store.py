@@ -0,0 +1,378 @@
+"""
+This module provides the ForecastStore class, a persistent columnar store of the
+forecasts of every run. Forecasts are written as Parquet files partitioned by run
+and group, and an index of the runs and groups lets queries open only the partition
+they need and filter its rows by date while reading.
+
+Example:
+    store = ForecastStore(config)
+    store.write(run_id, forecasts)
+    forecast = store.get_forecast('Coal Consumption', '2023-01-01', '2023-12-01')
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+import pandas as pd
+from storage import atomic_write, name_key
+
+
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+class ForecastStore:
+    """
+    A directory of Parquet forecast partitions laid out as
+    "run=<run id>/group=<group key>/forecast.parquet", with an "index.json" file in
+    every run folder.
+
+    Attributes
+    ----------
+    config : dict
+        A configuration dictionary. The optional key 'forecast_store_dir' sets the
+        location of the store and 'forecast_store_max_runs' the number of runs kept.
+    directory : str
+        The folder the forecasts are stored in.
+    indexes : dict
+        The parsed run indexes with the modification time of their file, by run.
+
+    Methods
+    -------
+    write(run_id, forecasts, model_keys=None):
+        Stores the forecasts of a run and adds them to the index.
+    write_group(run_id, name, forecast, model_key=None):
+        Stores the forecast of one group of a run.
+    add_run(run_id, groups):
+        Writes the index of a run whose groups are stored and prunes old runs.
+    prune():
+        Removes the runs beyond the retention limit.
+    get_runs():
+        Returns the identifiers of the stored runs, oldest first.
+    get_groups(run=None):
+        Returns the group names stored for a run.
+    get_model_keys(run=None):
+        Returns the model store keys of the groups of a run.
+    get_entries(run=None):
+        Returns the index entries of the groups of a run.
+    get_latest_runs():
+        Returns the latest run storing each group.
+    get_forecast(group, start=None, end=None, run=None):
+        Reads the forecast of a group, optionally limited to a date range.
+    """
+
+    def __init__(self, config):
+        """
+        Initializes the ForecastStore.
+
+        Parameters
+        ----------
+        config : dict
+            A configuration dictionary.
+        """
+        self.config = config
+        self.directory = config.get('forecast_store_dir', 'Forecasts')
+        self.indexes = {}
+
+    @staticmethod
+    def partition_key(name):
+        """
+        Returns the directory-safe partition key of a group name.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        str
+            A short hex digest of the name.
+        """
+        return name_key(name)
+
+    def get_path(self, run_id, name):
+        """
+        Returns the path of the partition of a group in a run.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        str
+            The path of the Parquet file.
+        """
+        return os.path.join(self.directory, f'run={run_id}',
+                            f'group={self.partition_key(name)}', 'forecast.parquet')
+
+    def get_index_path(self, run_id):
+        """
+        Returns the path of the index of a run.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+
+        Returns
+        -------
+        str
+            The path of the run's index file.
+        """
+        return os.path.join(self.directory, f'run={run_id}', 'index.json')
+
+    def read_index(self, run_id):
+        """
+        Reads the index of a run. Parsed indexes are cached and only read again when
+        their file changes.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+
+        Returns
+        -------
+        dict
+            The creation time of the run and its groups, which map to their partition
+            key, row count, first and last forecast date and model key. None if the run
+            is not stored.
+        """
+        path = self.get_index_path(run_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self.indexes.pop(run_id, None)
+            return None
+        cached = self.indexes.get(run_id)
+        if cached is None or cached[0] != mtime:
+            with open(path, encoding='utf-8') as file:
+                cached = (mtime, json.load(file))
+            self.indexes[run_id] = cached
+        return cached[1]
+
+    def get_run_dirs(self):
+        """
+        Returns the identifiers of the runs with a folder in the store, including runs
+        whose index has not been written.
+
+        Returns
+        -------
+        list
+            The run identifiers, oldest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(entry[len('run='):] for entry in os.listdir(self.directory)
+                      if entry.startswith('run='))
+
+    def write(self, run_id, forecasts, model_keys=None):
+        """
+        Stores the forecasts of a run, one partition per group, and adds them to the
+        index once all partitions are written.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+        forecasts : dict
+            A dictionary of forecast data frames by group name.
+        model_keys : dict, optional
+            The model store keys of the groups whose fitted models are cached.
+        """
+        model_keys = model_keys or {}
+        groups = {name: self.write_group(run_id, name, forecast, model_keys.get(name))
+                  for name, forecast in forecasts.items()}
+        self.add_run(run_id, groups)
+
+    def write_group(self, run_id, name, forecast, model_key=None):
+        """
+        Stores the forecast of one group of a run. The group is only visible to queries
+        once the run is added to the index.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+        name : str
+            The name of the group.
+        forecast : pd.DataFrame
+            The forecast of the group.
+        model_key : str, optional
+            The model store key of the group's fitted model, if it is cached.
+
+        Returns
+        -------
+        dict
+            The index entry of the group.
+        """
+        path = self.get_path(run_id, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        forecast = forecast[FORECAST_COLUMNS]
+        forecast.to_parquet(path, index=False)
+        entry = {'key': self.partition_key(name),
+                 'rows': len(forecast),
+                 'start': str(forecast['ds'].min()),
+                 'end': str(forecast['ds'].max())}
+        if model_key is not None:
+            entry['model'] = model_key
+        return entry
+
+    def add_run(self, run_id, groups):
+        """
+        Writes the index of a run, making its groups visible to queries, and removes
+        the runs beyond the retention limit.
+
+        Parameters
+        ----------
+        run_id : str
+            The identifier of the run.
+        groups : dict
+            The index entries of the stored groups by name.
+        """
+        path = self.get_index_path(run_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as file:
+            json.dump({'created': datetime.now().isoformat(timespec='seconds'),
+                       'groups': groups}, file, indent=2)
+        self.prune()
+
+    def prune(self):
+        """
+        Removes the oldest runs beyond 'forecast_store_max_runs', together with the
+        unfinished runs older than the runs kept.
+        """
+        max_runs = self.config.get('forecast_store_max_runs')
+        if not max_runs:
+            return
+        runs = self.get_runs()
+        if len(runs) <= max_runs:
+            return
+        oldest_kept = runs[-max_runs]
+        for run_id in self.get_run_dirs():
+            if run_id < oldest_kept:
+                shutil.rmtree(os.path.join(self.directory, f'run={run_id}'),
+                              ignore_errors=True)
+                self.indexes.pop(run_id, None)
+
+    def get_runs(self):
+        """
+        Returns the identifiers of the stored runs.
+
+        Returns
+        -------
+        list
+            The run identifiers, oldest first.
+        """
+        return [run_id for run_id in self.get_run_dirs()
+                if os.path.exists(self.get_index_path(run_id))]
+
+    def get_groups(self, run=None):
+        """
+        Returns the group names stored for a run.
+
+        Parameters
+        ----------
+        run : str
+            The identifier of the run, defaults to the latest run.
+
+        Returns
+        -------
+        list
+            The group names.
+        """
+        return list(self.get_entries(run))
+
+    def get_model_keys(self, run=None):
+        """
+        Returns the model store keys of the groups of a run, which identify the
+        fitted models the forecasts were predicted with.
+
+        Parameters
+        ----------
+        run : str
+            The identifier of the run, defaults to the latest run.
+
+        Returns
+        -------
+        dict
+            The model key by group name, for the groups whose model is cached.
+        """
+        return {name: entry['model'] for name, entry in self.get_entries(run).items()
+                if 'model' in entry}
+
+    def get_entries(self, run=None):
+        """
+        Returns the index entries of the groups of a run.
+
+        Parameters
+        ----------
+        run : str
+            The identifier of the run, defaults to the latest run.
+
+        Returns
+        -------
+        dict
+            The index entries by group name, empty if the run is not stored.
+        """
+        if run is None:
+            runs = self.get_runs()
+            if not runs:
+                return {}
+            run = runs[-1]
+        index = self.read_index(run)
+        return index['groups'] if index is not None else {}
+
+    def get_latest_runs(self):
+        """
+        Returns the latest run storing each group, so that groups missing from later
+        runs are still served from the run that last forecast them.
+
+        Returns
+        -------
+        dict
+            The run identifier by group name.
+        """
+        latest = {}
+        for run_id in self.get_runs():
+            latest.update(dict.fromkeys(self.get_entries(run_id), run_id))
+        return latest
+
+    def get_forecast(self, group, start=None, end=None, run=None):
+        """
+        Reads the forecast of a group. Only the partition of the group is opened, and
+        the date range is pushed down to the Parquet reader.
+
+        Parameters
+        ----------
+        group : str
+            The name of the group.
+        start : str or datetime
+            The first forecast date to return, defaults to the first stored date.
+        end : str or datetime
+            The last forecast date to return, defaults to the last stored date.
+        run : str
+            The identifier of the run, defaults to the latest run containing the group.
+
+        Returns
+        -------
+        pd.DataFrame
+            The 'ds', 'yhat', 'yhat_lower' and 'yhat_upper' columns of the forecast.
+        """
+        if run is None:
+            run = next((run_id for run_id in reversed(self.get_runs())
+                        if group in self.get_entries(run_id)), None)
+        if run is None or group not in self.get_entries(run):
+            raise ValueError(f"No forecast stored for {group} in run {run}")
+
+        filters = []
+        if start is not None:
+            filters.append(('ds', '>=', pd.Timestamp(start)))
+        if end is not None:
+            filters.append(('ds', '<=', pd.Timestamp(end)))
+        return pd.read_parquet(self.get_path(run, group), filters=filters or None)
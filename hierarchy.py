@@ -0,0 +1,244 @@
+"""
+This module provides the Hierarchy class, which reconciles the forecasts of related
+series, such as a total and its components, so that they add up. Only the series at
+the aggregation levels needed by the reconciliation method are fitted; the others
+are derived from them with matrix operations over all dates at once.
+"""
+
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+
+
+RECONCILIATION_METHODS = ('bottom_up', 'top_down', 'mint')
+
+
+class Hierarchy:
+    """
+        A hierarchy of groups defined by the 'hierarchy' configuration, a dictionary
+        mapping each parent group to the list of its child groups. Children may be
+        parents themselves; groups without children are the bottom level.
+
+        The 'reconciliation' method decides which groups are fitted:
+
+        - 'bottom_up' fits the bottom level and sums it up the hierarchy.
+        - 'top_down' fits the top level and splits it down by the historical share
+          of each bottom level group in its top level group.
+        - 'mint' fits every group and combines all forecasts with weighted least
+          squares, weighting each group by the inverse variance implied by the width
+          of its forecast intervals (MinT with a diagonal covariance).
+
+        Attributes
+        ----------
+        config : dict
+            A configuration dictionary.
+        method : str
+            The reconciliation method, one of RECONCILIATION_METHODS.
+        nodes : list
+            All groups of the hierarchy, parents first.
+        leaves : list
+            The bottom level groups.
+        roots : list
+            The top level groups.
+        summing_matrix : np.ndarray
+            A (nodes, leaves) matrix whose rows sum the bottom level into each group.
+
+        Methods
+        -------
+        get_fit_names():
+            Returns the groups that have to be fitted.
+        get_proportions(train_sets):
+            Returns the historical shares of the bottom level groups.
+        combine(yhat, sigma, train_sets):
+            Combines the fitted forecasts with the reconciliation method.
+        reconcile(forecasts, train_sets, widths=None):
+            Returns the reconciled forecasts of all groups of the hierarchy.
+        """
+    def __init__(self, config):
+        """
+        Initializes the Hierarchy class with the configuration.
+
+        Parameters
+        ----------
+        config : dict
+            A configuration dictionary containing the key 'hierarchy' and optionally
+            'reconciliation' ('mint' by default). Every group may have one parent
+            at most.
+        """
+        self.config = config
+        self.method = config.get('reconciliation') or 'mint'
+        if self.method not in RECONCILIATION_METHODS:
+            raise ValueError(f"Unknown reconciliation method {self.method}")
+        self.children = config['hierarchy']
+        child_names = [child for children in self.children.values() for child in children]
+        # A group under two parents would be counted twice in the sums and shares
+        shared = sorted({child for child in child_names if child_names.count(child) > 1})
+        if shared:
+            raise ValueError(f"Groups with more than one parent: {', '.join(shared)}")
+        self.nodes = list(dict.fromkeys([*self.children, *child_names]))
+        self.leaves = [node for node in self.nodes if node not in self.children]
+        self.roots = [node for node in self.nodes if node not in set(child_names)]
+        if not self.roots:
+            raise ValueError("The hierarchy has no top level group")
+        self.summing_matrix = self.build_summing_matrix()
+
+    def build_summing_matrix(self):
+        """
+        Builds the summing matrix of the hierarchy.
+
+        Returns
+        -------
+        np.ndarray
+            A (nodes, leaves) matrix of ones where a bottom level group belongs to a
+            group, and zeros elsewhere.
+        """
+        leaf_index = {leaf: column for column, leaf in enumerate(self.leaves)}
+        matrix = np.zeros((len(self.nodes), len(self.leaves)))
+
+        def descendants(node, path):
+            if node in path:
+                raise ValueError(f"The hierarchy contains a cycle through {node}")
+            if node not in self.children:
+                return [node]
+            return [leaf for child in self.children[node]
+                    for leaf in descendants(child, path | {node})]
+
+        for row, node in enumerate(self.nodes):
+            matrix[row, [leaf_index[leaf] for leaf in descendants(node, set())]] = 1.0
+        return matrix
+
+    def get_fit_names(self):
+        """
+        Returns the groups that have to be fitted with the reconciliation method.
+
+        Returns
+        -------
+        list
+            The group names.
+        """
+        if self.method == 'bottom_up':
+            return list(self.leaves)
+        if self.method == 'top_down':
+            return list(self.roots)
+        return list(self.nodes)
+
+    def get_proportions(self, train_sets):
+        """
+        Returns the share of each bottom level group in its top level group, as the
+        ratio of its average historical value to the sum of the averages of all bottom
+        level groups of the top level group. The averages are taken over the dates all
+        these groups share, so that groups with longer histories do not skew the
+        shares, and the shares of each top level group add up to one.
+
+        Parameters
+        ----------
+        train_sets : Mapping
+            The training data frames of the bottom level groups.
+
+        Returns
+        -------
+        np.ndarray
+            A (leaves, roots) matrix of shares.
+        """
+        proportions = np.zeros((len(self.leaves), len(self.roots)))
+        for column, root in enumerate(self.roots):
+            leaf_columns = np.flatnonzero(self.summing_matrix[self.nodes.index(root)])
+            frames = [train_sets[self.leaves[leaf_column]] for leaf_column in leaf_columns]
+            dates = frames[0]['ds'].to_numpy()
+            for frame in frames[1:]:
+                dates = np.intersect1d(dates, frame['ds'].to_numpy())
+            if dates.size == 0:
+                print(f"Warning: The bottom level groups of {root} share no dates, "
+                      "their shares are taken over all of their dates")
+            means = np.array([np.nanmean(frame['y'].to_numpy()[frame['ds'].isin(dates)])
+                              if dates.size else np.nanmean(frame['y'].to_numpy())
+                              for frame in frames])
+            total = np.nansum(means)
+            proportions[leaf_columns, column] = \
+                np.nan_to_num(means) / total if total else 1.0 / len(leaf_columns)
+        return proportions
+
+    def combine(self, yhat, sigma, train_sets):
+        """
+        Combines the forecasts of the fitted groups into forecasts of all groups with
+        the reconciliation method.
+
+        Parameters
+        ----------
+        yhat : np.ndarray
+            A (fitted groups, dates) array of forecasts.
+        sigma : np.ndarray
+            A (fitted groups, dates) array of forecast standard deviations.
+        train_sets : Mapping
+            The training data frames of the bottom level groups, used by 'top_down'.
+
+        Returns
+        -------
+        tuple
+            The (nodes, dates) arrays of reconciled forecasts and standard deviations.
+        """
+        summing = self.summing_matrix
+        if self.method == 'bottom_up':
+            return summing @ yhat, np.sqrt(summing @ sigma ** 2)
+        if self.method == 'top_down':
+            # Every group is a fixed share of its top level group, so the standard
+            # deviations scale linearly instead of adding up in quadrature
+            shares = summing @ self.get_proportions(train_sets)
+            return shares @ yhat, shares @ sigma
+        variances = (sigma ** 2).mean(axis=1)
+        if not np.all(variances > 0):
+            variances = np.ones(len(variances))
+        weighted = summing.T / variances
+        projection = summing @ np.linalg.solve(weighted @ summing, weighted)
+        return projection @ yhat, np.sqrt(projection ** 2 @ sigma ** 2)
+
+    def reconcile(self, forecasts, train_sets, widths=None):
+        """
+        Returns the reconciled forecasts of all groups of the hierarchy, on the dates
+        forecast for all fitted groups. The intervals are derived from the standard
+        deviations implied by the fitted intervals, assuming independent errors.
+
+        Parameters
+        ----------
+        forecasts : dict
+            The forecasts of the fitted groups, with 'ds', 'yhat', 'yhat_lower' and
+            'yhat_upper' columns.
+        train_sets : Mapping
+            The training data frames by group name; 'top_down' uses those of the
+            bottom level groups.
+        widths : dict, optional
+            The interval width of each group, by name. Groups without one use the
+            'interval_width' of 'prophet_params' (0.8 by default).
+
+        Returns
+        -------
+        dict
+            The reconciled forecasts by group name, or an empty dictionary if some
+            fitted groups have no forecast or they share no dates.
+        """
+        fit_names = self.get_fit_names()
+        missing = [name for name in fit_names if name not in forecasts]
+        if missing:
+            print(f"Warning: Hierarchy not reconciled, no forecast for {', '.join(missing)}")
+            return {}
+        dates = forecasts[fit_names[0]]['ds'].to_numpy()
+        for name in fit_names[1:]:
+            dates = np.intersect1d(dates, forecasts[name]['ds'].to_numpy())
+        if dates.size == 0:
+            print("Warning: Hierarchy not reconciled, the forecasts share no dates")
+            return {}
+
+        frames = [forecasts[name].set_index('ds').loc[dates] for name in fit_names]
+        yhat = np.stack([frame['yhat'].to_numpy() for frame in frames])
+        default_width = self.config.get('prophet_params', {}).get('interval_width', 0.8)
+        z_scores = {name: NormalDist().inv_cdf(0.5 + (widths or {}).get(name, default_width) / 2)
+                    for name in self.nodes}
+        sigma = np.stack([(frame['yhat_upper'] - frame['yhat_lower']).to_numpy()
+                          / (2 * z_scores[name]) for name, frame in zip(fit_names, frames)])
+
+        reconciled, sigma = self.combine(yhat, sigma, train_sets)
+        return {name: pd.DataFrame({'ds': dates,
+                                    'yhat': reconciled[row],
+                                    'yhat_lower': reconciled[row] - z_scores[name] * sigma[row],
+                                    'yhat_upper': reconciled[row] + z_scores[name] * sigma[row]})
+                for row, name in enumerate(self.nodes)}
@@ -0,0 +1,226 @@
+"""
+This module contains the Instrumentation class, which records the wall time, CPU
+time and peak memory of each pipeline stage together with per-series timings, and
+writes them as a JSON run record.
+
+Example:
+    instrumentation = Instrumentation(run_id)
+    with instrumentation.stage('extract'):
+        ...
+    instrumentation.write('Runs')
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def get_peak_rss_mb(children=False):
+    """
+    Returns the peak resident set size of this process, or of its terminated
+    child processes, in megabytes.
+
+    Args:
+        children (bool): Whether to return the peak of the reaped child processes
+            (e.g. forecast pool workers) instead of this process.
+
+    Returns:
+        float: The peak RSS in MB, or None if it cannot be determined.
+    """
+    if resource is not None:
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if sys.platform == 'win32' and not children:
+        return _get_windows_peak_rss_mb()
+    return None
+
+
+def reset_peak_rss():
+    """
+    Resets the peak resident set size of this process, so that get_peak_rss_mb
+    returns the peak reached since. This is only supported on Linux.
+
+    Returns:
+        bool: Whether the peak was reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w', encoding='ascii') as file:
+            file.write('5')
+    except OSError:
+        return False
+    return True
+
+
+@contextmanager
+def track_peak_rss():
+    """
+    Measures the peak RSS of this process and of its child processes during the
+    enclosed block.
+
+    The peak of this process is reset when the block starts, where the platform
+    allows it. The peak of the child processes cannot be reset, so it is only
+    attributed to the block if its children exceeded the peak of all earlier
+    children; the same applies to this process where the peak cannot be reset.
+    Peaks that cannot be attributed to the block are None.
+
+    Yields:
+        dict: Filled with 'peak_rss_mb' and 'children_peak_rss_mb' when the block exits.
+    """
+    memory = {}
+    peak_before = get_peak_rss_mb() or 0
+    children_peak_before = get_peak_rss_mb(children=True) or 0
+    reset = reset_peak_rss()
+    try:
+        yield memory
+    finally:
+        peak = get_peak_rss_mb()
+        children_peak = get_peak_rss_mb(children=True)
+        memory['peak_rss_mb'] = round(peak, 1) \
+            if peak is not None and (reset or peak > peak_before) else None
+        memory['children_peak_rss_mb'] = round(children_peak, 1) \
+            if children_peak is not None and children_peak > children_peak_before else None
+
+
+def _get_windows_peak_rss_mb():
+    # pylint: disable=import-outside-toplevel
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):  # pylint: disable=too-few-public-methods
+        """
+        The PROCESS_MEMORY_COUNTERS structure filled by GetProcessMemoryInfo.
+        """
+
+        _fields_ = [('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters(cb=ctypes.sizeof(ProcessMemoryCounters))
+    get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+    get_current_process.restype = wintypes.HANDLE
+    get_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+    get_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters),
+                                wintypes.DWORD]
+    if not get_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize / (1024 * 1024)
+
+
+class Instrumentation:
+    """
+    A class used to record timings and memory usage of a pipeline run.
+
+    Attributes:
+        run_id (str): The identifier of the run.
+        resumed_from (str): The identifier of the interrupted run it resumes, or None.
+        stages (list): One record per completed stage, in execution order.
+        series (dict): Per-series timings and row counts by group name.
+        failures (dict): Error messages of the groups that failed.
+    """
+
+    def __init__(self, run_id, resumed_from=None):
+        """
+        Initializes a new instance of the Instrumentation class.
+
+        Args:
+            run_id (str): The identifier of the run.
+            resumed_from (str): The identifier of the interrupted run it resumes.
+        """
+
+        self.run_id = run_id
+        self.resumed_from = resumed_from
+        self.started = datetime.now()
+        self.stages = []
+        self.series = {}
+        self.failures = {}
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Records the wall time, CPU time and peak RSS of the enclosed block.
+
+        CPU time includes child processes that terminated during the stage. Peak RSS
+        values are measured by track_peak_rss, as the peaks of this process and of
+        the child processes (e.g. pool workers) during the stage.
+
+        Args:
+            name (str): The name of the stage.
+
+        Yields:
+            dict: The stage record, to which the caller can add details such as counts.
+        """
+
+        record = {'stage': name}
+        wall_start = time.perf_counter()
+        times_start = os.times()
+        memory = {}
+        try:
+            with track_peak_rss() as memory:
+                yield record
+        finally:
+            times_end = os.times()
+            cpu_s = (times_end.user + times_end.system
+                     - times_start.user - times_start.system)
+            children_cpu_s = (times_end.children_user + times_end.children_system
+                              - times_start.children_user - times_start.children_system)
+            record['wall_s'] = round(time.perf_counter() - wall_start, 4)
+            record['cpu_s'] = round(max(cpu_s, 0.0), 4)
+            record['children_cpu_s'] = round(max(children_cpu_s, 0.0), 4)
+            record.update(memory)
+            self.stages.append(record)
+
+    def to_dict(self):
+        """
+        Returns the run record.
+
+        Returns:
+            dict: The run identifier, the run it resumes, start time, stage records,
+                per-series timings, failures and the ten slowest series.
+        """
+
+        def series_time(item):
+            timings = item[1]
+            return (timings.get('fit_s') or 0) + (timings.get('predict_s') or 0)
+
+        slowest = sorted(self.series.items(), key=series_time, reverse=True)[:10]
+        return {'run_id': self.run_id,
+                'resumed_from': self.resumed_from,
+                'started': self.started.isoformat(timespec='seconds'),
+                'stages': self.stages,
+                'series': self.series,
+                'failures': self.failures,
+                'slowest_series': [name for name, _ in slowest]}
+
+    def write(self, directory):
+        """
+        Writes the run record as JSON to "{run_id}.json" in the given directory.
+
+        Args:
+            directory (str): The folder for run records, created if needed.
+
+        Returns:
+            str: The path of the written file.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{self.run_id}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2, default=str)
+        return path
@@ -0,0 +1,199 @@
+"""
+This module load tests the forecast server of serve.py. Worker threads send forecast
+requests for the served groups over persistent HTTP/1.1 connections, and the median
+and tail latencies and the requests per second are reported. Results can be saved
+as JSON to compare configurations.
+
+Example:
+    python serve.py --port 8000
+    python loadtest.py --port 8000 --requests 5000 --concurrency 8
+    python loadtest.py --port 8000 --horizon 36 --no-intervals --output load.json
+"""
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlencode
+import numpy as np
+
+
+def get_groups(host, port):
+    """
+    Returns the groups served by a forecast server.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The port of the server.
+
+    Returns:
+        list: The group names.
+    """
+
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        connection.request('GET', '/groups')
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise ValueError(f"Server returned {response.status}: {payload.get('error')}")
+    return list(payload['groups'])
+
+
+def send_requests(host, port, paths, latencies, errors):
+    """
+    Sends GET requests on one persistent connection and records their latencies,
+    reconnecting after a failed request.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The port of the server.
+        paths (list): The request paths, in order.
+        latencies (list): Receives the latency of each successful request in seconds.
+        errors (list): Receives the error of each failed request.
+    """
+
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    for path in paths:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as error:
+            errors.append(f"{type(error).__name__}: {error}")
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        if response.status == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(f"HTTP {response.status}")
+    connection.close()
+
+
+def get_paths(groups, horizon=None, intervals=True):
+    """
+    Returns the forecast request paths of the groups.
+
+    Args:
+        groups (list): The groups to request.
+        horizon (int): The horizon to request, defaults to the stored periods.
+        intervals (bool): Whether to request the forecast intervals.
+
+    Returns:
+        list: One request path per group.
+    """
+
+    query = {'intervals': 'true' if intervals else 'false'}
+    if horizon is not None:
+        query['horizon'] = horizon
+    return [f"/forecast?{urlencode({'group': group, **query})}" for group in groups]
+
+
+def run_load_test(host, port, paths, requests=1000, concurrency=4):
+    """
+    Sends requests cycling through the paths from concurrent connections.
+
+    Args:
+        host (str): The address of the server.
+        port (int): The port of the server.
+        paths (list): The request paths to cycle through.
+        requests (int): The number of measured requests.
+        concurrency (int): The number of concurrent connections.
+
+    Returns:
+        dict: The request and error counts, the duration, the requests per second
+            and the p50, p90, p99 and maximum latencies in milliseconds.
+    """
+
+    latencies = [[] for _ in range(concurrency)]
+    errors = [[] for _ in range(concurrency)]
+    threads = []
+    for worker in range(concurrency):
+        worker_paths = [paths[index % len(paths)]
+                        for index in range(worker, requests, concurrency)]
+        threads.append(threading.Thread(target=send_requests,
+                                        args=(host, port, worker_paths,
+                                              latencies[worker], errors[worker])))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    return {'requests': requests,
+            'concurrency': concurrency,
+            **summarize(np.concatenate([np.asarray(worker_latencies)
+                                        for worker_latencies in latencies]),
+                        [error for worker_errors in errors for error in worker_errors],
+                        seconds)}
+
+
+def summarize(latencies, errors, seconds):
+    """
+    Summarizes the requests of a load test.
+
+    Args:
+        latencies (np.ndarray): The latencies of the successful requests in seconds.
+        errors (list): The errors of the failed requests.
+        seconds (float): The duration of the load test.
+
+    Returns:
+        dict: The error count, the duration, the requests per second, the p50, p90,
+            p99 and maximum latencies in milliseconds and the first error.
+    """
+
+    result = {'errors': len(errors),
+              'seconds': round(seconds, 3),
+              'requests_per_second': round(latencies.size / seconds, 1) if seconds else None}
+    for name, percentile in (('p50_ms', 50), ('p90_ms', 90), ('p99_ms', 99), ('max_ms', 100)):
+        result[name] = round(float(np.percentile(latencies, percentile)) * 1000, 3) \
+            if latencies.size else None
+    if errors:
+        result['first_error'] = errors[0]
+    return result
+
+
+def main(argv=None):
+    """
+    Load tests a running forecast server from the command line and prints the results.
+
+    Args:
+        argv (list): The command line arguments, defaults to sys.argv.
+    """
+
+    parser = argparse.ArgumentParser(description='Load test the forecast server.')
+    parser.add_argument('--host', default='127.0.0.1', help='address of the server')
+    parser.add_argument('--port', type=int, default=8000, help='port of the server')
+    parser.add_argument('--requests', type=int, default=1000, help='number of measured requests')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='number of concurrent connections')
+    parser.add_argument('--groups', nargs='+', metavar='GROUP',
+                        help='groups to request, defaults to all served groups')
+    parser.add_argument('--horizon', type=int, help='horizon to request')
+    parser.add_argument('--no-intervals', action='store_true',
+                        help='request the forecasts without intervals')
+    parser.add_argument('--warmup', type=int, default=100,
+                        help='number of requests sent before measuring')
+    parser.add_argument('--output', help='JSON file to save the results to')
+    args = parser.parse_args(argv)
+
+    paths = get_paths(args.groups or get_groups(args.host, args.port), args.horizon,
+                      not args.no_intervals)
+    # Warm up, e.g. to load the models of longer horizons, before measuring
+    send_requests(args.host, args.port, [paths[index % len(paths)]
+                                         for index in range(args.warmup)], [], [])
+    result = run_load_test(args.host, args.port, paths, args.requests, args.concurrency)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""
+This module contains the Manifest class, which keeps per-group content fingerprints
+of the extracted data between pipeline runs so that an incremental run only
+processes the groups whose data changed.
+
+Example:
+    manifest = Manifest(config)
+    fingerprints = manifest.fingerprint(data)
+    changed, deleted = manifest.diff(fingerprints)
+    data = manifest.select(data, changed)
+"""
+
+from collections.abc import Mapping
+import hashlib
+import json
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from series import ShardedSeries
+from storage import atomic_write, name_key
+
+
+# Configuration keys that only affect how a run is executed, not its outputs; the
+# data itself is covered by the fingerprints
+RUNTIME_CONFIG_KEYS = ('data_source', 'read_chunksize', 'source_cache', 'source_cache_dir',
+                       'download_concurrency', 'download_timeout', 'download_retries',
+                       'download_backoff', 'out_of_core', 'streaming', 'shard_dir',
+                       'max_in_flight', 'forecast_workers', 'forecast_executor', 'model_cache',
+                       'model_cache_dir', 'model_cache_max_age_days', 'model_cache_max_size_mb',
+                       'warm_start', 'run_record_dir', 'profile', 'report_workers',
+                       'incremental', 'manifest_dir', 'groups', 'checkpoint',
+                       'checkpoint_dir', 'source_names')
+
+
+class StoredGroups(Mapping):
+    """
+    The train sets or the forecasts of the groups kept from the previous run. Each
+    group is read from its state file when it is accessed, so that unchanged groups
+    are not loaded unless a stage needs them.
+
+    Attributes:
+        directory (str): The folder holding the state files.
+        files (dict): The state file of every group by name.
+        part (str): The part of the state to return, 'series' or 'forecast'.
+    """
+
+    def __init__(self, directory, files, part):
+        """
+        Initializes a new instance of the StoredGroups class.
+
+        Args:
+            directory (str): The folder holding the state files.
+            files (dict): The state file of every group by name.
+            part (str): The part of the state to return, 'series' or 'forecast'.
+        """
+
+        self.directory = directory
+        self.files = files
+        self.part = part
+
+    def __getitem__(self, name):
+        with open(os.path.join(self.directory, self.files[name]), 'rb') as file:
+            return pickle.load(file)[self.part]
+
+    def __contains__(self, name):
+        return name in self.files
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+
+class Manifest:
+    """
+    A class used to detect the groups that changed since the previous run.
+
+    Attributes:
+        config (dict): A dictionary containing configuration settings.
+        directory (str): The folder holding the manifest and the state files of the
+            groups of the previous run.
+        previous_fingerprints (dict): The fingerprints of the previous run.
+        previous_files (dict): The state files of the groups of the previous run.
+    """
+
+    def __init__(self, config):
+        """
+        Initializes a new instance of the Manifest class.
+
+        Args:
+            config (dict): A dictionary containing configuration settings. The optional
+                key 'manifest_dir' sets the folder of the manifest.
+        """
+
+        self.config = config
+        self.directory = config.get('manifest_dir', 'Manifest')
+        self.previous_fingerprints = {}
+        self.previous_files = {}
+
+    def get_paths(self):
+        """
+        Returns the paths of the manifest and of the folder of the state files.
+
+        Returns:
+            tuple: The manifest JSON path and the state folder path.
+        """
+
+        return (os.path.join(self.directory, 'manifest.json'),
+                os.path.join(self.directory, 'groups'))
+
+    def config_hash(self):
+        """
+        Returns a hash of the configuration settings that affect the outputs,
+        including the backtested parameters. If it changes, every group is processed
+        again.
+
+        Returns:
+            str: The hex digest of the configuration.
+        """
+
+        settings = {key: value for key, value in self.config.items()
+                    if key not in RUNTIME_CONFIG_KEYS}
+        best_params_file = self.config.get('best_params_file')
+        if best_params_file and os.path.exists(best_params_file):
+            with open(best_params_file, encoding='utf-8') as file:
+                settings['best_params'] = json.load(file)
+        return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str)
+                              .encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def can_fingerprint(data):
+        """
+        Checks whether data can be fingerprinted without reading it twice. Chunked data
+        cannot, since the rows of a group may span several chunks; it is fingerprinted
+        from its train sets instead.
+
+        Args:
+            data: The extracted data, its chunks, or the train sets by group name.
+
+        Returns:
+            bool: Whether the data is a DataFrame or a mapping of train sets.
+        """
+
+        return isinstance(data, (pd.DataFrame, Mapping))
+
+    def fingerprint(self, data):
+        """
+        Computes a fingerprint of the rows of every group, either from the extracted
+        rows or from the train sets of the groups. Train sets stored on disk, such as
+        shards, are read one group at a time.
+
+        Args:
+            data (DataFrame or Mapping): The extracted data, or the train sets by group
+                name.
+
+        Returns:
+            dict: The fingerprints by group name.
+        """
+
+        if isinstance(data, Mapping):
+            return {name: self.fingerprint_series(data, name) for name in data}
+        columns = [self.config['description_column'], self.config['date_column'],
+                   self.config['target_column']]
+        row_hashes = pd.util.hash_pandas_object(data[columns], index=False).to_numpy()
+        groups = data.groupby(self.config['description_column'], sort=False).indices
+        return {name: hashlib.sha256(row_hashes[positions].tobytes()).hexdigest()
+                for name, positions in groups.items()}
+
+    @staticmethod
+    def fingerprint_series(series, name):
+        """
+        Computes the fingerprint of the dates and values of a train set.
+
+        Args:
+            series (Mapping): The train sets by group name.
+            name (str): The name of the group.
+
+        Returns:
+            str: The hex digest of the group's dates and values.
+        """
+
+        if hasattr(series, 'get_arrays'):
+            dates, values = series.get_arrays(name)
+        else:
+            dates, values = series[name]['ds'].to_numpy(), series[name]['y'].to_numpy()
+        digest = hashlib.sha256(np.ascontiguousarray(dates, dtype='datetime64[ns]').tobytes())
+        digest.update(np.ascontiguousarray(values, dtype='float64').tobytes())
+        return digest.hexdigest()
+
+    def load(self):
+        """
+        Loads the manifest of the previous run.
+
+        Returns:
+            dict: The 'config_hash', the 'fingerprints' and the state 'files' of the
+                previous run, or an empty dict if there is none.
+        """
+
+        manifest_path, _ = self.get_paths()
+        if not os.path.exists(manifest_path):
+            return {}
+        with open(manifest_path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def diff(self, fingerprints):
+        """
+        Compares the fingerprints with those of the previous run. If 'groups' is
+        configured, only those groups can be reported as deleted. If a group of the
+        configured 'hierarchy' changed, all of its groups are reported as changed,
+        since they are reconciled together.
+
+        Args:
+            fingerprints (dict): The current fingerprints by group name.
+
+        Returns:
+            tuple: The sorted names of the changed or new groups, and of the groups
+                that no longer exist.
+        """
+
+        previous = self.load()
+        if previous.get('config_hash') != self.config_hash():
+            previous = {}
+        # Groups are only kept if their state file is recorded as well
+        self.previous_files = previous.get('files', {})
+        self.previous_fingerprints = {name: fingerprint for name, fingerprint
+                                      in previous.get('fingerprints', {}).items()
+                                      if name in self.previous_files}
+        changed = {name for name, fingerprint in fingerprints.items()
+                   if self.previous_fingerprints.get(name) != fingerprint}
+        hierarchy = self.config.get('hierarchy') or {}
+        nodes = set(hierarchy).union(*hierarchy.values())
+        if changed & nodes:
+            changed |= nodes & set(fingerprints)
+        deleted = set(self.previous_fingerprints) - set(fingerprints)
+        if self.config.get('groups'):
+            deleted &= set(self.config['groups'])
+        return sorted(changed), sorted(deleted)
+
+    def select(self, data, names):
+        """
+        Returns the rows or the train sets of the given groups. Sharded train sets stay
+        on disk.
+
+        Args:
+            data (DataFrame or Mapping): The extracted data, or the train sets by group
+                name.
+            names (list): The group names to keep.
+
+        Returns:
+            DataFrame or Mapping: The rows or the train sets of the groups.
+        """
+
+        if isinstance(data, ShardedSeries):
+            return ShardedSeries(data.directory, {name: data.groups[name] for name in names
+                                                  if name in data.groups})
+        if isinstance(data, Mapping):
+            return {name: data[name] for name in names if name in data}
+        return data[data[self.config['description_column']].isin(names)]
+
+    def load_state(self, exclude=()):
+        """
+        Returns the train sets and forecasts of the groups of the previous run. They
+        are read from the state files of the groups when accessed.
+
+        Args:
+            exclude (iterable): The names of the groups to leave out.
+
+        Returns:
+            dict: The 'series' and 'forecasts' mappings by group name.
+        """
+
+        _, state_dir = self.get_paths()
+        exclude = set(exclude)
+        files = {name: filename for name, filename in self.previous_files.items()
+                 if name not in exclude}
+        return {'series': StoredGroups(state_dir, files, 'series'),
+                'forecasts': StoredGroups(state_dir, files, 'forecast')}
+
+    def save(self, changes, series, forecasts, run_id=None):
+        """
+        Saves the manifest and the state files of the groups processed by this run.
+        Only groups with a forecast are recorded, so that failed groups are processed
+        again by the next run. Groups kept from the previous run keep their previous
+        fingerprints and state files, and state files no longer recorded are removed.
+
+        Args:
+            changes (tuple): The fingerprints by group name and the names of the
+                changed and of the deleted groups.
+            series (Mapping): The train sets by group name.
+            forecasts (Mapping): The forecasts by group name.
+            run_id (str): The identifier of the run.
+        """
+
+        fingerprints, changed, _ = changes
+        manifest_path, state_dir = self.get_paths()
+        os.makedirs(state_dir, exist_ok=True)
+        fingerprints = {**self.previous_fingerprints, **fingerprints}
+        files = {name: filename for name, filename in self.previous_files.items()
+                 if name in forecasts and name in fingerprints}
+        for name in changed:
+            if name not in forecasts or name not in fingerprints:
+                files.pop(name, None)
+                continue
+            files[name] = f'{name_key(name)}.pkl'
+            with atomic_write(os.path.join(state_dir, files[name]), 'wb') as file:
+                pickle.dump({'series': series[name], 'forecast': forecasts[name]}, file)
+        manifest = {'run_id': run_id,
+                    'config_hash': self.config_hash(),
+                    'fingerprints': {name: fingerprints[name] for name in files},
+                    'files': files}
+        with atomic_write(manifest_path) as file:
+            json.dump(manifest, file, indent=2)
+
+        recorded = set(files.values())
+        for filename in os.listdir(state_dir):
+            if filename not in recorded:
+                os.remove(os.path.join(state_dir, filename))
@@ -0,0 +1,252 @@
+"""
+This module provides the ModelStore class, a persistent on-disk cache of fitted
+Prophet models keyed by a content hash of each group's training data and the
+configuration that affects fitting, so that unchanged groups skip refitting.
+The store also keeps the last fitted parameters of every group, which are used
+to warm start the next fit of that group.
+"""
+
+import hashlib
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from storage import atomic_write, name_key
+
+
+MODEL_CONFIG_KEYS = ('prophet_params',)
+
+
+class ModelStore:
+    """
+    A directory of serialized Prophet models named after the hash of the data and
+    configuration they were fitted with.
+
+    Attributes
+    ----------
+    config : dict
+        A configuration dictionary. The optional keys 'model_cache_dir',
+        'model_cache_max_age_days' and 'model_cache_max_size_mb' control the
+        location of the store and its eviction limits.
+    directory : str
+        The folder the models are stored in.
+
+    Methods
+    -------
+    key(train_data, prophet_params=None):
+        Computes the cache key for the given training data.
+    load(key):
+        Loads the model stored under the given key, if any.
+    save(key, prophet_model):
+        Stores a fitted model under the given key.
+    load_params(name):
+        Loads the last fitted parameters of the given group, if any.
+    save_params(name, prophet_model, train_data):
+        Stores the fitted parameters of the given group.
+    prune():
+        Evicts models that exceed the configured age or total size limits.
+    """
+
+    def __init__(self, config):
+        """
+        Initializes the ModelStore and creates its directory if needed.
+
+        Parameters
+        ----------
+        config : dict
+            A configuration dictionary.
+        """
+        self.config = config
+        self.directory = config.get('model_cache_dir', 'ModelCache')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, train_data, prophet_params=None):
+        """
+        Computes the cache key for the given training data.
+
+        Parameters
+        ----------
+        train_data : pd.DataFrame
+            The training data frame with 'ds' and 'y' columns.
+        prophet_params : dict, optional
+            The Prophet parameters of the fit, if they differ from 'prophet_params'
+            (e.g. backtested parameters of the group).
+
+        Returns
+        -------
+        str
+            A hex digest of the 'ds'/'y' values and the model related config keys.
+        """
+        digest = hashlib.sha256()
+        row_hashes = pd.util.hash_pandas_object(train_data[['ds', 'y']], index=False)
+        digest.update(row_hashes.to_numpy().tobytes())
+        model_config = {name: self.config.get(name) for name in MODEL_CONFIG_KEYS}
+        if prophet_params is not None:
+            model_config['prophet_params'] = prophet_params
+        digest.update(json.dumps(model_config, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        """
+        Returns the file path of the model stored under the given key.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        Returns
+        -------
+        str
+            The path of the serialized model.
+        """
+        return os.path.join(self.directory, f'{key}.json')
+
+    def load(self, key):
+        """
+        Loads the model stored under the given key. A hit refreshes the file's
+        modification time so that age based eviction keeps models still in use.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+
+        Returns
+        -------
+        Prophet or None
+            The fitted model, or None if it is not stored or cannot be read.
+        """
+        # Prophet is only imported once a model is read or written
+        from prophet.serialize import model_from_json  # pylint: disable=import-outside-toplevel
+        path = self.path(key)
+        try:
+            with open(path, encoding='utf-8') as file:
+                prophet_model = model_from_json(file.read())
+        except (OSError, ValueError, KeyError) as error:
+            if os.path.exists(path):
+                print(f"Warning: Ignoring unreadable cached model {path}: {error}")
+            return None
+        os.utime(path)
+        return prophet_model
+
+    def save(self, key, prophet_model):
+        """
+        Stores a fitted model under the given key. The model is written to a
+        temporary file first so that concurrent workers never read partial files.
+
+        Parameters
+        ----------
+        key : str
+            The cache key.
+        prophet_model : Prophet
+            The fitted model.
+        """
+        from prophet.serialize import model_to_json  # pylint: disable=import-outside-toplevel
+        with atomic_write(self.path(key)) as file:
+            file.write(model_to_json(prophet_model))
+
+    def params_path(self, name):
+        """
+        Returns the file path of the last fitted parameters of the given group.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        str
+            The path of the parameter file.
+        """
+        return os.path.join(self.directory, f'group_{name_key(name, None)}.json')
+
+    def load_params(self, name):
+        """
+        Loads the last fitted parameters of the given group.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        dict or None
+            A dictionary with the 'ds_start' and 'rows' of the training data and the
+            'params' usable as Prophet's init values, or None if none are stored.
+        """
+        path = self.params_path(name)
+        try:
+            with open(path, encoding='utf-8') as file:
+                previous = json.load(file)
+        except (OSError, ValueError):
+            return None
+        os.utime(path)
+        return previous
+
+    def save_params(self, name, prophet_model, train_data):
+        """
+        Stores the fitted parameters of the given group, averaging over samples
+        when the model was fitted with MCMC.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        prophet_model : Prophet
+            The fitted model.
+        train_data : pd.DataFrame
+            The training data the model was fitted on.
+        """
+        params = {}
+        for param in ('k', 'm', 'sigma_obs', 'delta', 'beta'):
+            values = np.asarray(prophet_model.params[param])
+            values = values[0] if prophet_model.mcmc_samples == 0 else values.mean(axis=0)
+            values = np.atleast_1d(values).tolist()
+            params[param] = values if param in ('delta', 'beta') else values[0]
+        previous = {'name': str(name),
+                    'ds_start': str(train_data['ds'].min()),
+                    'rows': len(train_data),
+                    'params': params}
+        with atomic_write(self.params_path(name)) as file:
+            json.dump(previous, file)
+
+    def prune(self):
+        """
+        Evicts models older than 'model_cache_max_age_days', then the least
+        recently used models until the store fits in 'model_cache_max_size_mb'.
+
+        Returns
+        -------
+        int
+            The number of evicted models.
+        """
+        max_age_days = self.config.get('model_cache_max_age_days')
+        max_size_mb = self.config.get('model_cache_max_size_mb')
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        evicted = []
+        if max_age_days is not None:
+            cutoff = time.time() - max_age_days * 86400
+            evicted = [entry for entry in entries if entry[0] < cutoff]
+            entries = entries[len(evicted):]
+        if max_size_mb is not None:
+            total_size = sum(size for _, size, _ in entries)
+            while entries and total_size > max_size_mb * 1024 * 1024:
+                evicted.append(entries.pop(0))
+                total_size -= evicted[-1][1]
+
+        for _, _, path in evicted:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return len(evicted)
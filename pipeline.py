@@ -7,71 +7,509 @@ Example:
     pipeline.run()
 """
 
+import argparse
+from collections import ChainMap
+import cProfile
+from datetime import datetime
 import os
 import json
-from extract import Extract
-from preprocess import Preprocess
-from transform import Transform
-from forecast import Forecast
-from report import Report
+import sys
+from urllib.parse import urlparse
+import uuid
+from instrument import Instrumentation
 
 
-class Pipeline: # pylint: disable=too-few-public-methods
+# The stages in execution order; the stage modules are imported when their stage runs,
+# so that validating the configuration or running early stages stays fast
+STAGES = ('extract', 'preprocess', 'transform', 'forecast', 'report', 'store')
+REQUIRED_CONFIG_KEYS = ('data_source', 'target_column', 'description_column', 'date_column',
+                        'date_format', 'period_frequency', 'max_train_date',
+                        'prediction_start', 'predict_periods')
+CONFIG_CHOICES = {'forecast_executor': ('process', 'thread'),
+                  'report_mode': ('files', 'dashboard'),
+                  'report_plotlyjs': ('inline', 'cdn', 'directory'),
+                  'reconciliation': ('bottom_up', 'top_down', 'mint')}
+
+
+class Pipeline:
     """
     A class used to execute the entire forecasting process, from data extraction
     to report generation.
 
     Attributes:
         config (dict): A dictionary containing configuration settings.
+        run_id (str): The identifier of the run, its start time followed by a random
+            suffix, so that runs started in the same second do not collide.
+        resume (str): The identifier of the interrupted run this run resumes, whose
+            checkpoint it continues, or None.
+        instrumentation (Instrumentation): The timings and memory usage of the run.
+        checkpoint (Checkpoint): The per-group checkpoints of the run, if enabled.
     """
 
-    def __init__(self):
+    def __init__(self, config_file=None, resume=None):
         """
         Initializes a new instance of the Pipeline class by loading the
         configuration settings from the 'config.json' file.
+
+        Args:
+            config_file (str): The path of the configuration file, defaults to the
+                'config.json' file next to this module.
+            resume (str): The identifier of an interrupted run to resume; the groups
+                it checkpointed are not forecast again.
         """
 
-        config_file = os.path.join(os.path.dirname(__file__), 'config.json')
+        if config_file is None:
+            config_file = os.path.join(os.path.dirname(__file__), 'config.json')
         with open(config_file, encoding='utf-8') as file:
             self.config = json.load(file)
+        self.run_id = f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.resume = resume
+        self.instrumentation = Instrumentation(self.run_id, resume)
+        self.checkpoint = None
+
+    def validate(self):
+        """
+        Checks the configuration without running any stage or importing the stage
+        modules.
+
+        Returns:
+            list: The problems found, empty if the configuration is valid.
+        """
+
+        problems = [f"Missing config key {key}" for key in REQUIRED_CONFIG_KEYS
+                    if key not in self.config]
+        sources = self.config.get('data_source', [])
+        for source in [sources] if isinstance(sources, str) else sources:
+            if urlparse(source).scheme not in ('http', 'https') and not os.path.exists(source):
+                problems.append(f"Data source {source} not found")
+        for key in ('max_train_date', 'prediction_start'):
+            try:
+                datetime.strptime(str(self.config.get(key)), self.config.get('date_format', ''))
+            except ValueError:
+                problems.append(f"{key} {self.config.get(key)} does not match date_format")
+        for key, choices in CONFIG_CHOICES.items():
+            if key in self.config and self.config[key] not in choices:
+                problems.append(f"{key} must be one of {', '.join(choices)}")
+        for key in ('forecast_workers', 'report_workers', 'predict_periods'):
+            value = self.config.get(key, 0)
+            # null workers, like 0, use every core
+            if value is None and key.endswith('_workers'):
+                continue
+            if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                problems.append(f"{key} must be a non-negative integer")
+        groups = self.config.get('groups')
+        if groups is not None and not isinstance(groups, list):
+            problems.append("groups must be a list of group names")
+        if self.config.get('streaming'):
+            problems.extend(self.validate_streaming())
+        return problems
+
+    def validate_streaming(self):
+        """
+        Checks the options that cannot be combined with 'streaming'.
+
+        Returns:
+            list: The problems found, empty if streaming is possible.
+        """
+
+        problems = []
+        if self.config.get('incremental'):
+            problems.append("streaming cannot be combined with incremental runs")
+        if self.config.get('report_mode') == 'dashboard':
+            problems.append("streaming requires report_mode files")
+        if self.config.get('hierarchy'):
+            problems.append("streaming cannot reconcile a hierarchy")
+        return problems
 
-    def run(self):
+    def run(self, until=None):
         """
         Executes the entire forecasting process, from data extraction to report
         generation, using the following steps:
 
         1. Extract data from the source.
-        2. Create train sets.
-        3. Preprocess the data.
-        4. Transform the data.
-        5. Forecast the data.
-        6. Generate the report(s).
+        2. Preprocess the data.
+        3. Transform the data into a collection of train sets.
+        4. Forecast the data.
+        5. Generate the report(s).
+        6. Store the forecasts, if 'forecast_store' is enabled.
+
+        Each step is recorded as a stage of the run. If 'incremental' is enabled, only
+        the groups whose data changed since the previous run are processed, and the
+        outputs of the other groups are kept. The extracted rows are compared, or the
+        train sets when the source is read in chunks. If 'streaming' is enabled, the
+        groups are sharded on disk and flow one at a time through forecasting, reporting
+        and storing, so that memory does not grow with the number of groups. If
+        'run_record_dir' is set, the run record is written there as JSON, even if the
+        run fails; if 'profile' is enabled, a cProfile dump is written next to it. If
+        'checkpoint' is enabled, each forecast is saved as it completes until the run
+        succeeds.
+
+        Args:
+            until (str): The last stage to run, one of STAGES; defaults to all stages.
+
+        Returns:
+            The output of the last stage that ran: the extracted, preprocessed or
+            transformed data, or the forecasts by group name (their names in
+            streaming mode).
+        """
+
+        profiler = cProfile.Profile() if self.config.get('profile') else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = self.run_stages(until)
+            if self.checkpoint is not None:
+                self.checkpoint.clear()
+            return result
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record_dir = self.config.get('run_record_dir')
+            if record_dir:
+                path = self.instrumentation.write(record_dir)
+                print(f"Run record written to {path}")
+                if profiler is not None:
+                    profiler.dump_stats(os.path.join(record_dir, f'{self.run_id}.prof'))
+
+    def run_stages(self, until=None):
+        """
+        Executes the pipeline steps, recording each one as a stage. With chunked
+        reading, the source is read lazily, so reading time is recorded in the
+        transform stage.
+
+        Args:
+            until (str): The last stage to run, defaults to all stages.
+
+        Returns:
+            The output of the last stage that ran.
+        """
+
+        if until is not None and until not in STAGES:
+            raise ValueError(f"Unknown stage {until}")
+        if self.config.get('streaming') and (self.config.get('incremental') or
+                                             self.config.get('hierarchy') or
+                                             self.config.get('report_mode') == 'dashboard'):
+            raise ValueError("Streaming requires report_mode files, no incremental run "
+                             "and no hierarchy")
+        self.checkpoint = self.create_checkpoint()
+
+        data = self.extract()
+        if until == 'extract':
+            return data
+
+        # Select the groups that changed since the previous run. Chunked data is
+        # fingerprinted from its train sets, so that it is not read into memory.
+        manifest = self.create_manifest()
+        changes = None
+        if manifest is not None and manifest.can_fingerprint(data):
+            data, changes = self.select_changed(manifest, data)
+
+        data = self.preprocess(data)
+        if until == 'preprocess':
+            return data
+
+        series = self.transform(data)
+        if manifest is not None and changes is None:
+            series, changes = self.select_changed(manifest, series)
+        if until == 'transform':
+            return series
+        if self.config.get('streaming'):
+            return self.stream_groups(series)
+
+        forecasts, model_keys = self.forecast(series)
+        if manifest is not None:
+            series, forecasts = self.keep_unchanged(manifest, changes, series, forecasts)
+        if until == 'forecast':
+            return forecasts
+
+        self.report(series, forecasts, changes)
+        if self.config.get('forecast_store') and until != 'report':
+            self.store(forecasts, model_keys, changes)
+        if manifest is not None:
+            manifest.save(changes, series, forecasts, self.run_id)
+        return forecasts
+
+    def extract(self):
         """
+        Extracts the data from the source.
 
-        # Extract data from source
-        extractor = Extract(self.config)
-        data = extractor.run()
+        Returns:
+            The extracted DataFrame, or an iterator of its chunks with chunked reading.
+        """
 
-        # Create train sets
-        train_sets = extractor.create_train_sets(data)
+        with self.instrumentation.stage('extract'):
+            from extract import Extract  # pylint: disable=import-outside-toplevel
+            return Extract(self.config).run()
 
-        # Preprocess data
-        preprocessor = Preprocess(self.config)
-        data_dict = preprocessor.run(train_sets)
+    def create_manifest(self):
+        """
+        Creates the manifest of the previous run if 'incremental' is enabled.
+
+        Returns:
+            Manifest: The manifest, or None if every group is processed.
+        """
 
-        # Transform data
-        transformer = Transform(self.config)
-        transformed_data = transformer.run(data_dict)
+        if not self.config.get('incremental'):
+            return None
+        from manifest import Manifest  # pylint: disable=import-outside-toplevel
+        return Manifest(self.config)
 
-        # Forecast data
-        forecaster = Forecast(transformed_data, self.config)
-        forecasts = forecaster.run()
+    def preprocess(self, data):
+        """
+        Cleans the extracted data.
+
+        Args:
+            data: The extracted DataFrame, or an iterator of its chunks.
 
-        # Generate report
-        reporter = Report(transformed_data, forecasts, self.config)
-        reporter.create_plots()
+        Returns:
+            The preprocessed DataFrame, or a generator of preprocessed chunks.
+        """
+
+        with self.instrumentation.stage('preprocess'):
+            from preprocess import Preprocess  # pylint: disable=import-outside-toplevel
+            return Preprocess(self.config).clean(data)
+
+    def transform(self, data):
+        """
+        Transforms the preprocessed data into train sets.
+
+        Args:
+            data: The preprocessed DataFrame, or an iterator of its chunks.
+
+        Returns:
+            Mapping: The train sets by group name.
+        """
+
+        with self.instrumentation.stage('transform') as record:
+            from transform import Transform  # pylint: disable=import-outside-toplevel
+            series = Transform(self.config).run(data)
+            record['groups'] = len(series)
+        return series
+
+    def forecast(self, series):
+        """
+        Forecasts the train sets and records their timings and failures.
+
+        Args:
+            series (Mapping): The train sets by group name.
+
+        Returns:
+            tuple: The forecasts and the model store keys of the fitted models by
+                group name.
+        """
+
+        with self.instrumentation.stage('forecast') as record:
+            from forecast import Forecast  # pylint: disable=import-outside-toplevel
+            forecaster = Forecast(series, self.config, self.checkpoint)
+            forecasts = forecaster.run()
+            record['groups'] = len(forecasts)
+            self.instrumentation.series.update(forecaster.timings)
+            self.instrumentation.failures.update(forecaster.failures)
+        return forecasts, forecaster.get_model_keys()
+
+    @staticmethod
+    def keep_unchanged(manifest, changes, series, forecasts):
+        """
+        Adds the train sets and forecasts of the groups that did not change to those
+        of this run. The groups kept from the previous run are read from the manifest
+        only when they are accessed.
+
+        Args:
+            manifest (Manifest): The manifest of the previous run.
+            changes (tuple): The fingerprints and the changed and deleted group names.
+            series (Mapping): The train sets of the changed groups.
+            forecasts (dict): The forecasts of the changed groups.
+
+        Returns:
+            tuple: The train sets and forecasts of all groups.
+        """
+
+        _, changed, deleted = changes
+        state = manifest.load_state(exclude=[*changed, *deleted])
+        return ChainMap(series, state['series']), ChainMap(forecasts, state['forecasts'])
+
+    def report(self, series, forecasts, changes=None):
+        """
+        Writes the reports. In an incremental run, only the reports of the changed
+        groups are written and those of the deleted groups are removed.
+
+        Args:
+            series (Mapping): The train sets by group name.
+            forecasts (dict): The forecasts by group name.
+            changes (tuple): The fingerprints and the changed and deleted group names,
+                or None if every group was processed.
+        """
+
+        with self.instrumentation.stage('report'):
+            from report import Report  # pylint: disable=import-outside-toplevel
+            reporter = Report(series, forecasts, self.config)
+            if changes is None:
+                reporter.create_plots()
+            else:
+                _, changed, deleted = changes
+                reporter.remove_plots(deleted)
+                reporter.create_plots([name for name in changed if name in forecasts])
+
+    def store(self, forecasts, model_keys, changes=None):
+        """
+        Writes the forecasts of the run to the forecast store.
+
+        Args:
+            forecasts (dict): The forecasts by group name.
+            model_keys (dict): The model store keys of the models fitted by this run.
+            changes (tuple): The fingerprints and the changed and deleted group names,
+                or None if every group was processed.
+        """
+
+        with self.instrumentation.stage('store'):
+            from forecast_store import ForecastStore  # pylint: disable=import-outside-toplevel
+            store = ForecastStore(self.config)
+            if changes is not None:
+                # The unchanged groups keep the models of the run they were fitted in
+                model_keys = {**{name: key for name, key in store.get_model_keys().items()
+                                 if name not in changes[1]}, **model_keys}
+            store.write(self.run_id, forecasts, model_keys)
+
+    def select_changed(self, manifest, data):
+        """
+        Fingerprints the groups of the data and keeps the groups that changed since
+        the previous run.
+
+        Args:
+            manifest (Manifest): The manifest of the previous run.
+            data (DataFrame or Mapping): The extracted data, or the train sets by group
+                name.
+
+        Returns:
+            tuple: The data of the changed groups, and the fingerprints by group name
+                with the names of the changed and of the deleted groups.
+        """
+
+        with self.instrumentation.stage('manifest') as record:
+            fingerprints = manifest.fingerprint(data)
+            changed, deleted = manifest.diff(fingerprints)
+            data = manifest.select(data, changed)
+            record['changed'] = len(changed)
+            record['deleted'] = len(deleted)
+        print(f"Incremental run: {len(changed)} changed, {len(deleted)} deleted groups")
+        return data, (fingerprints, changed, deleted)
+
+    def create_checkpoint(self):
+        """
+        Creates the checkpoint of the run if 'checkpoint' is enabled. A new run starts
+        from an empty checkpoint; a resumed run requires the checkpoint to exist and
+        keeps adding to it, so that it can be resumed again under the same identifier.
+
+        Returns:
+            Checkpoint: The checkpoint of the run, or None if checkpointing is disabled.
+        """
+
+        if not self.config.get('checkpoint') and not self.resume:
+            return None
+        from checkpoint import Checkpoint  # pylint: disable=import-outside-toplevel
+        checkpoint = Checkpoint(self.config, self.resume or self.run_id)
+        if not self.resume:
+            checkpoint.clear()
+        elif not checkpoint.exists():
+            raise ValueError(f"No checkpoint found for run {self.resume}")
+        else:
+            print(f"Resuming run {self.resume} as {self.run_id}: "
+                  f"{len(checkpoint.load_done())} groups completed")
+        return checkpoint
+
+    def stream_groups(self, series):
+        """
+        Forecasts, reports and stores the groups one at a time as their forecasts are
+        collected, so that only the groups in the forecast window are held in memory.
+
+        Args:
+            series (Mapping): The train sets by group name, normally ShardedSeries.
+
+        Returns:
+            list: The names of the groups that were forecast.
+        """
+
+        from forecast import Forecast  # pylint: disable=import-outside-toplevel
+        from forecast_store import ForecastStore  # pylint: disable=import-outside-toplevel
+        from report import Report  # pylint: disable=import-outside-toplevel
+
+        with self.instrumentation.stage('stream') as record:
+            forecaster = Forecast(series, self.config, self.checkpoint)
+            reporter = Report(series, {}, self.config)
+            os.makedirs(reporter.reports_folder, exist_ok=True)
+            reporter.write_plotlyjs()
+            store = ForecastStore(self.config) if self.config.get('forecast_store') else None
+
+            stored = {}
+            names = []
+            for name, forecast, error in forecaster.iter_forecasts():
+                if error is not None:
+                    continue
+                reporter.write_plot(name, series[name], forecast)
+                if store is not None:
+                    model_key = (forecaster.timings.get(name) or {}).get('model')
+                    stored[name] = store.write_group(self.run_id, name, forecast, model_key)
+                names.append(name)
+            if store is not None:
+                store.add_run(self.run_id, stored)
+
+            record['groups'] = len(names)
+            self.instrumentation.series.update(forecaster.timings)
+            self.instrumentation.failures.update(forecaster.failures)
+        return names
+
+
+def main(argv=None):
+    """
+    Runs the pipeline from the command line.
+
+    Args:
+        argv (list): The command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
+
+    parser = argparse.ArgumentParser(description='Run the forecasting pipeline.')
+    parser.add_argument('--config', help='configuration file, defaults to the config.json '
+                                         'next to this module')
+    parser.add_argument('--until', choices=STAGES,
+                        help='last stage to run, e.g. transform to skip forecasting')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='validate the configuration without running any stage')
+    parser.add_argument('--groups', nargs='+', metavar='GROUP',
+                        help='only process the given groups')
+    parser.add_argument('--profile', action='store_true',
+                        help='write a cProfile dump of the run next to its run record')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only process the groups whose data changed since the last run')
+    parser.add_argument('--resume', metavar='RUN_ID',
+                        help='resume an interrupted run, skipping its checkpointed groups')
+    parser.add_argument('--streaming', action='store_true',
+                        help='process the groups one at a time with bounded memory')
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.config, args.resume)
+    if args.groups:
+        pipeline.config['groups'] = args.groups
+    if args.profile:
+        pipeline.config['profile'] = True
+    if args.incremental:
+        pipeline.config['incremental'] = True
+    if args.streaming:
+        pipeline.config['streaming'] = True
+
+    problems = pipeline.validate()
+    for problem in problems:
+        print(f"Error: {problem}")
+    if problems or args.dry_run:
+        if not problems:
+            print("Configuration is valid")
+        return 1 if problems else 0
+
+    pipeline.run(args.until)
+    return 0
 
 
 if __name__ == '__main__':
-    pipeline = Pipeline()
-    pipeline.run()
+    sys.exit(main())
@@ -1,7 +1,8 @@
 """
 This module provides the Preprocess class for preprocessing data in pandas DataFrames.
-The class contains methods for converting date columns to strings, eliminating invalid rows,
-converting date columns back to datetime objects, and dropping non-numeric target rows.
+The class cleans the data in a single vectorized pass: it converts the date column to strings,
+eliminates invalid rows, converts the date column back to datetime objects and drops
+non-numeric target rows.
 """
 
 import pandas as pd
@@ -12,7 +13,8 @@ class Preprocess:
         The Preprocess class is responsible for preparing the input data for forecasting
         by performing various preprocessing steps on pandas DataFrames. These steps include
         converting date columns to strings, eliminating invalid rows, converting date columns
-        back to datetime objects, and dropping non-numeric target rows. The class takes a
+        back to datetime objects, and dropping non-numeric target rows. The steps run once over
+        the whole data set, before it is split into groups. The class takes a
         configuration dictionary as input, which contains the necessary information for
         carrying out the preprocessing tasks.
     """
@@ -24,6 +26,7 @@ class Preprocess:
                        including date_column, date_format, and target_column keys.
         """
         self.config = config
+        self.non_numeric_groups = set()
 
     def run(self, data_dict):
         """
@@ -32,62 +35,59 @@ class Preprocess:
         :param data_dict: Dictionary containing pandas DataFrames.
         :return: Preprocessed data_dict with DataFrames after applying preprocessing steps.
         """
-        data_dict = self.convert_date_column_to_str(data_dict)
-        data_dict = self.eliminate_invalid_rows(data_dict)
-        data_dict = self.convert_date_column_to_datetime(data_dict)
-        data_dict = self.drop_non_numeric_target_rows(data_dict)
-        return data_dict
+        return {name: self.clean_frame(dataframe, name) for name, dataframe in data_dict.items()}
 
-    def convert_date_column_to_str(self, data_dict):
+    def clean(self, data):
         """
-        Convert the date column in each DataFrame to a string format.
+        Execute preprocessing steps on the full data set before it is split into groups.
 
-        :param data_dict: Dictionary containing pandas DataFrames.
-        :return: Dictionary with updated DataFrames after converting date columns to strings.
+        :param data: pandas DataFrame, or an iterator of DataFrame chunks.
+        :return: Preprocessed DataFrame, or a generator of preprocessed chunks.
         """
-        for _, dataframe in data_dict.items():
-            dataframe[self.config['date_column']] = \
-                dataframe[self.config['date_column']].astype(str)
-        return data_dict
+        if isinstance(data, pd.DataFrame):
+            return self.clean_frame(data)
+        return (self.clean_frame(chunk) for chunk in data)
 
-    def eliminate_invalid_rows(self, data_dict):
+    def clean_frame(self, dataframe, name=None):
         """
-        Eliminate rows with invalid date strings in the date column.
+        Run all preprocessing steps on a DataFrame in one vectorized pass: rows whose date
+        string ends with '13' (annual totals) are eliminated, the remaining dates are parsed
+        with the configured format and, if the target column is not numeric, rows with
+        non-numeric targets are dropped.
 
-        :param data_dict: Dictionary containing pandas DataFrames.
-        :return: Dictionary with updated DataFrames after eliminating invalid rows.
+        :param dataframe: pandas DataFrame holding one or more groups.
+        :param name: Name of the group, if the DataFrame holds a single group. Otherwise the
+                     description column is used to name the groups in warnings.
+        :return: Preprocessed DataFrame.
         """
-        for name, dataframe in data_dict.items():
-            dataframe = dataframe[~dataframe[self.config['date_column']].str.endswith('13')]
-            data_dict[name] = dataframe
-        return data_dict
+        date_column = self.config['date_column']
+        target_column = self.config['target_column']
 
-    def convert_date_column_to_datetime(self, data_dict):
-        """
-        Convert the date column in each DataFrame back to a datetime object.
+        dates = dataframe[date_column].astype(str)
+        valid = ~dates.str.endswith('13')
+        dataframe = dataframe[valid].assign(**{
+            date_column: pd.to_datetime(dates[valid], format=self.config['date_format'])})
 
-        :param data_dict: Dictionary containing pandas DataFrames.
-        :return: Dictionary with updated DataFrames
-        after converting date columns to datetime objects.
-        """
-        for _, dataframe in data_dict.items():
-            dataframe[self.config['date_column']] = \
-                pd.to_datetime(dataframe[self.config['date_column']],
-                               format=self.config['date_format'])
-        return data_dict
+        if not pd.api.types.is_numeric_dtype(dataframe[target_column]):
+            target = pd.to_numeric(dataframe[target_column], errors='coerce')
+            self.warn_non_numeric(dataframe[target.isna()], name)
+            dataframe[target_column] = target
+            dataframe = dataframe[target.notna()]
+        return dataframe
 
-    def drop_non_numeric_target_rows(self, data_dict):
+    def warn_non_numeric(self, invalid_rows, name=None):
         """
-        Drop rows in the target column that contain non-numeric values.
+        Print a warning, once per group, for the groups that contain non-numeric target values.
 
-        :param data_dict: Dictionary containing pandas DataFrames.
-        :return: Dictionary with updated DataFrames after dropping non-numeric target rows.
+        :param invalid_rows: pandas DataFrame with the rows whose target is not numeric.
+        :param name: Name of the group, if the rows belong to a single group.
         """
-        for name, dataframe in data_dict.items():
-            if not pd.api.types.is_numeric_dtype(dataframe[self.config['target_column']]):
-                print(f"Warning: Non-numeric values found in data frame {name}")
-                dataframe[self.config['target_column']] = \
-                    pd.to_numeric(dataframe[self.config['target_column']], errors='coerce')
-                dataframe = dataframe.dropna(subset=[self.config['target_column']])
-            data_dict[name] = dataframe
-        return data_dict
+        if invalid_rows.empty:
+            return
+        if name is not None:
+            names = [name]
+        else:
+            names = invalid_rows[self.config['description_column']].unique()
+        for group_name in sorted(set(names) - self.non_numeric_groups):
+            print(f"Warning: Non-numeric values found in data frame {group_name}")
+            self.non_numeric_groups.add(group_name)
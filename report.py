@@ -9,12 +9,35 @@ Example:
     report = Report(data_dict, forecasts, config)
     report.create_plots()
 """
+from concurrent.futures import ProcessPoolExecutor
+import html
 import os
 import plotly.graph_objs as go
 import plotly.offline as pyo
+from storage import name_key
 
 
-class Report: # pylint: disable=too-few-public-methods
+PLOTLYJS_FILENAME = 'plotly.min.js'
+
+
+def _write_plot_worker(config, name, data, forecast):
+    """
+    Writes the plot of a single series inside a worker process.
+
+    Args:
+        config (dict): A dictionary containing configuration settings.
+        name (str): The name of the series.
+        data (DataFrame): The actual data of the series.
+        forecast (DataFrame): The forecasted data of the series.
+
+    Returns:
+        str: The path of the written file.
+    """
+
+    return Report({}, {}, config).write_plot(name, data, forecast)
+
+
+class Report:
     """
     A class used to create visualizations of forecasted data using Plotly.
 
@@ -22,6 +45,7 @@ class Report: # pylint: disable=too-few-public-methods
         data_dict (dict): A dictionary containing the actual data.
         forecasts (dict): A dictionary containing the forecasted data.
         config (dict): A dictionary containing configuration settings.
+        reports_folder (str): The folder the reports are written to.
     """
 
     def __init__(self, data_dict, forecasts, config):
@@ -31,51 +55,217 @@ class Report: # pylint: disable=too-few-public-methods
         Args:
             data_dict (dict): A dictionary containing the actual data.
             forecasts (dict): A dictionary containing the forecasted data.
-            config (dict): A dictionary containing configuration settings.
+            config (dict): A dictionary containing configuration settings. The optional
+                keys 'report_mode', 'report_plotlyjs' and 'report_workers' control how
+                the reports are written.
         """
 
         self.data_dict = data_dict
         self.forecasts = forecasts
         self.config = config
+        self.reports_folder = "Reports"
 
-    def create_plots(self):
+    def create_plots(self, names=None):
         """
         Creates and exports a Plotly visualization for each set of forecasted data.
 
-        The visualizations are exported as HTML files with the format "{name}_forecast.html",
-        where {name} is the name of the dataset.
+        The visualizations are exported as HTML files with the format "{key}_forecast.html",
+        where {key} is the file-name-safe key of the name of the dataset, or, if
+        'report_mode' is 'dashboard', as a single "dashboard.html" file. With more than
+        one 'report_workers', the files are rendered in parallel processes.
+
+        Args:
+            names (list): The series to export, defaults to all forecasted series. The
+                dashboard always contains all series.
         """
 
-        for name, forecast in self.forecasts.items():
+        # Check if the "Reports" folder exists, and create it if not
+        os.makedirs(self.reports_folder, exist_ok=True)
+        self.write_plotlyjs()
 
-            data = self.data_dict[name]
-            forecast = self.forecasts[name]
+        if self.config.get('report_mode', 'files') == 'dashboard':
+            self.write_dashboard()
+            return
 
-            # Check if the "Reports" folder exists, and create it if not
-            reports_folder = "Reports"
-            if not os.path.exists(reports_folder):
-                os.makedirs(reports_folder)
+        if names is None:
+            names = list(self.forecasts.keys())
+        workers = self.config.get('report_workers', 1) or os.cpu_count()
+        if workers > 1 and len(names) > 1:
+            # In out-of-core mode, the series are read and sent in batches to bound memory
+            batch_size = 4 * workers if self.config.get('out_of_core') else len(names)
+            with ProcessPoolExecutor(max_workers=min(workers, len(names))) as executor:
+                for start in range(0, len(names), batch_size):
+                    batch = names[start:start + batch_size]
+                    list(executor.map(_write_plot_worker, [self.config] * len(batch), batch,
+                                      [self.data_dict[name] for name in batch],
+                                      [self.forecasts[name] for name in batch]))
+        else:
+            for name in names:
+                self.write_plot(name, self.data_dict[name], self.forecasts[name])
 
-            # Create a Plotly figure object
-            fig = go.Figure()
+    def remove_plots(self, names):
+        """
+        Removes the exported HTML files of series that no longer exist.
 
-            # Add the actual data to the plot
-            fig.add_trace(go.Scatter(x=data['ds'], y=data['y'], name='Actual'))
+        Args:
+            names (list): The names of the series.
+        """
+
+        for name in names:
+            filename = self.plot_path(name)
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def plot_path(self, name):
+        """
+        Returns the path of the HTML file of a series. The file is named after the key of
+        the series name, as names may contain characters such as "/" or ":".
+
+        Args:
+            name (str): The name of the series.
+
+        Returns:
+            str: The path of the file inside the reports folder.
+        """
+
+        return os.path.join(self.reports_folder, f'{name_key(name)}_forecast.html')
+
+    def create_figure(self, name, data, forecast):
+        """
+        Creates the Plotly figure of a series.
+
+        Args:
+            name (str): The name of the series.
+            data (DataFrame): The actual data of the series.
+            forecast (DataFrame): The forecasted data of the series.
 
-            # Add the forecasted data to the plot
-            fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat'], name='Forecast'))
+        Returns:
+            Figure: The figure with the actual, forecasted and bound traces.
+        """
+
+        # Create a Plotly figure object
+        fig = go.Figure()
+
+        # Add the actual data to the plot
+        fig.add_trace(go.Scatter(x=data['ds'], y=data['y'], name='Actual'))
+
+        # Add the forecasted data to the plot
+        fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat'], name='Forecast'))
+
+        # Add upper and lower bounds to the plot
+        fig.add_trace(go.Scatter(x=forecast['ds'],
+                                 y=forecast['yhat_upper'], fill=None, mode='lines',
+                                 line_color='rgba(0, 0, 255, 0.2)', name='Upper Bound'))
+        fig.add_trace(go.Scatter(x=forecast['ds'],
+                                 y=forecast['yhat_lower'], fill='tonexty', mode='lines',
+                                 line_color='rgba(0, 0, 255, 0.2)', name='Lower Bound'))
+
+        # Set the plot layout
+        fig.update_layout(title=f"{name}", xaxis_title='Date',
+                          yaxis_title=self.config.get('y_axis_label'))
+        return fig
+
+    def get_plotlyjs_include(self):
+        """
+        Returns how plotly.js is included in the HTML files, based on 'report_plotlyjs':
+        'inline' embeds the full bundle in every file, 'cdn' references the Plotly CDN and
+        'directory' references a single plotly.min.js file shared by the reports folder.
+
+        Returns:
+            bool or str: The include_plotlyjs argument for Plotly's HTML export.
+        """
+
+        mode = self.config.get('report_plotlyjs', 'inline')
+        if mode not in ('inline', 'cdn', 'directory'):
+            raise ValueError(f"Unknown report_plotlyjs mode {mode}")
+        return True if mode == 'inline' else mode
+
+    def write_plotlyjs(self):
+        """
+        Writes the shared plotly.min.js bundle to the reports folder once, if the
+        'directory' include is used, so that parallel workers never write it concurrently.
+        """
+
+        path = os.path.join(self.reports_folder, PLOTLYJS_FILENAME)
+        if self.get_plotlyjs_include() == 'directory' and not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(pyo.get_plotlyjs())
+
+    def write_plot(self, name, data, forecast):
+        """
+        Exports the plot of a series to "{key}_forecast.html" inside the reports folder,
+        without opening a browser.
+
+        Args:
+            name (str): The name of the series.
+            data (DataFrame): The actual data of the series.
+            forecast (DataFrame): The forecasted data of the series.
+
+        Returns:
+            str: The path of the written file.
+        """
+
+        # Export the plot to an HTML file inside the "Reports" folder
+        filename = self.plot_path(name)
+        fig = self.create_figure(name, data, forecast)
+        fig.write_html(filename, include_plotlyjs=self.get_plotlyjs_include(), auto_open=False)
+        return filename
+
+    def write_dashboard(self):
+        """
+        Exports all series to a single "dashboard.html" file inside the reports folder.
+        Each figure is embedded as JSON and only rendered when it is selected.
+
+        Returns:
+            str: The path of the written file.
+        """
 
-            # Add upper and lower bounds to the plot
-            fig.add_trace(go.Scatter(x=forecast['ds'],
-                                     y=forecast['yhat_upper'], fill=None, mode='lines',
-                                     line_color='rgba(0, 0, 255, 0.2)', name='Upper Bound'))
-            fig.add_trace(go.Scatter(x=forecast['ds'],
-                                     y=forecast['yhat_lower'], fill='tonexty', mode='lines',
-                                     line_color='rgba(0, 0, 255, 0.2)', name='Lower Bound'))
+        include = self.get_plotlyjs_include()
+        if include is True:
+            plotlyjs = f'<script>{pyo.get_plotlyjs()}</script>'
+        elif include == 'cdn':
+            plotlyjs = (f'<script src="https://cdn.plot.ly/plotly-'
+                        f'{pyo.get_plotlyjs_version()}.min.js"></script>')
+        else:
+            plotlyjs = f'<script src="{PLOTLYJS_FILENAME}"></script>'
 
-            # Set the plot layout
-            fig.update_layout(title=f"{name}", xaxis_title='Date', yaxis_title=self.config.get('y_axis_label'))
+        options = []
+        figures = []
+        for index, name in enumerate(self.forecasts):
+            fig = self.create_figure(name, self.data_dict[name], self.forecasts[name])
+            # Escape closing tags so that the JSON cannot end its script element
+            figure_json = fig.to_json().replace('</', '<\\/')
+            options.append(f'<option value="{index}">{html.escape(str(name))}</option>')
+            figures.append(f'<script type="application/json" id="figure-{index}">'
+                           f'{figure_json}</script>')
 
-            # Export the plot to an HTML file inside the "Reports" folder
-            filename = os.path.join(reports_folder, f'{name}_forecast.html')
-            pyo.plot(fig, filename=filename)
+        title = html.escape(str(self.config.get('title', 'Forecasts')))
+        filename = os.path.join(self.reports_folder, 'dashboard.html')
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write(f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+{plotlyjs}
+</head>
+<body>
+<h1>{title}</h1>
+<select id="series">{''.join(options)}</select>
+<div id="plot" style="height: 80vh;"></div>
+{''.join(figures)}
+<script>
+var select = document.getElementById('series');
+function render() {{
+    var figure = JSON.parse(document.getElementById('figure-' + select.value).textContent);
+    Plotly.react('plot', figure.data, figure.layout);
+}}
+select.addEventListener('change', render);
+if (select.options.length) {{
+    render();
+}}
+</script>
+</body>
+</html>
+""")
+        return filename
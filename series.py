@@ -0,0 +1,352 @@
+"""
+series.py
+
+A module containing the SeriesCollection class, a compact representation of many
+time series that is passed between the pipeline stages instead of a dictionary of
+data frames. All groups share one contiguous datetime64 array and one float64 array;
+the rows of each group are located through an offsets index.
+
+For sources larger than memory, the ShardedSeries class provides the same mapping
+interface over one on-disk shard file per group, so that only the group being
+processed is held in memory.
+"""
+
+from collections.abc import Mapping
+import json
+import os
+import numpy as np
+import pandas as pd
+from storage import name_key
+
+
+# Layout of the records of a shard file: nanosecond timestamps and target values
+RECORD_DTYPE = np.dtype([('ds', '<i8'), ('y', '<f8')])
+
+
+class SeriesCollection(Mapping):
+    """
+    A read-only mapping of group names to 'ds'/'y' series backed by shared arrays.
+
+    Attributes
+    ----------
+    names : list
+        The sorted group names. The position of a name is its categorical code.
+    offsets : np.ndarray
+        An int64 array of length len(names) + 1; the rows of group i are
+        offsets[i]:offsets[i + 1].
+    ds : np.ndarray
+        The datetime64[ns] dates of all groups, ordered by group.
+    y : np.ndarray
+        The float64 target values of all groups, ordered by group.
+
+    Methods
+    -------
+    from_frames(frames, group_column, date_column, target_column):
+        Builds a collection from a data frame or an iterable of data frame chunks.
+    from_parts(codes_by_name, code_parts, ds_parts, y_parts):
+        Builds a collection from the group codes, dates and values of data chunks.
+    get_arrays(name):
+        Returns zero-copy views of the dates and values of a group.
+    """
+
+    def __init__(self, names, offsets, ds, y):
+        """
+        Parameters
+        ----------
+        names : list
+            The group names.
+        offsets : array-like
+            The row offsets of the groups, of length len(names) + 1.
+        ds : np.ndarray
+            The dates of all groups, ordered by group.
+        y : np.ndarray
+            The target values of all groups, ordered by group.
+        """
+        self.names = list(names)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ds = ds
+        self.y = y
+        self._codes = {name: code for code, name in enumerate(self.names)}
+
+    @classmethod
+    def from_frames(cls, frames, group_column, date_column='ds', target_column='y'):
+        """
+        Builds a collection from a data frame or an iterable of data frame chunks.
+        Rows keep their original order within each group, and rows without a group
+        name are dropped, as in DataFrame.groupby.
+
+        Parameters
+        ----------
+        frames : pd.DataFrame or iterable of pd.DataFrame
+            The data holding the group, date and target columns.
+        group_column : str
+            The name of the column identifying the groups.
+        date_column : str
+            The name of the date column.
+        target_column : str
+            The name of the target column.
+
+        Returns
+        -------
+        SeriesCollection
+            The collection of all groups in the data.
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+
+        codes_by_name = {}
+        code_parts, ds_parts, y_parts = [], [], []
+        for frame in frames:
+            codes, uniques = pd.factorize(frame[group_column])
+            lookup = np.array([codes_by_name.setdefault(name, len(codes_by_name))
+                               for name in uniques], dtype=np.int64)
+            keep = codes >= 0
+            code_parts.append(lookup[codes[keep]])
+            ds_parts.append(frame[date_column].to_numpy(dtype='datetime64[ns]')[keep])
+            y_parts.append(frame[target_column].to_numpy(dtype=np.float64)[keep])
+        return cls.from_parts(codes_by_name, code_parts, ds_parts, y_parts)
+
+    @classmethod
+    def from_parts(cls, codes_by_name, code_parts, ds_parts, y_parts):
+        """
+        Builds a collection from the group codes, dates and values of data chunks,
+        ordering the rows by group name while keeping their order within each group.
+
+        Parameters
+        ----------
+        codes_by_name : dict
+            The code of every group name, in order of appearance.
+        code_parts : list of np.ndarray
+            The group code of each row, one array per chunk.
+        ds_parts : list of np.ndarray
+            The datetime64 dates of each row, one array per chunk.
+        y_parts : list of np.ndarray
+            The float64 values of each row, one array per chunk.
+
+        Returns
+        -------
+        SeriesCollection
+            The collection of all groups in the chunks.
+        """
+        names = sorted(codes_by_name)
+        ranks = np.empty(len(names), dtype=np.int64)
+        ranks[[codes_by_name[name] for name in names]] = np.arange(len(names))
+        codes = ranks[np.concatenate(code_parts)] if code_parts \
+            else np.empty(0, dtype=np.int64)
+        order = np.argsort(codes, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(names)))))
+        ds = np.concatenate(ds_parts)[order] if ds_parts else np.empty(0, 'datetime64[ns]')
+        y = np.concatenate(y_parts)[order] if y_parts else np.empty(0, np.float64)
+        return cls(names, offsets, ds, y)
+
+    def get_arrays(self, name):
+        """
+        Returns zero-copy views of the dates and values of a group.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        tuple
+            The datetime64 dates and float64 values of the group.
+        """
+        code = self._codes[name]
+        start, stop = self.offsets[code], self.offsets[code + 1]
+        return self.ds[start:stop], self.y[start:stop]
+
+    def __getitem__(self, name):
+        """
+        Returns the group as a data frame with 'ds' and 'y' columns.
+        """
+        ds, y = self.get_arrays(name)
+        return pd.DataFrame({'ds': ds, 'y': y}, copy=False)
+
+    def __contains__(self, name):
+        return name in self._codes
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def to_records(frame, codes, date_column, target_column):
+    """
+    Converts the rows of a data frame to shard records ordered by group, keeping
+    their order within each group and dropping the rows without a group.
+
+    Parameters
+    ----------
+    frame : pd.DataFrame
+        The data holding the date and target columns.
+    codes : np.ndarray
+        The group code of each row, -1 for rows without a group.
+    date_column : str
+        The name of the date column.
+    target_column : str
+        The name of the target column.
+
+    Returns
+    -------
+    np.ndarray
+        The RECORD_DTYPE records of the rows with a group.
+    """
+    records = np.empty(len(frame), dtype=RECORD_DTYPE)
+    records['ds'] = frame[date_column].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    records['y'] = frame[target_column].to_numpy(dtype=np.float64)
+    order = np.argsort(codes, kind='stable')
+    return records[order[np.count_nonzero(codes < 0):]]
+
+
+def append_shards(directory, groups, names, counts, records):
+    """
+    Appends the records of a chunk to the shard files of their groups, adding the
+    groups that are new to the shard index.
+
+    Parameters
+    ----------
+    directory : str
+        The folder of the shards.
+    groups : dict
+        The shard file and row count by group name, updated in place.
+    names : array-like
+        The group names of the chunk.
+    counts : np.ndarray
+        The number of records of each group.
+    records : np.ndarray
+        The RECORD_DTYPE records of the chunk, ordered by group.
+    """
+    start = 0
+    for name, count in zip(names, counts):
+        group = groups.setdefault(name, {
+            'file': name_key(name) + '.bin',
+            'rows': 0})
+        with open(os.path.join(directory, group['file']), 'ab') as file:
+            records[start:start + count].tofile(file)
+        group['rows'] += int(count)
+        start += count
+
+
+class ShardedSeries(Mapping):
+    """
+    A read-only mapping of group names to 'ds'/'y' series stored on disk, one binary
+    shard file of RECORD_DTYPE records per group, with an "index.json" file listing
+    the groups, their files and row counts.
+
+    Attributes
+    ----------
+    directory : str
+        The folder holding the shard files and the index.
+    groups : dict
+        The 'file' and 'rows' of every group by group name.
+    names : list
+        The sorted group names.
+
+    Methods
+    -------
+    from_frames(frames, group_column, date_column, target_column, directory):
+        Partitions a data frame, or an iterable of data frame chunks, into shards.
+    get_arrays(name):
+        Reads the dates and values of a group from its shard.
+    """
+
+    def __init__(self, directory, groups=None):
+        """
+        Parameters
+        ----------
+        directory : str
+            The folder holding the shard files and the index.
+        groups : dict, optional
+            The 'file' and 'rows' of every group by name; read from the index if
+            not given.
+        """
+        self.directory = directory
+        if groups is None:
+            with open(os.path.join(directory, 'index.json'), encoding='utf-8') as file:
+                groups = json.load(file)['groups']
+        self.groups = groups
+        self.names = sorted(groups)
+
+    @classmethod
+    def from_frames(cls, frames, group_column, date_column='ds', target_column='y',
+                    directory='Shards'):
+        """
+        Partitions a data frame, or an iterable of data frame chunks, into one shard
+        file per group while streaming through the chunks, so that only one chunk is
+        held in memory. Shards left in the directory by a previous run are removed.
+        Rows keep their original order within each group, and rows without a group
+        name are dropped.
+
+        Parameters
+        ----------
+        frames : pd.DataFrame or iterable of pd.DataFrame
+            The data holding the group, date and target columns.
+        group_column : str
+            The name of the column identifying the groups.
+        date_column : str
+            The name of the date column.
+        target_column : str
+            The name of the target column.
+        directory : str
+            The folder to write the shards and the index to.
+
+        Returns
+        -------
+        ShardedSeries
+            The mapping of all groups in the data.
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        os.makedirs(directory, exist_ok=True)
+        for filename in os.listdir(directory):
+            if filename.endswith('.bin'):
+                os.remove(os.path.join(directory, filename))
+
+        groups = {}
+        for frame in frames:
+            codes, uniques = pd.factorize(frame[group_column])
+            append_shards(directory, groups, uniques,
+                          np.bincount(codes[codes >= 0], minlength=len(uniques)),
+                          to_records(frame, codes, date_column, target_column))
+
+        with open(os.path.join(directory, 'index.json'), 'w', encoding='utf-8') as file:
+            json.dump({'groups': groups}, file, indent=2)
+        return cls(directory, groups)
+
+    def get_arrays(self, name):
+        """
+        Reads the dates and values of a group from its shard.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+
+        Returns
+        -------
+        tuple
+            The datetime64 dates and float64 values of the group.
+        """
+        path = os.path.join(self.directory, self.groups[name]['file'])
+        records = np.fromfile(path, dtype=RECORD_DTYPE)
+        return records['ds'].view('datetime64[ns]'), records['y']
+
+    def __getitem__(self, name):
+        """
+        Returns the group as a data frame with 'ds' and 'y' columns.
+        """
+        ds, y = self.get_arrays(name)
+        return pd.DataFrame({'ds': ds, 'y': y})
+
+    def __contains__(self, name):
+        return name in self.groups
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
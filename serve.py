@@ -0,0 +1,460 @@
+"""
+This module serves stored forecasts over HTTP as JSON. The latest forecast of every
+group in the ForecastStore (or the forecasts of one run) is loaded into memory once
+at startup, so most requests are answered without touching disk or Prophet. Requests
+for a longer horizon than was stored are predicted from the group's fitted model in
+the ModelStore; loaded models are kept in an LRU cache and the extended forecasts are
+kept for later requests.
+
+Example:
+    python serve.py --port 8000
+    curl "http://127.0.0.1:8000/forecast?group=Coal%20Consumption&horizon=24"
+    curl -d '{"group": "Coal Consumption", "intervals": false}' http://127.0.0.1:8000/forecast
+"""
+
+import argparse
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+from forecast import Forecast
+from forecast_store import ForecastStore
+from model_store import ModelStore
+
+
+INTERVAL_COLUMNS = ['yhat_lower', 'yhat_upper']
+BOOLEAN_VALUES = {'true': True, '1': True, 'yes': True,
+                  'false': False, '0': False, 'no': False}
+
+
+def parse_horizon(value):
+    """
+    Parses the horizon field of a request.
+
+    Args:
+        value: The field as sent, a JSON integer or a query string.
+
+    Returns:
+        int: The horizon, or None if it was not sent.
+
+    Raises:
+        ValueError: If the field is not an integer.
+    """
+
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('+-').isdigit():
+        return int(value)
+    raise ValueError("horizon must be an integer")
+
+
+def parse_intervals(value):
+    """
+    Parses the intervals field of a request.
+
+    Args:
+        value: The field as sent, a JSON boolean or a query string such as "false".
+
+    Returns:
+        bool: Whether to include the intervals, True if the field was not sent.
+
+    Raises:
+        ValueError: If the field is not a boolean.
+    """
+
+    if value is None:
+        return True
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in BOOLEAN_VALUES:
+        return BOOLEAN_VALUES[value.lower()]
+    raise ValueError("intervals must be true or false")
+
+
+# The cache is only read through get, loading misses itself, so it has no other
+# public methods
+class LRUCache:  # pylint: disable=too-few-public-methods
+    """
+    A thread-safe cache that keeps the most recently used entries. Each entry is
+    loaded once even when several threads request it at the same time.
+
+    Attributes:
+        max_size (int): The number of entries kept.
+    """
+
+    def __init__(self, max_size):
+        """
+        Initializes an empty cache.
+
+        Args:
+            max_size (int): The number of entries kept.
+        """
+
+        self.max_size = max(1, max_size)
+        self.entries = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, load):
+        """
+        Returns the entry of a key, loading it on a miss and evicting the least
+        recently used entry if the cache is full.
+
+        Args:
+            key (str): The key of the entry.
+            load (callable): Loads the entry of a key on a miss.
+
+        Returns:
+            object: The entry.
+        """
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            key_lock = self.loading.setdefault(key, threading.Lock())
+        with key_lock:
+            with self.lock:
+                if key in self.entries:
+                    return self.entries[key]
+            value = load(key)
+            with self.lock:
+                self.entries[key] = value
+                self.loading.pop(key, None)
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+        return value
+
+
+# The service holds the forecasts, the model cache and the per-group locks shared by
+# all request threads, so they live on one object
+class ForecastService:  # pylint: disable=too-many-instance-attributes
+    """
+    The stored forecasts, held in memory as JSON-ready columns.
+
+    Attributes:
+        config (dict): A dictionary containing configuration settings.
+        run (str): The identifier of the served run, or of the latest run.
+        runs (dict): The identifier of the run each group's forecast is served from.
+        forecasts (dict): The 'ds', 'yhat', 'yhat_lower' and 'yhat_upper' columns of
+            each group as lists, extended when a longer horizon is requested.
+        model_keys (dict): The model store keys of the groups whose model is cached.
+        models (LRUCache): The fitted models loaded from the model store.
+    """
+
+    def __init__(self, config, run=None):
+        """
+        Loads the stored forecasts from the forecast store. The index of every run
+        is read once, and each group's partition is read directly.
+
+        Args:
+            config (dict): A dictionary containing configuration settings. The
+                optional keys 'serve_model_cache_size' and 'serve_max_horizon' set
+                the number of models kept in memory and the longest horizon served.
+            run (str): The identifier of the run to serve. By default, each group is
+                served from the latest run that stored it, so that groups missing
+                from the latest run (e.g. because they failed) are still served.
+        """
+
+        store = ForecastStore(config)
+        runs = store.get_runs()
+        self.config = config
+        self.run = run or (runs[-1] if runs else None)
+        if self.run not in runs:
+            raise ValueError(f"No forecasts stored for run {self.run} in {store.directory}")
+        self.runs = dict.fromkeys(store.get_groups(run), run) if run \
+            else store.get_latest_runs()
+        self.forecasts = {}
+        self.model_keys = {}
+        for name, group_run in self.runs.items():
+            self.forecasts[name] = self.to_columns(
+                pd.read_parquet(store.get_path(group_run, name)))
+            model_key = store.get_entries(group_run)[name].get('model')
+            if model_key is not None:
+                self.model_keys[name] = model_key
+        self.models = LRUCache(config.get('serve_model_cache_size', 8))
+        self.model_store = ModelStore(config) if self.model_keys else None
+        self.forecaster = Forecast({}, config)
+        self.group_locks = {name: threading.Lock() for name in self.forecasts}
+
+    @staticmethod
+    def to_columns(forecast):
+        """
+        Converts a forecast to the lists its JSON responses are sliced from.
+
+        Args:
+            forecast (pd.DataFrame): The forecast with 'ds', 'yhat', 'yhat_lower'
+                and 'yhat_upper' columns.
+
+        Returns:
+            dict: The columns as lists, with the dates as ISO strings.
+        """
+
+        columns = {column: forecast[column].tolist() for column in ['yhat', *INTERVAL_COLUMNS]}
+        return {'ds': forecast['ds'].dt.strftime('%Y-%m-%d').tolist(), **columns}
+
+    def load_model(self, key):
+        """
+        Loads a fitted model from the model store.
+
+        Args:
+            key (str): The model store key.
+
+        Returns:
+            Prophet: The fitted model.
+        """
+
+        prophet_model = self.model_store.load(key)
+        if prophet_model is None:
+            raise ValueError(f"The model {key} is no longer in the model cache")
+        return prophet_model
+
+    def get_extend_error(self, name):
+        """
+        Explains why the forecast of a group cannot be extended.
+
+        Args:
+            name (str): The name of the group.
+
+        Returns:
+            str: The reason the group has no fitted model to predict from.
+        """
+
+        hierarchy = self.config.get('hierarchy') or {}
+        if name in set(hierarchy).union(*hierarchy.values()):
+            return "longer horizons are not supported for reconciled groups"
+        engine = self.forecaster.get_engine(name)
+        if engine != 'prophet':
+            return f"longer horizons are not supported for the {engine} engine"
+        if not self.config.get('model_cache'):
+            return "longer horizons require 'model_cache' to be enabled"
+        return "its model was not cached by the run"
+
+    def extend(self, name, horizon):
+        """
+        Predicts the periods following the stored forecast of a group from its fitted
+        model, and keeps the extended forecast for later requests.
+
+        Args:
+            name (str): The name of the group.
+            horizon (int): The number of periods to forecast.
+
+        Returns:
+            dict: The extended columns of the group.
+        """
+
+        if name not in self.model_keys:
+            raise ValueError(f"Only {len(self.forecasts[name]['ds'])} periods are stored "
+                             f"for {name}: {self.get_extend_error(name)}")
+        with self.group_locks[name]:
+            columns = self.forecasts[name]
+            stored = len(columns['ds'])
+            if horizon <= stored:
+                return columns
+            prophet_model = self.models.get(self.model_keys[name], self.load_model)
+            last_date = pd.Timestamp(columns['ds'][-1]) if stored \
+                else prophet_model.history_dates.max()
+            dates = pd.date_range(start=last_date, periods=horizon - stored + 1,
+                                  freq=self.config['period_frequency'])
+            future = pd.DataFrame({'ds': dates[dates > last_date][:horizon - stored]})
+            extension = self.to_columns(self.forecaster.get_forecast(prophet_model, future))
+            columns = {column: values + extension[column] for column, values in columns.items()}
+            self.forecasts[name] = columns
+        return columns
+
+    def get_forecast(self, name, horizon=None, intervals=True):
+        """
+        Returns the forecast of a group as a JSON-ready dictionary.
+
+        Args:
+            name (str): The name of the group.
+            horizon (int): The number of periods to return, defaults to the stored
+                periods.
+            intervals (bool): Whether to include 'yhat_lower' and 'yhat_upper'.
+
+        Returns:
+            dict: The group, the run it was stored by and the forecast columns.
+        """
+
+        if name not in self.forecasts:
+            raise KeyError(name)
+        columns = self.forecasts[name]
+        if horizon is None:
+            horizon = len(columns['ds'])
+        max_horizon = self.config.get('serve_max_horizon', 120)
+        if not 0 < horizon <= max(max_horizon, len(columns['ds'])):
+            raise ValueError(f"horizon must be between 1 and {max_horizon}")
+        if horizon > len(columns['ds']):
+            columns = self.extend(name, horizon)
+        keys = ['ds', 'yhat', *(INTERVAL_COLUMNS if intervals else [])]
+        return {'group': name, 'run': self.runs[name],
+                **{key: columns[key][:horizon] for key in keys}}
+
+
+class ForecastRequestHandler(BaseHTTPRequestHandler):
+    """
+    Answers the requests of the forecast server:
+
+    - GET /health returns the served run.
+    - GET /groups returns the served groups and their stored periods.
+    - GET /forecast?group=...&horizon=...&intervals=... and POST /forecast with a
+      JSON object of the same fields return the forecast of a group.
+    """
+
+    # Keep connections open between requests, and send the body right after the
+    # headers instead of waiting for the client to acknowledge them
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers GET requests.
+        """
+
+        url = urlparse(self.path)
+        service = self.server.service
+        if url.path == '/health':
+            self.send_json(200, {'status': 'ok', 'run': service.run})
+        elif url.path == '/groups':
+            self.send_json(200, {'run': service.run,
+                                 'groups': {name: len(columns['ds'])
+                                            for name, columns in service.forecasts.items()}})
+        elif url.path == '/forecast':
+            self.send_forecast({key: values[-1] for key, values in parse_qs(url.query).items()})
+        else:
+            self.send_json(404, {'error': f"Unknown path {url.path}"})
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """
+        Answers POST requests.
+        """
+
+        if urlparse(self.path).path != '/forecast':
+            self.send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        length = self.headers.get('Content-Length', '0')
+        if not length.isdigit():
+            self.send_json(400, {'error': "Invalid Content-Length"})
+            return
+        body = self.rfile.read(int(length))
+        try:
+            query = json.loads(body or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': "The request body is not valid JSON"})
+            return
+        if not isinstance(query, dict):
+            self.send_json(400, {'error': "The request body must be a JSON object"})
+            return
+        self.send_forecast(query)
+
+    def send_forecast(self, query):
+        """
+        Sends the forecast of the group of a request.
+
+        Args:
+            query (dict): The 'group' and optional 'horizon' and 'intervals' fields.
+        """
+
+        service = self.server.service
+        name = query.get('group')
+        if not isinstance(name, str):
+            self.send_json(400, {'error': "Missing group"})
+            return
+        if name not in service.forecasts:
+            self.send_json(404, {'error': f"Unknown group {name}"})
+            return
+        try:
+            payload = service.get_forecast(name, parse_horizon(query.get('horizon')),
+                                           parse_intervals(query.get('intervals')))
+        except ValueError as error:
+            self.send_json(400, {'error': str(error)})
+            return
+        self.send_json(200, payload)
+
+    def send_json(self, status, payload):
+        """
+        Sends a JSON response.
+
+        Args:
+            status (int): The HTTP status code.
+            payload (dict): The response body.
+        """
+
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """
+        Logs requests only if the server is verbose, as writing every request to
+        stderr costs more than answering it.
+        """
+
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(service, host='127.0.0.1', port=8000, verbose=False):
+    """
+    Creates a threaded HTTP server answering requests from a ForecastService.
+
+    Args:
+        service (ForecastService): The forecasts to serve.
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 for any free port.
+        verbose (bool): Whether to log every request.
+
+    Returns:
+        ThreadingHTTPServer: The server, not yet serving.
+    """
+
+    server = ThreadingHTTPServer((host, port), ForecastRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def main(argv=None):
+    """
+    Serves the latest stored forecast of every group (or the forecasts of one run)
+    from the command line until it is interrupted.
+
+    Args:
+        argv (list): The command line arguments, defaults to sys.argv.
+    """
+
+    from pipeline import Pipeline  # pylint: disable=import-outside-toplevel
+
+    parser = argparse.ArgumentParser(description='Serve stored forecasts over HTTP.')
+    parser.add_argument('--config', help='configuration file, defaults to config.json')
+    parser.add_argument('--host', help='address to listen on, defaults to "serve_host"')
+    parser.add_argument('--port', type=int, help='port to listen on, defaults to "serve_port"')
+    parser.add_argument('--run', help="run to serve, defaults to each group's latest stored run")
+    parser.add_argument('--verbose', action='store_true', help='log every request')
+    args = parser.parse_args(argv)
+
+    config = Pipeline(args.config).config
+    service = ForecastService(config, args.run)
+    host = args.host or config.get('serve_host', '127.0.0.1')
+    port = config.get('serve_port', 8000) if args.port is None else args.port
+    server = create_server(service, host, port, args.verbose)
+    print(f"Serving {len(service.forecasts)} groups of run {service.run} "
+          f"on http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+This module provides the SourceCache class, which keeps a local Parquet copy of every parsed
+URL data source together with the HTTP validators (ETag and Last-Modified) of the download,
+so that unchanged sources can be revalidated with a conditional request and loaded from the
+columnar copy instead of being downloaded and parsed again.
+"""
+
+import json
+import os
+from storage import atomic_path, atomic_write, name_key
+
+
+class SourceCache:
+    """
+    SourceCache stores parsed data sources as Parquet files keyed by their URL.
+    """
+
+    def __init__(self, config):
+        """
+        Initializes the SourceCache class with the given configuration and creates the cache
+        folder if needed.
+
+        :param config: dict, configuration settings for the ETL pipeline. The optional key
+                       'source_cache_dir' sets the cache folder.
+        """
+        self.config = config
+        self.directory = config.get('source_cache_dir', 'SourceCache')
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_paths(self, url):
+        """
+        Returns the paths used to cache the given URL.
+
+        :param url: str, URL of the data source.
+        :return: tuple, paths of the Parquet data file, the metadata file and the raw download.
+        """
+        base = os.path.join(self.directory, name_key(url))
+        return f"{base}.parquet", f"{base}.json", f"{base}.csv"
+
+    def read_meta(self, url):
+        """
+        Reads the metadata stored for the given URL.
+
+        :param url: str, URL of the data source.
+        :return: dict, stored metadata, or None if the URL is not cached.
+        """
+        data_path, meta_path, _ = self.get_paths(url)
+        if not os.path.exists(data_path):
+            return None
+        try:
+            with open(meta_path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def get_conditional_headers(self, url, columns):
+        """
+        Returns the request headers that revalidate the cached copy of the given URL.
+
+        :param url: str, URL of the data source.
+        :param columns: list, columns that must be present in the cached copy.
+        :return: dict, If-None-Match/If-Modified-Since headers, empty if there is no usable copy.
+        """
+        meta = self.read_meta(url)
+        if meta is None or not set(columns) <= set(meta.get('columns', [])):
+            return {}
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def store(self, url, chunks, columns, headers):
+        """
+        Stores the parsed data of the given URL with the validators of its HTTP response.
+        The chunks are written to the Parquet file one row group at a time, so the source is
+        never held in memory. Every column is stored as text, keeping missing values, since
+        the chunks of a column may parse as numbers or as text.
+
+        :param url: str, URL of the data source.
+        :param chunks: iterable, parsed data in pandas DataFrame chunks.
+        :param columns: list, columns of the data.
+        :param headers: Mapping, headers of the HTTP response the data was downloaded with.
+        """
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq  # pylint: disable=import-outside-toplevel
+
+        data_path, meta_path, _ = self.get_paths(url)
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        with atomic_path(data_path) as temp_path:
+            with pq.ParquetWriter(temp_path, schema) as writer:
+                for chunk in chunks:
+                    writer.write_table(pa.Table.from_pandas(chunk[columns].astype('string'),
+                                                            schema=schema,
+                                                            preserve_index=False))
+        meta = {'url': url,
+                'etag': headers.get('ETag'),
+                'last_modified': headers.get('Last-Modified'),
+                'columns': list(columns)}
+        with atomic_write(meta_path) as file:
+            json.dump(meta, file)
@@ -0,0 +1,78 @@
+"""
+This module provides the helpers shared by the on-disk stores: stable file names
+derived from group names or URLs, and atomic file writes.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import os
+import threading
+
+
+def name_key(name, length=16):
+    """
+    Returns a file-name-safe key of a group name or URL.
+
+    Parameters
+    ----------
+    name : str
+        The name to derive the key from.
+    length : int or None
+        The number of hex digits of the key, or None for the full digest.
+
+    Returns
+    -------
+    str
+        The hex digest of the name, truncated to length digits.
+    """
+    digest = hashlib.sha256(str(name).encode('utf-8')).hexdigest()
+    return digest if length is None else digest[:length]
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Yields a temporary path to write a file to, and moves it to path once the block
+    completes, so that readers never see a partially written file. The temporary file
+    is removed if the block fails.
+
+    Parameters
+    ----------
+    path : str
+        The final path of the file.
+
+    Yields
+    ------
+    str
+        The temporary path, unique to the writing process and thread.
+    """
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@contextmanager
+def atomic_write(path, mode='w'):
+    """
+    Opens a file for writing through atomic_path.
+
+    Parameters
+    ----------
+    path : str
+        The final path of the file.
+    mode : str
+        The file mode, 'w' for UTF-8 text or 'wb' for bytes.
+
+    Yields
+    ------
+    file
+        The open temporary file.
+    """
+    encoding = None if 'b' in mode else 'utf-8'
+    with atomic_path(path) as temp_path:
+        with open(temp_path, mode, encoding=encoding) as file:
+            yield file
@@ -0,0 +1,60 @@
+"""
+Tests of the Prophet parameter backtest.
+"""
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from backtest import Backtest
+
+
+def make_backtest(**overrides):
+    """
+    Returns a backtest of one monthly series with a single fold.
+    """
+    dates = pd.date_range('2018-01-01', periods=48, freq='MS')
+    series = {'a': pd.DataFrame({'ds': dates, 'y': np.linspace(1.0, 2.0, len(dates))})}
+    config = {'max_train_date': '202312', 'date_format': '%Y%m', 'backtest_folds': 1,
+              'backtest_workers': 1, **overrides}
+    return Backtest(series, config)
+
+
+def test_configured_uncertainty_samples_are_overridden():
+    """
+    Backtest fits skip uncertainty sampling even when prophet_params sets it.
+    """
+    backtest = make_backtest(prophet_params={'uncertainty_samples': 100},
+                             backtest_grid={'changepoint_prior_scale': [0.05]})
+    results = backtest.run()
+
+    assert len(results) == 1
+    assert results['rmse'].notna().all()
+
+
+def test_failed_combination_is_left_out(capsys):
+    """
+    A parameter combination that fails is warned about and left out of the results.
+    """
+    backtest = make_backtest(backtest_grid={'seasonality_mode': ['additive', 'unknown']})
+    results = backtest.run()
+
+    assert results['params'].tolist() == [{'seasonality_mode': 'additive'}]
+    assert "Backtest failed for a with {'seasonality_mode': 'unknown'}" in capsys.readouterr().out
+
+
+def test_best_params_are_merged_into_the_saved_file(tmp_path):
+    """
+    Saving the best parameters keeps the groups of the previous file and leaves no
+    temporary file behind.
+    """
+    path = tmp_path / 'best_params.json'
+    path.write_text(json.dumps({'metric': 'rmse', 'groups': {'b': {'params': {}}}}),
+                    encoding='utf-8')
+    backtest = make_backtest(best_params_file=str(path))
+    backtest.save_best_params({'a': {'params': {'changepoint_prior_scale': 0.5}}})
+
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved['metric'] == 'mape'
+    assert sorted(saved['groups']) == ['a', 'b']
+    assert os.listdir(tmp_path) == ['best_params.json']
@@ -0,0 +1,68 @@
+"""
+Tests of the batched NumPy baseline engine.
+"""
+
+import numpy as np
+import pandas as pd
+from baseline import BaselineEngine
+
+
+def make_series(start, periods, trend=1.0):
+    """
+    Returns a monthly series with a linear trend and a yearly seasonal pattern.
+    """
+    dates = pd.date_range(start, periods=periods, freq='MS')
+    seasonal = np.tile(np.arange(12.0), periods // 12 + 1)[:periods]
+    return pd.DataFrame({'ds': dates, 'y': trend * np.arange(periods) + seasonal})
+
+
+def future_grid(last_date, periods=6):
+    """
+    Returns the next monthly dates after last_date, like Forecast.get_future_grid.
+    """
+    return pd.DataFrame({'ds': pd.date_range(last_date, periods=periods + 1, freq='MS')[1:]})
+
+
+def test_forecasts_have_the_grid_shape_and_extrapolate():
+    """
+    Every series gets a forecast on the grid of its own last date, with ordered
+    intervals, and a noiseless trend plus season is extrapolated exactly.
+    """
+    train_sets = {'long': make_series('2015-01-01', 96),
+                  'short': make_series('2019-01-01', 30, trend=-0.5)}
+    results = BaselineEngine({'period_frequency': 'MS'}).forecast(train_sets, future_grid)
+
+    assert set(results) == {'long', 'short'}
+    for name, (forecast, error) in results.items():
+        assert error is None
+        assert list(forecast.columns) == ['ds', 'yhat', 'yhat_lower', 'yhat_upper']
+        assert forecast['ds'].tolist() == \
+            future_grid(train_sets[name]['ds'].iloc[-1])['ds'].tolist()
+        assert (forecast['yhat_lower'] <= forecast['yhat']).all()
+        assert (forecast['yhat'] <= forecast['yhat_upper']).all()
+    expected = make_series('2015-01-01', 102)['y'].iloc[96:].to_numpy()
+    np.testing.assert_allclose(results['long'][0]['yhat'], expected, atol=1e-3)
+
+
+def test_missing_values_and_short_series():
+    """
+    Missing values are skipped, series with fewer than two values fail alone, and
+    series shorter than a season are still forecast.
+    """
+    gappy = make_series('2018-01-01', 48)
+    gappy.loc[[5, 20, 47], 'y'] = np.nan
+    train_sets = {'gappy': gappy,
+                  'empty': make_series('2018-01-01', 12).assign(y=np.nan),
+                  'single': make_series('2018-01-01', 1),
+                  'short': make_series('2018-01-01', 4)}
+    results = BaselineEngine({'period_frequency': 'MS'}).forecast(train_sets, future_grid)
+
+    assert results['empty'] == (None, "ValueError: Dataframe has less than 2 non-NaN rows.")
+    assert results['single'][0] is None
+    for name in ('gappy', 'short'):
+        forecast, error = results[name]
+        assert error is None
+        assert len(forecast) == 6
+        assert forecast[['yhat', 'yhat_lower', 'yhat_upper']].notna().all().all()
+    # The last observed date, not the trailing missing one, sets the grid
+    assert results['gappy'][0]['ds'].iloc[0] == pd.Timestamp('2021-12-01')
@@ -0,0 +1,86 @@
+"""
+Tests of the per-group checkpoints of a run and of resuming from them.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from checkpoint import Checkpoint
+from forecast import Forecast
+
+
+def make_series(offset=0.0):
+    """
+    Returns the monthly train sets of two groups.
+    """
+    dates = pd.date_range('2020-01-01', periods=36, freq='MS')
+    return {name: pd.DataFrame({'ds': dates, 'y': np.arange(36.0) * scale + offset})
+            for name, scale in (('a', 1.0), ('b', 2.0))}
+
+
+def make_forecast(series, checkpoint):
+    """
+    Returns a Forecast of the train sets with the baseline engine and a checkpoint.
+    """
+    config = {'max_train_date': '202212', 'prediction_start': '202301', 'date_format': '%Y%m',
+              'engine': 'baseline', 'period_frequency': 'MS', 'predict_periods': 6}
+    return Forecast(series, config, checkpoint)
+
+
+def test_saved_groups_are_loaded_and_cleared(tmp_path):
+    """
+    A saved group is logged with its data key and loaded back, and clear removes the
+    checkpoints of the run.
+    """
+    checkpoint = Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1')
+    assert not checkpoint.exists()
+    forecast = pd.DataFrame({'ds': [pd.Timestamp('2023-01-01')], 'yhat': [1.0]})
+    checkpoint.save('a/b', forecast, {'engine': 'baseline'}, make_series()['a'])
+
+    done = Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1').load_done()
+    assert list(done) == ['a/b']
+    assert done['a/b']['data_key'] == Checkpoint.data_key(make_series()['a'])
+    loaded, timings = checkpoint.load('a/b', done['a/b'])
+    assert loaded.equals(forecast) and timings == {'engine': 'baseline'}
+
+    checkpoint.clear()
+    assert not checkpoint.exists()
+    assert not os.path.exists(tmp_path / 'run1')
+
+
+def test_torn_last_line_is_replaced(tmp_path):
+    """
+    An entry cut off by an interruption is ignored on load and removed before the
+    resumed run appends, so that the next entry is not lost with it.
+    """
+    checkpoint = Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1')
+    checkpoint.save('a', pd.DataFrame(), {}, make_series()['a'])
+    with open(tmp_path / 'run1' / 'done.jsonl', 'a', encoding='utf-8') as file:
+        file.write('{"group": "b", "fi')
+
+    resumed = Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1')
+    assert list(resumed.load_done()) == ['a']
+    resumed.save('c', pd.DataFrame(), {}, make_series()['b'])
+    resumed.save('d', pd.DataFrame(), {}, make_series()['b'])
+
+    assert list(resumed.load_done()) == ['a', 'c', 'd']
+
+
+def test_resume_skips_completed_groups_with_unchanged_data(tmp_path):
+    """
+    A resumed run loads the checkpointed groups whose data is unchanged and forecasts
+    the others again.
+    """
+    checkpoint = Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1')
+    first = make_forecast(make_series(), checkpoint).run()
+    assert sorted(checkpoint.load_done()) == ['a', 'b']
+
+    series = make_series()
+    series['b'] = make_series(offset=5.0)['b']
+    forecaster = make_forecast(series, Checkpoint({'checkpoint_dir': str(tmp_path)}, 'run1'))
+    resumed = forecaster.run()
+
+    assert forecaster.timings['a'].get('resumed')
+    assert not forecaster.timings['b'].get('resumed')
+    assert resumed['a'].equals(first['a'])
+    assert not resumed['b'].equals(first['b'])
@@ -0,0 +1,210 @@
+"""
+Tests of the data extraction, including the URL source cache revalidation and the
+concurrent download of several sources against a local HTTP server.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+import pandas as pd
+import pytest
+import requests
+from extract import Extract, RETRY_STATUS_CODES
+
+
+CSV = (b"Description,YYYYMM,Value\n"
+       b"Coal Consumption,202101,1.5\n"
+       b"Coal Consumption,202102,Not Available\n"
+       b"Wind Energy Consumption,202101,0.25\n")
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+    """
+    Serves CSV with an ETag, answering 304 when the request carries the current ETag.
+    Paths listed in the server's failures are first answered with the given statuses,
+    and paths listed in its bodies serve their own CSV.
+    """
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """
+        Answers GET requests and records their conditional headers and concurrency.
+        """
+        self.server.requests.append(self.headers.get('If-None-Match'))
+        failures = self.server.failures.get(self.path)
+        if failures:
+            self.send_response(failures.pop(0))
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        time.sleep(self.server.delay)
+        with self.server.lock:
+            self.server.active -= 1
+        body = self.server.bodies.get(self.path, self.server.body)
+        self.send_response(200)
+        self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+@pytest.fixture(name='server')
+def fixture_server():
+    """
+    Runs the source server in a thread.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SourceHandler)
+    server.etag, server.body, server.requests = '"v1"', CSV, []
+    server.bodies, server.failures, server.delay = {}, {}, 0.0
+    server.lock, server.active, server.max_active = threading.Lock(), 0, 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_config(server, tmp_path, **overrides):
+    """
+    Returns an extraction config reading the server's source through the cache.
+    """
+    return {'data_source': f'http://127.0.0.1:{server.server_port}/source.csv',
+            'description_column': 'Description',
+            'date_column': 'YYYYMM',
+            'target_column': 'Value',
+            'source_cache': True,
+            'source_cache_dir': str(tmp_path / 'SourceCache'),
+            'download_retries': 0,
+            **overrides}
+
+
+def test_unchanged_source_is_revalidated_and_read_from_cache(server, tmp_path):
+    """
+    An unchanged source is revalidated with its ETag and read from the cache.
+    """
+    config = make_config(server, tmp_path)
+    first = Extract(config).run()
+    second = Extract(config).run()
+
+    assert server.requests == [None, '"v1"']
+    assert second.equals(first)
+    assert len(first) == 3
+
+
+def test_changed_source_is_downloaded_again(server, tmp_path):
+    """
+    A source whose ETag changed is downloaded and cached again.
+    """
+    config = make_config(server, tmp_path)
+    Extract(config).run()
+    server.etag = '"v2"'
+    server.body = CSV + b"Wind Energy Consumption,202102,0.5\n"
+    data = Extract(config).run()
+
+    assert server.requests == [None, '"v1"']
+    assert len(data) == 4
+    assert Extract(config).run().equals(data)
+    assert server.requests[-1] == '"v2"'
+
+
+def test_cached_source_is_read_in_chunks(server, tmp_path):
+    """
+    A cached source is read in typed chunks when read_chunksize is set.
+    """
+    config = make_config(server, tmp_path, read_chunksize=2)
+    whole = Extract(make_config(server, tmp_path)).run()
+    chunks = list(Extract(config).run())
+
+    assert server.requests[-1] == '"v1"'
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert chunks[1]['Value'].dtype == 'float64'
+    assert pd.concat(chunks, ignore_index=True).astype(str).equals(whole.astype(str))
+
+
+def test_unknown_suffix_is_read_as_csv(tmp_path):
+    """
+    A local source that is neither Parquet nor Excel is parsed as CSV.
+    """
+    path = tmp_path / 'export.txt'
+    path.write_bytes(CSV)
+    data = Extract({'data_source': str(path), 'description_column': 'Description',
+                    'date_column': 'YYYYMM', 'target_column': 'Value'}).run()
+
+    assert data['Description'].tolist() == ['Coal Consumption', 'Coal Consumption',
+                                            'Wind Energy Consumption']
+
+
+def make_sources_config(server, paths, **overrides):
+    """
+    Returns an extraction config downloading several sources from the server.
+    """
+    return {'data_source': [f'http://127.0.0.1:{server.server_port}{path}' for path in paths],
+            'description_column': 'Description',
+            'date_column': 'YYYYMM',
+            'target_column': 'Value',
+            'download_concurrency': len(paths),
+            'download_retries': 2,
+            'download_backoff': 0.0,
+            **overrides}
+
+
+def test_sources_are_downloaded_concurrently_and_merged(server, tmp_path, monkeypatch):
+    """
+    Several sources are downloaded at the same time, and a group found in more than one
+    of them is named after the file name of each source.
+    """
+    monkeypatch.chdir(tmp_path)
+    server.delay = 0.2
+    server.bodies['/wind.csv'] = (b"Description,YYYYMM,Value\n"
+                                  b"Coal Consumption,202101,7.0\n"
+                                  b"Solar Energy Consumption,202101,0.5\n")
+    server.bodies['/more/coal.csv'] = b"Description,YYYYMM,Value\nCoal Consumption,202101,2.0\n"
+    config = make_sources_config(server, ['/coal.csv', '/wind.csv', '/more/coal.csv'])
+    data = Extract(config).run()
+
+    assert server.max_active > 1
+    assert sorted(data['Description'].unique()) == [
+        'Coal Consumption (coal.csv 1)', 'Coal Consumption (coal.csv 3)',
+        'Coal Consumption (wind.csv)', 'Solar Energy Consumption', 'Wind Energy Consumption']
+    assert data['Source'].tolist()[-1] == config['data_source'][2]
+
+    config['source_names'] = ['EIA', 'Wind', 'Archive']
+    data = Extract(config).run()
+    assert 'Coal Consumption (Wind)' in set(data['Description'])
+
+
+@pytest.mark.parametrize('status', RETRY_STATUS_CODES)
+def test_transient_errors_are_retried(server, tmp_path, monkeypatch, status):
+    """
+    A source answering a retryable status is downloaded again, until the retries run out.
+    """
+    monkeypatch.chdir(tmp_path)
+    server.failures['/wind.csv'] = [status, status]
+    data = Extract(make_sources_config(server, ['/coal.csv', '/wind.csv'])).run()
+
+    assert len(server.requests) == 4
+    assert len(data) == 6
+
+    server.failures['/wind.csv'] = [status] * 3
+    with pytest.raises(requests.HTTPError):
+        Extract(make_sources_config(server, ['/coal.csv', '/wind.csv'])).run()
+
+
+def test_client_errors_are_not_retried(server, tmp_path, monkeypatch):
+    """
+    A source answering a status that is not retryable fails on the first attempt.
+    """
+    monkeypatch.chdir(tmp_path)
+    server.failures['/coal.csv'] = [404]
+    with pytest.raises(requests.HTTPError):
+        Extract(make_sources_config(server, ['/coal.csv'])).run()
+
+    assert len(server.requests) == 1
@@ -0,0 +1,142 @@
+"""
+Tests of the concurrent Prophet forecasting in Forecast.
+"""
+
+from collections.abc import Mapping
+import os
+import pathlib
+import time
+import pandas as pd
+import pytest
+from forecast import Forecast
+from worker_pool import WorkerPool
+
+
+def make_forecast(names, **overrides):
+    """
+    Returns a Forecast of short monthly series, one per name.
+    """
+    dates = pd.date_range('2020-01-01', periods=12, freq='MS')
+    data_dict = {name: pd.DataFrame({'ds': dates, 'y': float(index)})
+                 for index, name in enumerate(names)}
+    config = {'max_train_date': '202012', 'prediction_start': '202101', 'date_format': '%Y%m',
+              'forecast_workers': 2, **overrides}
+    return Forecast(data_dict, config)
+
+
+class CountingSeries(Mapping):
+    """
+    Train sets that record which groups were read, like sharded series read lazily.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.reads = []
+
+    def __getitem__(self, name):
+        self.reads.append(name)
+        return self.frames[name]
+
+    def __iter__(self):
+        return iter(self.frames)
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def fake_forecast_group(self, name, df):
+    """
+    Stands in for the Prophet fit of a group. The first groups take longest, group
+    'bad' raises, group 'crash' kills its worker process and group 'flaky' kills it
+    only the first time.
+    """
+    time.sleep(0.05 if name == 'a' else 0.0)
+    if name == 'bad':
+        raise ValueError("bad data")
+    marker = self.config.get('crash_marker')
+    if name == 'crash' or (name == 'flaky' and not os.path.exists(marker)):
+        if name == 'flaky':
+            pathlib.Path(marker).touch()
+        os._exit(1)  # pylint: disable=protected-access
+    return pd.DataFrame({'ds': [self.prediction_start], 'yhat': [df['y'].iloc[0]]})
+
+
+@pytest.fixture(autouse=True)
+def fake_fits(monkeypatch):
+    """
+    Replaces the Prophet fits with fake_forecast_group, inherited by forked workers.
+    """
+    monkeypatch.setattr(Forecast, 'forecast_group', fake_forecast_group)
+
+
+@pytest.mark.parametrize('executor', ['process', 'thread'])
+def test_results_keep_group_order(executor):
+    """
+    Forecasts are returned in the order of the groups, not in completion order.
+    """
+    forecaster = make_forecast(['a', 'b', 'c', 'd'], forecast_executor=executor)
+    forecasts = forecaster.run()
+
+    assert list(forecasts) == ['a', 'b', 'c', 'd']
+    assert [forecast['yhat'].iloc[0] for forecast in forecasts.values()] == [0, 1, 2, 3]
+
+
+def test_failed_group_is_isolated():
+    """
+    A group whose fit raises is recorded as failed without affecting the others.
+    """
+    forecaster = make_forecast(['a', 'bad', 'c'])
+    forecasts = forecaster.run()
+
+    assert list(forecasts) == ['a', 'c']
+    assert forecaster.failures == {'bad': 'ValueError: bad data'}
+
+
+def test_dead_worker_is_replaced(tmp_path):
+    """
+    When a worker process dies, the lost groups are retried once in a new pool: a
+    group that dies only once completes, one that dies every time fails.
+    """
+    forecaster = make_forecast(['a', 'flaky', 'b', 'crash', 'c'],
+                               crash_marker=str(tmp_path / 'crashed'))
+    forecasts = forecaster.run()
+
+    assert list(forecasts) == ['a', 'flaky', 'b', 'c']
+    assert list(forecaster.failures) == ['crash']
+    assert 'BrokenProcessPool' in forecaster.failures['crash']
+
+
+def test_dead_worker_is_replaced_while_iterating(tmp_path):
+    """
+    iter_forecasts recovers from a dead worker in the same way.
+    """
+    forecaster = make_forecast(['a', 'flaky', 'b', 'crash', 'c'], max_in_flight=2,
+                               crash_marker=str(tmp_path / 'crashed'))
+    results = list(forecaster.iter_forecasts())
+
+    assert [name for name, _, error in results if error is None] == ['a', 'flaky', 'b', 'c']
+    assert list(forecaster.failures) == ['crash']
+
+
+def test_max_in_flight_bounds_the_groups_read(monkeypatch):
+    """
+    At most max_in_flight groups are read and not yet collected, both by the pool of
+    run and by iter_forecasts.
+    """
+    names = [f'g{index}' for index in range(10)]
+    forecaster = make_forecast(names, forecast_executor='thread', max_in_flight=3)
+    series = CountingSeries(forecaster.data_dict)
+    monkeypatch.setattr(forecaster, 'data_dict', series)
+
+    pool = WorkerPool(lambda: forecaster.create_executor(2))
+    in_flight = [len(series.reads) - collected
+                 for collected, _ in enumerate(forecaster.map_bounded(pool, names, 2), 1)]
+    pool.shutdown()
+    assert len(in_flight) == len(names)
+    assert max(in_flight) <= 2
+
+    series.reads.clear()
+    in_flight = [len(series.reads) - collected
+                 for collected, _ in enumerate(forecaster.iter_forecasts(), 1)]
+    assert len(in_flight) == len(names)
+    assert max(in_flight) <= 2
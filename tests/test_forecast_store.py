@@ -0,0 +1,60 @@
+"""
+Tests of the forecast store index and retention.
+"""
+
+import os
+import pandas as pd
+from forecast_store import ForecastStore
+
+
+def make_forecast(start, periods=3):
+    """
+    Returns a forecast data frame of monthly dates.
+    """
+    dates = pd.date_range(start, periods=periods, freq='MS')
+    values = [float(value) for value in range(periods)]
+    return pd.DataFrame({'ds': dates, 'yhat': values,
+                         'yhat_lower': values, 'yhat_upper': values})
+
+
+def test_runs_have_their_own_index(tmp_path):
+    """
+    Each run is indexed separately and groups are served from their latest run.
+    """
+    store = ForecastStore({'forecast_store_dir': str(tmp_path)})
+    store.write('20260101T000000', {'a': make_forecast('2026-01-01'),
+                                    'b': make_forecast('2026-01-01')}, {'a': 'key'})
+    store.write('20260201T000000', {'a': make_forecast('2026-02-01')})
+
+    assert store.get_runs() == ['20260101T000000', '20260201T000000']
+    assert os.path.exists(store.get_index_path('20260101T000000'))
+    assert store.get_groups() == ['a']
+    assert store.get_model_keys('20260101T000000') == {'a': 'key'}
+    assert store.get_latest_runs() == {'a': '20260201T000000', 'b': '20260101T000000'}
+    assert store.get_forecast('b')['ds'].min() == pd.Timestamp('2026-01-01')
+    assert store.get_forecast('a', start='2026-03-01')['ds'].tolist() == [
+        pd.Timestamp('2026-03-01'), pd.Timestamp('2026-04-01')]
+
+
+def test_unfinished_run_is_not_listed(tmp_path):
+    """
+    A run whose index was never written is not listed.
+    """
+    store = ForecastStore({'forecast_store_dir': str(tmp_path)})
+    store.write_group('20260101T000000', 'a', make_forecast('2026-01-01'))
+
+    assert store.get_runs() == []
+    assert not store.get_groups()
+
+
+def test_oldest_runs_are_pruned(tmp_path):
+    """
+    Runs beyond forecast_store_max_runs are removed, oldest first.
+    """
+    store = ForecastStore({'forecast_store_dir': str(tmp_path), 'forecast_store_max_runs': 2})
+    store.write_group('20260100T000000', 'a', make_forecast('2026-01-01'))
+    for month in range(1, 5):
+        store.write(f'2026010{month}T000000', {'a': make_forecast('2026-01-01')})
+
+    assert store.get_runs() == ['20260103T000000', '20260104T000000']
+    assert store.get_run_dirs() == store.get_runs()
@@ -0,0 +1,116 @@
+"""
+Tests of the forecast reconciliation of a hierarchy.
+"""
+
+from statistics import NormalDist
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from forecast import Forecast
+from hierarchy import Hierarchy
+
+
+HIERARCHY = {'total': ['a', 'b']}
+
+
+def make_series(start, values):
+    """
+    Returns a monthly train set.
+    """
+    return pd.DataFrame({'ds': pd.date_range(start, periods=len(values), freq='MS'),
+                         'y': values})
+
+
+def make_forecast(yhat, spread=1.0):
+    """
+    Returns a forecast of three months.
+    """
+    yhat = np.asarray(yhat, dtype=float)
+    return pd.DataFrame({'ds': pd.date_range('2026-01-01', periods=len(yhat), freq='MS'),
+                         'yhat': yhat, 'yhat_lower': yhat - spread,
+                         'yhat_upper': yhat + spread})
+
+
+def test_shares_use_the_dates_all_children_share():
+    """
+    Top-down shares are taken over the dates all bottom level groups share.
+    """
+    # b only starts in 2025; a's earlier, higher values must not skew the shares
+    train_sets = {'a': make_series('2024-01-01', [100.0] * 12 + [1.0] * 12),
+                  'b': make_series('2025-01-01', [3.0] * 12)}
+    proportions = Hierarchy({'hierarchy': HIERARCHY}).get_proportions(train_sets)
+
+    assert proportions[:, 0].tolist() == pytest.approx([0.25, 0.75])
+
+
+@pytest.mark.parametrize('method', ['top_down', 'bottom_up', 'mint'])
+def test_reconciled_forecasts_add_up(method):
+    """
+    The reconciled forecasts of the children add up to their parent.
+    """
+    hierarchy = Hierarchy({'hierarchy': HIERARCHY, 'reconciliation': method})
+    train_sets = {'a': make_series('2024-01-01', [5.0] * 24),
+                  'b': make_series('2025-01-01', [2.0] * 12)}
+    forecasts = {'total': make_forecast([10.0, 11.0, 12.0], 2.0),
+                 'a': make_forecast([6.0, 6.5, 7.0]), 'b': make_forecast([3.0, 3.0, 3.5])}
+    fitted = {name: forecasts[name] for name in hierarchy.get_fit_names()}
+    reconciled = hierarchy.reconcile(fitted, train_sets)
+
+    total = reconciled['total']['yhat'].to_numpy()
+    assert total == pytest.approx(reconciled['a']['yhat'] + reconciled['b']['yhat'])
+    if method == 'top_down':
+        assert total == pytest.approx(forecasts['total']['yhat'].to_numpy())
+
+
+def test_groups_with_two_parents_are_rejected():
+    """
+    A group listed under two parents would be counted twice and is rejected.
+    """
+    with pytest.raises(ValueError, match="more than one parent: a"):
+        Hierarchy({'hierarchy': {'total': ['a', 'b'], 'other': ['a', 'c']}})
+
+
+def test_intervals_use_the_width_of_each_group():
+    """
+    The standard deviations are read from, and the intervals written with, the
+    interval width of each group.
+    """
+    hierarchy = Hierarchy({'hierarchy': HIERARCHY, 'reconciliation': 'bottom_up',
+                           'prophet_params': {'interval_width': 0.8}})
+    forecasts = {'a': make_forecast([1.0, 1.0, 1.0]), 'b': make_forecast([2.0, 2.0, 2.0])}
+    narrow = hierarchy.reconcile(forecasts, {})
+    wide = hierarchy.reconcile(forecasts, {}, {'a': 0.95, 'total': 0.95})
+
+    for name in forecasts:
+        assert (narrow[name]['yhat_upper'] - narrow[name]['yhat_lower']).tolist() == \
+            pytest.approx([2.0] * 3)
+    assert (wide['a']['yhat_upper'] - wide['a']['yhat_lower']).tolist() == \
+        pytest.approx([2.0] * 3)
+    z_80, z_95 = NormalDist().inv_cdf(0.9), NormalDist().inv_cdf(0.975)
+    total_sigma = np.hypot(1.0 / z_95, 1.0 / z_80)
+    assert (wide['total']['yhat_upper'] - wide['total']['yhat_lower']).tolist() == \
+        pytest.approx([2 * z_95 * total_sigma] * 3)
+
+
+def test_forecast_skips_untouched_hierarchies_and_reads_group_widths(tmp_path, capsys):
+    """
+    A hierarchy none of whose groups are forecast is skipped silently, one with some
+    groups missing is warned about, and the interval widths follow the backtested
+    parameters of Prophet groups only.
+    """
+    path = tmp_path / 'best_params.json'
+    path.write_text(json.dumps({'groups': {'a': {'params': {'interval_width': 0.95}},
+                                           'b': {'params': {'interval_width': 0.9}}}}),
+                    encoding='utf-8')
+    forecaster = Forecast({}, {'max_train_date': '202512', 'prediction_start': '202601',
+                               'date_format': '%Y%m', 'hierarchy': HIERARCHY,
+                               'engines': {'b': 'baseline'}, 'best_params_file': str(path),
+                               'prophet_params': {'interval_width': 0.5}})
+
+    assert forecaster.get_hierarchy(['other']) is None
+    assert capsys.readouterr().out == ''
+    assert forecaster.get_hierarchy(['a', 'other']) is None
+    assert 'missing groups total, b' in capsys.readouterr().out
+    assert [forecaster.get_interval_width(name) for name in ['total', 'a', 'b']] == \
+        [0.5, 0.95, 0.5]
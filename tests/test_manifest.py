@@ -0,0 +1,96 @@
+"""
+Tests of the incremental run manifest.
+"""
+
+import os
+import pickle
+import pandas as pd
+from manifest import Manifest
+from series import SeriesCollection, ShardedSeries
+
+
+CONFIG = {'description_column': 'Description', 'date_column': 'ds', 'target_column': 'y'}
+
+
+def make_frame():
+    """
+    Returns the rows of two groups.
+    """
+    return pd.DataFrame({'Description': ['a', 'b', 'a', 'b'],
+                         'ds': pd.to_datetime(['2026-01-01', '2026-01-01',
+                                               '2026-02-01', '2026-02-01']),
+                         'y': [1.0, 2.0, 3.0, 4.0]})
+
+
+def test_shards_are_fingerprinted_like_the_series(tmp_path):
+    """
+    Sharded and in-memory series of the same data have the same fingerprints.
+    """
+    frames = [make_frame().iloc[:2], make_frame().iloc[2:]]
+    shards = ShardedSeries.from_frames(frames, 'Description', directory=str(tmp_path))
+    collection = SeriesCollection.from_frames(make_frame(), 'Description')
+    manifest = Manifest({**CONFIG, 'manifest_dir': str(tmp_path / 'Manifest')})
+
+    fingerprints = manifest.fingerprint(shards)
+    assert fingerprints == manifest.fingerprint(collection)
+    assert fingerprints == manifest.fingerprint({name: shards[name] for name in shards})
+    assert fingerprints['a'] != fingerprints['b']
+
+
+def test_selected_shards_stay_on_disk(tmp_path):
+    """
+    Selecting groups of sharded series keeps them on disk.
+    """
+    shards = ShardedSeries.from_frames(make_frame(), 'Description', directory=str(tmp_path))
+    selected = Manifest(CONFIG).select(shards, ['b', 'c'])
+
+    assert isinstance(selected, ShardedSeries)
+    assert list(selected) == ['b']
+    assert selected['b']['y'].tolist() == [2.0, 4.0]
+
+
+def test_chunks_are_not_fingerprinted():
+    """
+    Data frames can be fingerprinted, chunk iterators cannot.
+    """
+    assert Manifest.can_fingerprint(make_frame())
+    assert not Manifest.can_fingerprint(iter([make_frame()]))
+
+
+def test_state_files_are_written_for_changed_groups_only(tmp_path, monkeypatch):
+    """
+    Each group keeps its own state file, written when the group changed and read
+    back only when an unchanged group is accessed; deleted groups lose their file.
+    """
+    config = {**CONFIG, 'manifest_dir': str(tmp_path)}
+    series = SeriesCollection.from_frames(make_frame(), 'Description')
+    forecasts = {'a': pd.DataFrame({'yhat': [1.0]}), 'b': pd.DataFrame({'yhat': [2.0]})}
+    manifest = Manifest(config)
+    fingerprints = manifest.fingerprint(series)
+    manifest.save((fingerprints, *manifest.diff(fingerprints)), series, forecasts, 'run1')
+    assert sorted(os.listdir(tmp_path / 'groups')) == sorted(manifest.load()['files'].values())
+
+    manifest = Manifest(config)
+    fingerprints = manifest.fingerprint(series)
+    fingerprints['c'] = fingerprints.pop('a')
+    changes = (fingerprints, *manifest.diff(fingerprints))
+    assert changes[1:] == (['c'], ['a'])
+
+    reads = []
+    load = pickle.load
+
+    def counting_load(file):
+        reads.append(file.name)
+        return load(file)
+
+    monkeypatch.setattr(pickle, 'load', counting_load)
+    state = manifest.load_state(exclude=[*changes[1], *changes[2]])
+    assert list(state['forecasts']) == ['b'] and 'b' in state['series'] and not reads
+    assert state['forecasts']['b']['yhat'].tolist() == [2.0]
+    assert len(reads) == 1
+
+    manifest.save(changes, {'c': series['a'], 'b': series['b']},
+                  {'c': forecasts['a'], 'b': state['forecasts']['b']}, 'run2')
+    files = manifest.load()['files']
+    assert sorted(files) == ['b', 'c']
+    assert sorted(os.listdir(tmp_path / 'groups')) == sorted(files.values())
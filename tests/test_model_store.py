@@ -0,0 +1,84 @@
+"""
+Tests of the fitted model cache and the warm start of Prophet fits.
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+from forecast import Forecast
+from model_store import ModelStore
+
+
+def make_forecast(tmp_path, **overrides):
+    """
+    Returns a Forecast whose model store is kept in tmp_path.
+    """
+    config = {'max_train_date': '202312', 'prediction_start': '202401', 'date_format': '%Y%m',
+              'model_cache_dir': str(tmp_path / 'models'), **overrides}
+    return Forecast({}, config)
+
+
+def make_train_data(periods=36):
+    """
+    Returns a monthly training series with a trend.
+    """
+    dates = pd.date_range('2021-01-01', periods=periods, freq='MS')
+    return pd.DataFrame({'ds': dates, 'y': np.linspace(1.0, 2.0, periods)})
+
+
+def test_unchanged_data_reuses_the_cached_model(tmp_path, monkeypatch):
+    """
+    A group fitted on the same data and parameters is loaded instead of refitted,
+    and changed data misses the cache.
+    """
+    train_data = make_train_data()
+    make_forecast(tmp_path, model_cache=True).create_prophet_model(train_data, 'a')
+
+    def fail_fit(*args, **kwargs):
+        raise AssertionError("model was refitted")
+
+    monkeypatch.setattr(Prophet, 'fit', fail_fit)
+    forecaster = make_forecast(tmp_path, model_cache=True)
+    assert forecaster.create_prophet_model(train_data, 'a').history is not None
+
+    store = forecaster.model_store
+    assert store.key(train_data) != store.key(make_train_data(37))
+    assert store.key(train_data) != store.key(train_data, {'n_changepoints': 5})
+
+
+def test_prune_evicts_old_then_least_recently_used_models(tmp_path):
+    """
+    Models older than the age limit are evicted first, then the least recently used
+    ones until the store fits the size limit.
+    """
+    store = ModelStore({'model_cache_dir': str(tmp_path), 'model_cache_max_age_days': 1,
+                        'model_cache_max_size_mb': 2 / 1024})
+    now = time.time()
+    for index, age_days in enumerate([3, 0.3, 0.2, 0.1]):
+        with open(store.path(f'model{index}'), 'w', encoding='utf-8') as file:
+            file.write('x' * 1024)
+        os.utime(store.path(f'model{index}'), (now - age_days * 86400,) * 2)
+
+    assert store.prune() == 2
+    assert sorted(os.listdir(tmp_path)) == ['model2.json', 'model3.json']
+
+
+def test_warm_start_falls_back_to_a_cold_fit(tmp_path):
+    """
+    The previous parameters of a group initialize its next fit while their shapes
+    still match, and a cold fit is used when the data or parameter dimensions change.
+    """
+    train_data = make_train_data()
+    forecaster = make_forecast(tmp_path, warm_start=True)
+    forecaster.create_prophet_model(train_data, 'a')
+    extended = make_train_data(37)
+
+    init = forecaster.warm_start_init('a', extended, {})
+    assert init is not None and set(init) == {'k', 'm', 'sigma_obs', 'delta', 'beta'}
+    assert forecaster.warm_start_init('a', extended, {'n_changepoints': 5}) is None
+    assert forecaster.warm_start_init('a', extended, {'yearly_seasonality': 3}) is None
+    assert forecaster.warm_start_init('a', make_train_data(30), {}) is None
+    assert forecaster.warm_start_init('b', extended, {}) is None
+    assert forecaster.create_prophet_model(extended, 'a').history is not None
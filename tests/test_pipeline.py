@@ -0,0 +1,86 @@
+"""
+Tests of the pipeline configuration validation and of its command line start-up.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from pipeline import Pipeline
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Seconds a dry run may take; it only reads and validates the configuration
+DRY_RUN_BUDGET = 5.0
+HEAVY_MODULES = ('prophet', 'plotly', 'pandas', 'requests')
+
+
+def make_pipeline(tmp_path, **overrides):
+    """
+    Returns a pipeline using the repository configuration with the given overrides.
+    """
+    config_file = os.path.join(ROOT, 'config.json')
+    with open(config_file, encoding='utf-8') as file:
+        config = {**json.load(file), **overrides}
+    path = tmp_path / 'config.json'
+    path.write_text(json.dumps(config), encoding='utf-8')
+    return Pipeline(str(path))
+
+
+@pytest.mark.parametrize('key', ['forecast_workers', 'report_workers'])
+def test_null_workers_are_accepted(tmp_path, key):
+    """
+    Null worker counts are valid, like 0 they use every core.
+    """
+    assert make_pipeline(tmp_path, **{key: None}).validate() == []
+
+
+@pytest.mark.parametrize('value', [-1, 1.5, True, '2', None])
+def test_invalid_periods_are_rejected(tmp_path, value):
+    """
+    predict_periods must be a non-negative integer.
+    """
+    problems = make_pipeline(tmp_path, predict_periods=value).validate()
+    assert problems == ["predict_periods must be a non-negative integer"]
+
+
+def test_runs_get_distinct_ids(tmp_path):
+    """
+    A resumed run gets its own identifier and records the run it resumes.
+    """
+    first = make_pipeline(tmp_path)
+    resumed = Pipeline(str(tmp_path / 'config.json'), resume=first.run_id)
+
+    assert resumed.run_id != first.run_id
+    assert resumed.resume == first.run_id
+    assert resumed.instrumentation.to_dict()['resumed_from'] == first.run_id
+
+
+def test_dry_run_is_fast(tmp_path):
+    """
+    A dry run validates the configuration within the time budget.
+    """
+    make_pipeline(tmp_path)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'pipeline.py'), '--dry-run',
+                             '--config', str(tmp_path / 'config.json')],
+                            cwd=tmp_path, capture_output=True, text=True, check=False)
+    elapsed = time.perf_counter() - start
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert result.stdout.strip() == "Configuration is valid"
+    assert elapsed < DRY_RUN_BUDGET
+
+
+def test_import_defers_the_heavy_modules():
+    """
+    Importing the pipeline loads none of the modules that only its stages need.
+    """
+    code = ("import sys, pipeline; "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True)
+
+    assert result.stdout.strip() == ''
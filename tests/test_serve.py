@@ -0,0 +1,140 @@
+"""
+Tests of the forecast server.
+"""
+
+import http.client
+import json
+import os
+import threading
+import pandas as pd
+from prophet import Prophet
+import pytest
+from forecast_store import ForecastStore
+from model_store import ModelStore
+from serve import ForecastService, create_server
+
+
+def make_forecast(periods):
+    """
+    Returns a monthly forecast.
+    """
+    values = [float(value) for value in range(periods)]
+    return pd.DataFrame({'ds': pd.date_range('2026-01-01', periods=periods, freq='MS'),
+                         'yhat': values, 'yhat_lower': values, 'yhat_upper': values})
+
+
+@pytest.fixture(name='config')
+def fixture_config(tmp_path):
+    """
+    Returns a configuration whose store holds two runs; 'b' failed in the second.
+    """
+    with open(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json'),
+              encoding='utf-8') as file:
+        config = {**json.load(file), 'forecast_store_dir': str(tmp_path)}
+    store = ForecastStore(config)
+    store.write('20260101T000000-000000', {'a': make_forecast(2), 'b': make_forecast(3)})
+    store.write('20260201T000000-000000', {'a': make_forecast(4)})
+    return config
+
+
+@pytest.fixture(name='request_json')
+def fixture_request_json(config):
+    """
+    Serves the store in a thread and returns a function sending a request to it.
+    """
+    server = create_server(ForecastService(config), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    def request_json(method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=10)
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        payload = json.loads(response.read())
+        connection.close()
+        return response.status, payload
+
+    yield request_json
+    server.shutdown()
+    server.server_close()
+
+
+def test_groups_are_served_from_their_latest_run(config):
+    """
+    Each group is served from the latest run that stored it, unless a run is given.
+    """
+    service = ForecastService(config)
+
+    assert service.runs == {'a': '20260201T000000-000000', 'b': '20260101T000000-000000'}
+    assert len(service.get_forecast('a')['ds']) == 4
+    assert ForecastService(config, '20260101T000000-000000').get_forecast('a')['yhat'] == [0, 1]
+
+
+@pytest.mark.parametrize('query, intervals', [('false', False), ('0', False),
+                                              ('True', True), ('yes', True)])
+def test_intervals_are_parsed(request_json, query, intervals):
+    """
+    The intervals query parameter accepts the usual boolean spellings.
+    """
+    status, payload = request_json('GET', f'/forecast?group=a&intervals={query}')
+
+    assert status == 200
+    assert ('yhat_lower' in payload) is intervals
+
+
+@pytest.mark.parametrize('body', [{'group': 'a', 'horizon': True},
+                                  {'group': 'a', 'horizon': 1.5},
+                                  {'group': 'a', 'intervals': 'maybe'}])
+def test_invalid_fields_are_rejected(request_json, body):
+    """
+    Request bodies with invalid horizon or intervals fields get a 400.
+    """
+    status, _ = request_json('POST', '/forecast', json.dumps(body))
+
+    assert status == 400
+
+
+def test_invalid_content_length_is_rejected(request_json):
+    """
+    A non-numeric Content-Length gets a 400.
+    """
+    status, payload = request_json('POST', '/forecast', b'{}', {'Content-Length': 'abc'})
+
+    assert status == 400
+    assert payload == {'error': "Invalid Content-Length"}
+
+
+@pytest.mark.parametrize('overrides, error', [
+    ({}, "require 'model_cache'"),
+    ({'model_cache': True}, "not cached by the run"),
+    ({'hierarchy': {'a': ['x', 'y']}}, "not supported for reconciled groups"),
+    ({'engines': {'a': 'baseline'}}, "not supported for the baseline engine")])
+def test_groups_without_a_model_are_not_extended(config, overrides, error):
+    """
+    A longer horizon for a group without a cached model is rejected with the reason.
+    """
+    service = ForecastService({**config, **overrides})
+
+    with pytest.raises(ValueError, match=error):
+        service.get_forecast('a', horizon=6)
+
+
+def test_extension_leaves_the_shared_model_unchanged(config, tmp_path):
+    """
+    A longer horizon is predicted from the cached model with the configured
+    uncertainty samples, without changing the model shared by the request threads.
+    """
+    config = {**config, 'model_cache': True, 'model_cache_dir': str(tmp_path / 'models'),
+              'uncertainty_samples': 0}
+    history = pd.DataFrame({'ds': pd.date_range('2024-01-01', periods=24, freq='MS'),
+                            'y': [float(value) for value in range(24)]})
+    prophet_model = Prophet(uncertainty_samples=100).fit(history)
+    ModelStore(config).save('model-a', prophet_model)
+    ForecastStore(config).write('20260301T000000-000000', {'a': make_forecast(2)},
+                                {'a': 'model-a'})
+    service = ForecastService(config)
+    forecast = service.get_forecast('a', horizon=5)
+
+    assert len(forecast['ds']) == 5
+    assert forecast['yhat_lower'][2:] == forecast['yhat'][2:]
+    assert service.models.get('model-a', None).uncertainty_samples == 100
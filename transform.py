@@ -3,10 +3,14 @@ transform.py
 
 A module containing the Transform class, which is used for transforming data frames
 based on a provided configuration. The Transform class is primarily designed for
-reformatting the date and target columns in a given set of data frames.
+reformatting the date and target columns in a given set of data frames, or for turning
+the preprocessed data set into a compact SeriesCollection of 'ds'/'y' series, or into
+on-disk ShardedSeries in out-of-core mode.
 
 """
 
+from series import SeriesCollection, ShardedSeries
+
 
 class Transform:
     """
@@ -15,14 +19,19 @@ class Transform:
     Attributes
     ----------
     config : dict
-        A configuration dictionary containing the keys 'date_column' and 'target_column'
-        which represent the names of the date and target columns in the data frames.
+        A configuration dictionary containing the keys 'description_column', 'date_column'
+        and 'target_column' which represent the names of the group, date and target columns
+        in the data frames. If 'out_of_core' or 'streaming' is enabled, the groups are
+        written to shards in 'shard_dir' instead of being kept in memory.
 
     Methods
     -------
-    run(data_dict):
-        Transforms the data frames in the given data_dict according to the config and
-        returns the transformed data_dict.
+    run(data):
+        Transforms the given data according to the config and returns the transformed data.
+    to_series_collection(data):
+        Groups a data frame, or an iterable of data frame chunks, into a SeriesCollection.
+    to_sharded_series(data):
+        Partitions a data frame, or an iterable of data frame chunks, into ShardedSeries.
     reformat_data_frames(data_dict):
         Renames the date and target columns in the data frames of the given data_dict
         based on the config and filters only the renamed columns.
@@ -33,28 +42,74 @@ class Transform:
         Parameters
         ----------
         config : dict
-            A configuration dictionary containing the keys 'date_column' and 'target_column'
-            which represent the names of the date and target columns in the data frames.
+            A configuration dictionary containing the keys 'description_column',
+            'date_column' and 'target_column' which represent the names of the group,
+            date and target columns in the data frames.
         """
         self.config = config
 
-    def run(self, data_dict):
+    def run(self, data):
         """
-        Transforms the data frames in the given data_dict according to the config and
-        returns the transformed data_dict.
+        Transforms the given data according to the config and returns the transformed data.
 
         Parameters
         ----------
-        data_dict : dict
-            A dictionary containing data frame objects to be transformed.
+        data : dict, pd.DataFrame or iterable of pd.DataFrame
+            A dictionary containing data frame objects to be transformed, or the
+            preprocessed data set (whole or in chunks) to be grouped.
 
         Returns
         -------
-        dict
-            The transformed data_dict with the date and target columns renamed and filtered.
+        dict, SeriesCollection or ShardedSeries
+            The transformed data_dict with the date and target columns renamed and filtered,
+            or a SeriesCollection (ShardedSeries in out-of-core and streaming mode) of the
+            groups in the data set.
         """
-        data_dict = self.reformat_data_frames(data_dict)
-        return data_dict
+        if isinstance(data, dict):
+            return self.reformat_data_frames(data)
+        if self.config.get('out_of_core') or self.config.get('streaming'):
+            return self.to_sharded_series(data)
+        return self.to_series_collection(data)
+
+    def to_series_collection(self, data):
+        """
+        Groups a data frame, or an iterable of data frame chunks, by the description column
+        into a SeriesCollection holding only the dates and target values.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or iterable of pd.DataFrame
+            The preprocessed data set.
+
+        Returns
+        -------
+        SeriesCollection
+            The groups of the data set as 'ds'/'y' series.
+        """
+        return SeriesCollection.from_frames(data, self.config['description_column'],
+                                            self.config['date_column'],
+                                            self.config['target_column'])
+
+    def to_sharded_series(self, data):
+        """
+        Partitions a data frame, or an iterable of data frame chunks, by the description
+        column into one shard file per group in 'shard_dir'. Chunks are consumed one at a
+        time, so with chunked reading the data set is never fully held in memory.
+
+        Parameters
+        ----------
+        data : pd.DataFrame or iterable of pd.DataFrame
+            The preprocessed data set.
+
+        Returns
+        -------
+        ShardedSeries
+            The groups of the data set as 'ds'/'y' series read from disk on access.
+        """
+        return ShardedSeries.from_frames(data, self.config['description_column'],
+                                         self.config['date_column'],
+                                         self.config['target_column'],
+                                         self.config.get('shard_dir', 'Shards'))
 
     def reformat_data_frames(self, data_dict):
         """
@@ -0,0 +1,166 @@
+"""
+This module provides the WorkerPool class, which fits groups in a process or thread
+pool and recovers the groups lost when a worker process dies.
+"""
+
+from concurrent.futures import BrokenExecutor, Future
+
+
+class WorkerPool:
+    """
+    The pool that fits Prophet groups concurrently. If it breaks, because one of its
+    worker processes died, it is recreated and the groups lost with it are retried
+    once each. Retried groups are fitted one at a time, so that a group that keeps
+    killing its worker fails alone, and the pool runs concurrently again once they
+    are collected.
+
+    Attributes
+    ----------
+    create : callable
+        Returns a new executor and the function to submit for each group.
+    executor : Executor
+        The current pool.
+    worker : callable
+        The function called with the name and data frame of each group.
+    retried : set
+        The groups lost with a broken pool and retried.
+    """
+
+    def __init__(self, create):
+        """
+        Initializes the pool.
+
+        Parameters
+        ----------
+        create : callable
+            Returns a new executor and the function to submit for each group.
+        """
+        self.create = create
+        self.executor, self.worker = create()
+        self.retried = set()
+
+    def start(self, name, df):
+        """
+        Submits a group to the executor. If the executor is broken, the returned future
+        holds the error instead.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group.
+        df : pd.DataFrame
+            The group's data frame with 'ds' and 'y' columns.
+
+        Returns
+        -------
+        Future
+            The future of the group's result.
+        """
+        try:
+            return self.executor.submit(self.worker, name, df)
+        except BrokenExecutor as error:
+            future = Future()
+            future.set_exception(error)
+            return future
+
+    def submit(self, pending, name, data_dict):
+        """
+        Adds a group to the pending groups and submits it, unless groups are being
+        retried, in which case it waits in pending until they are collected.
+
+        Parameters
+        ----------
+        pending : deque
+            The (name, future) pairs of the pending groups, in the order to collect;
+            the future is None for a group not submitted yet.
+        name : str
+            The name of the group.
+        data_dict : Mapping
+            The data frames by group name.
+        """
+        waiting = any(future is None for _, future in pending)
+        pending.append((name, None if waiting else self.start(name, data_dict[name])))
+
+    @staticmethod
+    def first_done(pending):
+        """
+        Returns whether the first pending group has completed.
+
+        Parameters
+        ----------
+        pending : deque
+            The (name, future) pairs of the pending groups.
+
+        Returns
+        -------
+        bool
+            True if the first group was submitted and is done.
+        """
+        return bool(pending) and pending[0][1] is not None and pending[0][1].done()
+
+    def collect(self, pending, data_dict):
+        """
+        Removes the first pending group and returns its result, waiting for it if
+        needed. A group lost with a broken pool is retried, and a retried group lost
+        again is returned as failed.
+
+        Parameters
+        ----------
+        pending : deque
+            The (name, future) pairs of the pending groups.
+        data_dict : Mapping
+            The data frames by group name.
+
+        Returns
+        -------
+        tuple
+            The name and the (forecast, error, timings) triple of the group.
+        """
+        while True:
+            name, future = pending[0]
+            if future is None:
+                future = self.start(name, data_dict[name])
+                pending[0] = (name, future)
+            try:
+                result = future.result()
+            except BrokenExecutor as error:
+                retry = name not in self.retried
+                self.restart(pending)
+                if retry:
+                    continue
+                result = None, f"{type(error).__name__}: {error}", None
+            pending.popleft()
+            if not any(future is None and queued in self.retried for queued, future in pending):
+                for index, (queued, future) in enumerate(pending):
+                    if future is None:
+                        pending[index] = (queued, self.start(queued, data_dict[queued]))
+            return name, result
+
+    def restart(self, pending):
+        """
+        Replaces the broken executor with a new one. The pending groups lost with it
+        are marked as retried and wait in pending to be submitted one at a time.
+
+        Parameters
+        ----------
+        pending : deque
+            The (name, future) pairs of the pending groups, updated in place.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.executor, self.worker = self.create()
+        lost = [index for index, (name, future) in enumerate(pending)
+                if future is not None and name not in self.retried
+                and (not future.done() or future.cancelled() or future.exception() is not None)]
+        for index in lost:
+            name = pending[index][0]
+            self.retried.add(name)
+            pending[index] = (name, None)
+        if lost:
+            print(f"Warning: A forecast worker process died, retrying {len(lost)} groups "
+                  "one at a time")
+
+    def shutdown(self):
+        """
+        Shuts the executor down, cancelling the groups not started yet.
+        """
+        self.executor.shutdown(cancel_futures=True)